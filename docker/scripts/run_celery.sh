@@ -4,6 +4,15 @@
 
 celery -A correlator beat -l info &
 celery -A correlator worker -l info &
+# Affinity queues: exactly one single-process worker per queue
+i=0
+while [ "$i" -lt "${AFFINITY_QUEUES:-0}" ]; do
+    celery -A correlator worker -l info -Q "encore.affinity.$i" -c 1 -n "affinity$i@%h" &
+    i=$((i + 1))
+done
 python manage.py runserver 0.0.0.0:8000 &
 python manage.py start_snmp_listener &
+# Exit right away unless enabled (INGEST_WRITE_BUFFER & EVENT_SCHEDULER)
+python manage.py drain_ingest_buffer &
+python manage.py run_event_scheduler &
 tail -f /dev/null
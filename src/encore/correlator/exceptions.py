@@ -6,3 +6,7 @@ class CorrelatorProcessException(Exception):
 
     def __init__(self, message) -> None:
         self.message = message
+
+
+class EventConflict(Exception):
+    """Event (or its Elastic Event) was changed by another task since it was read (optimistic concurrency)"""
@@ -4,7 +4,9 @@
 from .base import *
 from .celery import *
 from .core import *
+from .correlation import *
 from .elastic import *
 from .glpi import *
+from .ingest import *
 from .log import *
 from .snmp import *
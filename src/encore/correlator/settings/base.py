@@ -21,6 +21,7 @@ SHELL_PLUS_IMPORTS = [
         process_alerted_event,
         process_creating_ticket_event,
         ingest_event,
+        bulk_ingest_events,
         process_new_down_event,
         process_new_up_event,
         purge_db_events_and_apilogs,
@@ -28,6 +29,8 @@ SHELL_PLUS_IMPORTS = [
         resolve_event,
         process_resolving_event,
         process_suppressed_event,
+        sweep_waiting_events,
+        batch_sweep_events,
     )
     """,
     "from elastic.tasks.common import task_handler",
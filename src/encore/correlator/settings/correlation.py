@@ -0,0 +1,124 @@
+"""Correlation Settings"""
+
+import typing as t
+
+from pydantic_settings import BaseSettings
+
+
+class CorrelationSettings(BaseSettings):
+    """Correlation Settings class
+    Will use values from env variables else the default values.
+    """
+
+    # Event-driven wakeups. Check `task_handler` & `wake_events` in elastic/tasks/common.py
+    # Events waiting on a change made elsewhere (Alerted / Suppressed / Resolving) are not polled. They are woken up
+    # when the change is made, and by the safety sweep (check elastic/tasks/sweep.py).
+    EVENT_DRIVEN_WAKEUPS: bool = False
+    EVENT_WAKEUP_RETRY_DELAY: int = 5  # Seconds. Wakeup is retried if the Event is locked by another task
+    EVENT_SWEEP_INTERVAL: int = 300  # Seconds. Events not processed for this long are woken up by the sweep
+
+    # Event Scheduler (Redis sorted set) in place of Celery countdowns. Check elastic/scheduler.py
+    EVENT_SCHEDULER: bool = False
+    EVENT_SCHEDULE_KEY: str = "encore:schedule"
+    EVENT_SCHEDULER_BATCH_SIZE: int = 500  # Max due Events dispatched in one go
+    EVENT_SCHEDULER_POLL_INTERVAL: float = 0.5  # Seconds. Wait before polling again, when no more Events are due
+    EVENT_SCHEDULER_LEASE: int = 60  # Seconds. Popped Events not dispatched for this long are dispatched again
+
+    # Affinity queues. Tasks of the Events under the same root parent Event (by correlation key) are sent to the same
+    # of the AFFINITY_QUEUES queues "{AFFINITY_QUEUE_PREFIX}.{n}", each consumed by a single worker process
+    # (check docker/scripts/run_celery.sh). 0 to use the default queue.
+    AFFINITY_QUEUES: int = 0
+    AFFINITY_QUEUE_PREFIX: str = "encore.affinity"
+
+    # Optimistic concurrency (Event version & Elastic Event seq_no) in place of locking the Event in the tasks.
+    # Check `_run_optimistic` in elastic/tasks/common.py. Tasks calling ITSM (Creating Ticket, Suppressed & Resolving)
+    # still lock the Event.
+    OPTIMISTIC_CONCURRENCY: bool = False
+    OPTIMISTIC_CONCURRENCY_RETRIES: int = 3  # Re-read & retry on a conflict. Then the Event is retried later.
+
+    # Correlation lookups (Up / Down linking, dedup & parent lookups). Check elastic/lookups.py
+    CORRELATION_LOOKUP: t.Literal["elastic", "redis", "postgres"] = "elastic"
+    CORRELATION_INDEX_PREFIX: str = "encore:corr"  # Redis keys of the Correlation Index (CORRELATION_LOOKUP = redis)
+
+    # Dedup at ingest. Check elastic/dedup.py
+    DEDUP_AT_INGEST: bool = False
+    DEDUP_WINDOW: int = 3600  # Seconds. Fingerprint expires this long after the last Event with it
+    DEDUP_KEY_PREFIX: str = "encore:dedup"
+    DEDUP_SAMPLE_SIZE: int = 5  # Latest duplicates kept on the initial Event (Correlation Rules compacting duplicates)
+
+    # Flapping detection (thresholds per Correlation Rule). Check elastic/flapping.py
+    FLAPPING_KEY_PREFIX: str = "encore:flap"
+    FLAPPING_STATE_TTL: int = 86400  # Seconds. Damping state kept after the last Event (held Up Events run within it)
+
+    # Event storm mode. Check elastic/storm.py
+    EVENT_STORM_DETECTION: bool = False
+    EVENT_STORM_SCOPE: t.Literal["region", "tool", "rule"] = "tool"  # Down Events counted together
+    EVENT_STORM_THRESHOLD: int = 50  # Down Events moving to Creating Ticket within the window, to start a storm
+    EVENT_STORM_WINDOW: int = 60  # Seconds
+    EVENT_STORM_QUIET_TIME: int = 300  # Seconds. Storm ends this long after the last Down Event joined it
+    EVENT_STORM_KEY_PREFIX: str = "encore:storm"
+
+    # Batch Sweeper. Check elastic/tasks/batch_sweep.py
+    BATCH_SWEEP_STATUS: t.List[str] = []  # Statuses (alerted / suppressed) processed in batches, not per-Event tasks
+    BATCH_SWEEP_INTERVAL: int = 30  # Seconds
+    BATCH_SWEEP_PAGE_SIZE: int = 500  # Events locked & processed together
+
+    # Correlation Rule table (check launchpad/cache.py)
+    CORRELATION_RULES_CHANNEL: str = "encore:rules"  # Redis pub/sub channel of the invalidations
+    CORRELATION_RULES_TTL: int = 300  # Seconds. Reloaded after this long, even if no invalidation is received
+
+    # Default retry (backoff) policy per Event status. Correlation Rules can override it.
+    # Check launchpad/retry_policy.py
+    EVENT_RETRY_POLICY: t.Dict[str, t.Dict[str, t.Any]] = {
+        "new": {"base": 10, "factor": 1, "cap": 10},
+        "creating_ticket": {"base": 10, "factor": 2, "cap": 300, "jitter": 0.1},
+        "suppressed": {"base": 10, "factor": 1.5, "cap": 900, "jitter": 0.1},
+        "alerted": {"base": 30, "factor": 1.5, "cap": 900, "jitter": 0.1},
+        "resolving": {"base": 30, "factor": 1.5, "cap": 300, "jitter": 0.1},
+    }
+
+
+correlation_settings = CorrelationSettings()
+
+EVENT_DRIVEN_WAKEUPS = correlation_settings.EVENT_DRIVEN_WAKEUPS
+EVENT_WAKEUP_RETRY_DELAY = correlation_settings.EVENT_WAKEUP_RETRY_DELAY
+EVENT_SWEEP_INTERVAL = correlation_settings.EVENT_SWEEP_INTERVAL
+
+EVENT_SCHEDULER = correlation_settings.EVENT_SCHEDULER
+EVENT_SCHEDULE_KEY = correlation_settings.EVENT_SCHEDULE_KEY
+EVENT_SCHEDULER_BATCH_SIZE = correlation_settings.EVENT_SCHEDULER_BATCH_SIZE
+EVENT_SCHEDULER_POLL_INTERVAL = correlation_settings.EVENT_SCHEDULER_POLL_INTERVAL
+EVENT_SCHEDULER_LEASE = correlation_settings.EVENT_SCHEDULER_LEASE
+
+AFFINITY_QUEUES = correlation_settings.AFFINITY_QUEUES
+AFFINITY_QUEUE_PREFIX = correlation_settings.AFFINITY_QUEUE_PREFIX
+
+OPTIMISTIC_CONCURRENCY = correlation_settings.OPTIMISTIC_CONCURRENCY
+OPTIMISTIC_CONCURRENCY_RETRIES = correlation_settings.OPTIMISTIC_CONCURRENCY_RETRIES
+
+CORRELATION_LOOKUP = correlation_settings.CORRELATION_LOOKUP
+CORRELATION_INDEX_PREFIX = correlation_settings.CORRELATION_INDEX_PREFIX
+
+DEDUP_AT_INGEST = correlation_settings.DEDUP_AT_INGEST
+DEDUP_WINDOW = correlation_settings.DEDUP_WINDOW
+DEDUP_KEY_PREFIX = correlation_settings.DEDUP_KEY_PREFIX
+DEDUP_SAMPLE_SIZE = correlation_settings.DEDUP_SAMPLE_SIZE
+
+FLAPPING_KEY_PREFIX = correlation_settings.FLAPPING_KEY_PREFIX
+FLAPPING_STATE_TTL = correlation_settings.FLAPPING_STATE_TTL
+
+EVENT_STORM_DETECTION = correlation_settings.EVENT_STORM_DETECTION
+EVENT_STORM_SCOPE = correlation_settings.EVENT_STORM_SCOPE
+EVENT_STORM_THRESHOLD = correlation_settings.EVENT_STORM_THRESHOLD
+EVENT_STORM_WINDOW = correlation_settings.EVENT_STORM_WINDOW
+EVENT_STORM_QUIET_TIME = correlation_settings.EVENT_STORM_QUIET_TIME
+EVENT_STORM_KEY_PREFIX = correlation_settings.EVENT_STORM_KEY_PREFIX
+
+BATCH_SWEEP_STATUS = correlation_settings.BATCH_SWEEP_STATUS
+BATCH_SWEEP_INTERVAL = correlation_settings.BATCH_SWEEP_INTERVAL
+BATCH_SWEEP_PAGE_SIZE = correlation_settings.BATCH_SWEEP_PAGE_SIZE
+
+CORRELATION_RULES_CHANNEL = correlation_settings.CORRELATION_RULES_CHANNEL
+CORRELATION_RULES_TTL = correlation_settings.CORRELATION_RULES_TTL
+
+EVENT_RETRY_POLICY = correlation_settings.EVENT_RETRY_POLICY
@@ -0,0 +1,84 @@
+"""Ingest Settings"""
+
+import typing as t
+
+from pydantic_settings import BaseSettings
+
+
+class IngestSettings(BaseSettings):
+    """Ingest Settings class
+    Will use values from env variables else the default values.
+    """
+
+    # Bulk Event Ingestion
+    BULK_INGEST_MAX_EVENTS: int = 10000  # Max events accepted in a single bulk request
+    # Max body size (raw & decompressed) of a bulk request. Bulk requests are not limited by DATA_UPLOAD_MAX_MEMORY_SIZE
+    BULK_INGEST_MAX_BYTES: int = 32 * 1024 * 1024
+    BULK_INGEST_CHUNK_SIZE: int = 500  # Max events handled by a single bulk ingest task
+
+    # Serve `event` and `resolve` views as async views. Use with an ASGI server (check gunicorn_config.py).
+    USE_ASYNC_VIEWS: bool = False
+
+    # Decode JSON payloads with orjson (falls back to json, if orjson is not installed)
+    USE_ORJSON: bool = False
+
+    # Admission control (429 with Retry-After). Check elastic/admission.py. Threshold of 0 disables the check.
+    ADMISSION_CONTROL: bool = False
+    ADMISSION_QUEUES: t.List[str] = ["celery"]  # Celery queues (Redis lists) to watch
+    ADMISSION_MAX_QUEUE_LENGTH: int = 50000  # Total tasks waiting in ADMISSION_QUEUES
+    ADMISSION_MAX_NEW_API_LOGS: int = 100000  # ApiLogs waiting to be ingested
+    ADMISSION_MAX_BUFFER_LENGTH: int = 500000  # Events waiting in the write-ahead buffer
+    ADMISSION_CHECK_INTERVAL: float = 1.0  # Seconds, for which the pressure signals are reused (per process)
+    ADMISSION_RETRY_AFTER: int = 30  # Seconds
+
+    # Idempotency keys. Check elastic/idempotency.py
+    IDEMPOTENCY_KEY_HEADER: str = "Idempotency-Key"
+    IDEMPOTENCY_KEY_FIELD: str = ""  # Payload field holding the key (if the tool cannot set the header)
+    IDEMPOTENCY_KEY_TTL: int = 86400  # Seconds, for which repeats are ignored. 0 disables idempotency keys
+
+    # Process-local cache of IP -> MonitorToolIP (with Monitor Tool). Check launchpad/cache.py
+    MONITOR_TOOL_IP_CACHE_SIZE: int = 1024
+    MONITOR_TOOL_IP_CACHE_TTL: int = 300  # Seconds. 0 disables the cache
+
+    # Write-ahead buffer (Redis Stream) in front of ApiLog persistence. Check elastic/buffer.py
+    INGEST_WRITE_BUFFER: bool = False
+    INGEST_STREAM_NAME: str = "encore:ingest"
+    INGEST_STREAM_MAXLEN: int = 1000000  # Max undrained events. Further events are persisted directly.
+    INGEST_STREAM_GROUP: str = "encore-ingest"
+    INGEST_DRAIN_BATCH_SIZE: int = 500  # Max events read from the stream in one go
+    INGEST_DRAIN_BLOCK_MS: int = 1000  # Wait for new events for this long before polling again
+    INGEST_DRAIN_CLAIM_IDLE_MS: int = 60000  # Reclaim events pending with a (crashed) consumer for this long
+
+
+ingest_settings = IngestSettings()
+
+BULK_INGEST_MAX_EVENTS = ingest_settings.BULK_INGEST_MAX_EVENTS
+BULK_INGEST_MAX_BYTES = ingest_settings.BULK_INGEST_MAX_BYTES
+BULK_INGEST_CHUNK_SIZE = ingest_settings.BULK_INGEST_CHUNK_SIZE
+
+USE_ASYNC_VIEWS = ingest_settings.USE_ASYNC_VIEWS
+
+USE_ORJSON = ingest_settings.USE_ORJSON
+
+ADMISSION_CONTROL = ingest_settings.ADMISSION_CONTROL
+ADMISSION_QUEUES = ingest_settings.ADMISSION_QUEUES
+ADMISSION_MAX_QUEUE_LENGTH = ingest_settings.ADMISSION_MAX_QUEUE_LENGTH
+ADMISSION_MAX_NEW_API_LOGS = ingest_settings.ADMISSION_MAX_NEW_API_LOGS
+ADMISSION_MAX_BUFFER_LENGTH = ingest_settings.ADMISSION_MAX_BUFFER_LENGTH
+ADMISSION_CHECK_INTERVAL = ingest_settings.ADMISSION_CHECK_INTERVAL
+ADMISSION_RETRY_AFTER = ingest_settings.ADMISSION_RETRY_AFTER
+
+IDEMPOTENCY_KEY_HEADER = ingest_settings.IDEMPOTENCY_KEY_HEADER
+IDEMPOTENCY_KEY_FIELD = ingest_settings.IDEMPOTENCY_KEY_FIELD
+IDEMPOTENCY_KEY_TTL = ingest_settings.IDEMPOTENCY_KEY_TTL
+
+MONITOR_TOOL_IP_CACHE_SIZE = ingest_settings.MONITOR_TOOL_IP_CACHE_SIZE
+MONITOR_TOOL_IP_CACHE_TTL = ingest_settings.MONITOR_TOOL_IP_CACHE_TTL
+
+INGEST_WRITE_BUFFER = ingest_settings.INGEST_WRITE_BUFFER
+INGEST_STREAM_NAME = ingest_settings.INGEST_STREAM_NAME
+INGEST_STREAM_MAXLEN = ingest_settings.INGEST_STREAM_MAXLEN
+INGEST_STREAM_GROUP = ingest_settings.INGEST_STREAM_GROUP
+INGEST_DRAIN_BATCH_SIZE = ingest_settings.INGEST_DRAIN_BATCH_SIZE
+INGEST_DRAIN_BLOCK_MS = ingest_settings.INGEST_DRAIN_BLOCK_MS
+INGEST_DRAIN_CLAIM_IDLE_MS = ingest_settings.INGEST_DRAIN_CLAIM_IDLE_MS
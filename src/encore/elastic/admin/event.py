@@ -3,11 +3,30 @@
 from typing import Any
 
 from django.contrib import admin
+from django.db import transaction
 from django.http import HttpRequest
 
+from ..constants import EventExtrasKey
 from ..models import ErrorLog, Event
 
 
+class ParkedFilter(admin.SimpleListFilter):
+    """Filter Events parked by the retry policy"""
+
+    title = "parked"
+    parameter_name = "parked"
+
+    def lookups(self, request, model_admin):
+        return [("1", "Yes"), ("0", "No")]
+
+    def queryset(self, request, queryset):
+        if self.value() == "1":
+            return queryset.filter(extras__has_key=EventExtrasKey.PARKED)
+        if self.value() == "0":
+            return queryset.exclude(extras__has_key=EventExtrasKey.PARKED)
+        return queryset
+
+
 @admin.register(Event)
 class EventAdmin(admin.ModelAdmin):
     """Event Admin Class"""
@@ -24,6 +43,7 @@ class EventAdmin(admin.ModelAdmin):
         "asset_unique_id",
         "asset_type",
         "retry_count",
+        "parked",
     )
     list_filter = (
         "created",
@@ -32,6 +52,7 @@ class EventAdmin(admin.ModelAdmin):
         "status",
         "event_type",
         "monitor_tool_ip__monitor_tool__name",
+        ParkedFilter,
     )
     readonly_fields = (
         "id",
@@ -47,7 +68,12 @@ class EventAdmin(admin.ModelAdmin):
         "event_type",
         "asset_unique_id",
         "asset_type",
+        "monitor_tool_name",
+        "asset_key",
+        "linked_event",
+        "parent_event",
         "retry_count",
+        "version",
         "api_log",
         "monitor_tool_ip",
         "extras",
@@ -57,6 +83,25 @@ class EventAdmin(admin.ModelAdmin):
         "title",
         "asset_unique_id",
     )
+    actions = ["unpark_events"]
+
+    @admin.display(boolean=True)
+    def parked(self, obj: Event) -> bool:
+        """Parked by the retry policy"""
+        return obj.parked
+
+    @admin.action(description="Unpark selected events")
+    def unpark_events(self, request: HttpRequest, queryset):
+        """Reset the retry count of the parked Events and retry them"""
+        from elastic.tasks.common import task_handler  # pylint: disable=import-outside-toplevel
+
+        with transaction.atomic():
+            events = list(queryset.select_for_update().filter(extras__has_key=EventExtrasKey.PARKED))
+            for event in events:
+                event.retry_count = 0
+                event.save()
+                task_handler(event)
+        self.message_user(request, f"Unparked {len(events)} events.")
 
     def has_add_permission(self, request: HttpRequest) -> bool:
         return False
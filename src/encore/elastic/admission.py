@@ -0,0 +1,166 @@
+"""Admission Control for the Ingest Endpoints
+
+Events are rejected with 429 (and Retry-After) when
+- the correlator is falling behind, i.e. any of the pressure signals (Celery queue length, NEW ApiLogs, write-ahead
+  buffer length) crosses its threshold. Signals are cached for ADMISSION_CHECK_INTERVAL seconds per process.
+- the Monitor Tool crosses its `ingest_quota_per_minute` (fixed window counter in Redis). Only the events being
+  accepted are counted: the quota is charged after validation & the idempotency check.
+
+Rejections are counted in Redis (check `rejection_counts`).
+"""
+
+import logging
+import threading
+import time
+import typing as t
+
+import redis
+
+from django.conf import settings
+from django.http import HttpResponse
+
+from elastic.models import ApiLog
+from launchpad.cache import monitor_tool_ip_cache
+from launchpad.models import MonitorToolIP
+
+logger = logging.getLogger("correlator.elastic.admission")
+
+REJECTION_COUNTS_KEY = "encore:admission:rejected"
+QUOTA_KEY_PREFIX = "encore:admission:quota"
+
+
+class Rejection(t.NamedTuple):
+    """Reason & Retry-After (seconds) of a rejection"""
+
+    reason: str
+    retry_after: int
+
+
+class _PressureSignals:
+    """Pressure signals, cached for ADMISSION_CHECK_INTERVAL seconds"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._checked_at = 0.0
+        self._signals: t.Dict[str, int] = {}
+
+    def _read(self) -> t.Dict[str, int]:
+        signals = {}
+        try:
+            if settings.ADMISSION_MAX_QUEUE_LENGTH:
+                pipe = settings.REDIS_CLIENT.pipeline()
+                for queue in settings.ADMISSION_QUEUES:
+                    pipe.llen(queue)
+                signals["queue"] = sum(pipe.execute())
+            if settings.ADMISSION_MAX_BUFFER_LENGTH and settings.INGEST_WRITE_BUFFER:
+                signals["buffer"] = settings.REDIS_CLIENT.xlen(settings.INGEST_STREAM_NAME)
+        except redis.RedisError as e:
+            logger.error("Failed to read pressure signals from Redis: %s", str(e))
+        if settings.ADMISSION_MAX_NEW_API_LOGS:
+            signals["api_log"] = ApiLog.objects.filter(status=ApiLog.Status.NEW).count()
+        return signals
+
+    def get(self) -> t.Dict[str, int]:
+        """Current pressure signals"""
+        with self._lock:
+            if time.monotonic() - self._checked_at >= settings.ADMISSION_CHECK_INTERVAL:
+                self._signals = self._read()
+                self._checked_at = time.monotonic()
+            return self._signals
+
+
+pressure_signals = _PressureSignals()
+
+
+def _check_pressure() -> t.Optional[Rejection]:
+    thresholds = {
+        "queue": settings.ADMISSION_MAX_QUEUE_LENGTH,
+        "api_log": settings.ADMISSION_MAX_NEW_API_LOGS,
+        "buffer": settings.ADMISSION_MAX_BUFFER_LENGTH,
+    }
+    for signal, value in pressure_signals.get().items():
+        if value >= thresholds[signal]:
+            return Rejection(reason=signal, retry_after=settings.ADMISSION_RETRY_AFTER)
+    return None
+
+
+def _check_quota(remote_ip: str, num_events: int) -> t.Optional[Rejection]:
+    try:
+        monitor_tool = monitor_tool_ip_cache.get(remote_ip).monitor_tool
+    except MonitorToolIP.DoesNotExist:
+        return None
+    if not monitor_tool or not monitor_tool.ingest_quota_per_minute:
+        return None
+
+    now = time.time()
+    window = int(now // 60)
+    key = f"{QUOTA_KEY_PREFIX}:{monitor_tool.pk}:{window}"
+    try:
+        pipe = settings.REDIS_CLIENT.pipeline()
+        pipe.incrby(key, num_events)
+        pipe.expire(key, 120)
+        count, _ = pipe.execute()
+        if count <= monitor_tool.ingest_quota_per_minute:
+            return None
+        # Quota counts only the accepted events
+        settings.REDIS_CLIENT.decrby(key, num_events)
+    except redis.RedisError as e:
+        logger.error("Failed to check ingest quota of %s: %s", monitor_tool.name, str(e))
+        return None
+    return Rejection(reason=f"quota:{monitor_tool.name}", retry_after=max(int((window + 1) * 60 - now), 1))
+
+
+def _count_rejection(remote_ip: str, num_events: int, rejection: Rejection):
+    logger.warning("Rejected %s events from %s [%s]", num_events, remote_ip, rejection.reason)
+    try:
+        settings.REDIS_CLIENT.hincrby(REJECTION_COUNTS_KEY, rejection.reason, num_events)
+    except redis.RedisError as e:
+        logger.error("Failed to count rejection: %s", str(e))
+
+
+def check_admission(remote_ip: str, num_events: int = 1) -> t.Optional[Rejection]:
+    """Rejection, if the correlator is falling behind. Cheap enough to check before the request is parsed."""
+    if not settings.ADMISSION_CONTROL:
+        return None
+    if rejection := _check_pressure():
+        _count_rejection(remote_ip, num_events, rejection)
+    return rejection
+
+
+def charge_quota(remote_ip: str, num_events: int = 1) -> t.Optional[Rejection]:
+    """Rejection, if the events cross the quota of the Monitor Tool. Else they are counted against it.
+
+    Charge only the events being accepted, i.e. after validation & the idempotency check.
+    """
+    if not settings.ADMISSION_CONTROL or num_events <= 0:
+        return None
+    if rejection := _check_quota(remote_ip, num_events):
+        _count_rejection(remote_ip, num_events, rejection)
+    return rejection
+
+
+def _rejection_response(rejection: Rejection) -> HttpResponse:
+    response = HttpResponse(f"Too many requests [{rejection.reason}]", status=429)
+    response["Retry-After"] = str(rejection.retry_after)
+    return response
+
+
+def admit(remote_ip: str, num_events: int = 1) -> t.Optional[HttpResponse]:
+    """429 response, if the correlator is falling behind (check `check_admission`)"""
+    if rejection := check_admission(remote_ip, num_events):
+        return _rejection_response(rejection)
+    return None
+
+
+def admit_quota(remote_ip: str, num_events: int = 1) -> t.Optional[HttpResponse]:
+    """429 response, if the events cross the quota of the Monitor Tool (check `charge_quota`)"""
+    if rejection := charge_quota(remote_ip, num_events):
+        return _rejection_response(rejection)
+    return None
+
+
+def rejection_counts() -> t.Dict[str, int]:
+    """Number of events rejected, by reason"""
+    return {
+        reason.decode(): int(count) for reason, count in settings.REDIS_CLIENT.hgetall(REJECTION_COUNTS_KEY).items()
+    }
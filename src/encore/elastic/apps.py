@@ -8,3 +8,6 @@ class ElasticConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "elastic"
+
+    def ready(self) -> None:
+        from . import signals  # NOQA pylint: disable=import-outside-toplevel,unused-import
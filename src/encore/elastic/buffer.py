@@ -0,0 +1,205 @@
+"""Ingest Write-Ahead Buffer
+
+Events are appended to a Redis Stream by the views and acknowledged immediately. The `drain_ingest_buffer`
+command reads the stream via a consumer group, bulk inserts the ApiLogs and dispatches the ingest tasks.
+
+- The stream is bounded by INGEST_STREAM_MAXLEN. Append is refused (not trimmed) when the stream is full, so that
+  an accepted event is never dropped. The views then fall back to persisting the ApiLog directly.
+- Entries are acked & deleted only after the ApiLogs are committed. Entries left pending by a crashed consumer
+  are reclaimed (XAUTOCLAIM) by the others. `ApiLog.buffer_entry_id` makes the drain idempotent.
+"""
+
+import json
+import logging
+import typing as t
+from datetime import datetime
+
+import redis
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.transaction import atomic, on_commit
+from django.utils import timezone
+
+from elastic.models import ApiLog
+from elastic.tasks import bulk_ingest_events
+from elastic.ulid import new_ulid
+from launchpad.cache import monitor_tool_ip_cache
+
+logger = logging.getLogger("correlator.elastic.buffer")
+
+# Append all the entries (ARGV[2:]) only if the stream has room for all of them
+_APPEND_SCRIPT = settings.REDIS_CLIENT.register_script(
+    """
+    if redis.call('XLEN', KEYS[1]) + #ARGV - 1 > tonumber(ARGV[1]) then
+        return false
+    end
+    local ids = {}
+    for i = 2, #ARGV do
+        ids[#ids + 1] = redis.call('XADD', KEYS[1], '*', 'data', ARGV[i])
+    end
+    return ids
+    """
+)
+
+
+def make_entry(
+    remote_ip: str,
+    method: str,
+    task_data: t.Dict[str, t.Any],
+    created: t.Optional[datetime] = None,
+    event_uid: t.Optional[str] = None,
+) -> str:
+    """Serialize an event to a stream entry"""
+    return json.dumps(
+        {
+            "remote_ip": remote_ip,
+            "method": method,
+            # NOTE: DjangoJSONEncoder drops the microseconds
+            "created": (created or timezone.now()).isoformat(),
+            "event_uid": event_uid or new_ulid(),
+            "task_data": task_data,
+        },
+        cls=DjangoJSONEncoder,
+    )
+
+
+def append_entries(entries: t.List[str]) -> t.Optional[t.List[str]]:
+    """Append the entries to the stream.
+
+    Returns the stream entry IDs, or None if the entries were not appended (stream is full or Redis is down).
+    """
+    try:
+        entry_ids = _APPEND_SCRIPT(keys=[settings.INGEST_STREAM_NAME], args=[settings.INGEST_STREAM_MAXLEN, *entries])
+    except redis.RedisError as e:
+        logger.error("Failed to append %s events to ingest buffer: %s", len(entries), str(e))
+        return None
+    if entry_ids is None:
+        logger.warning(
+            "Ingest buffer is full [%s], failed to append %s events", settings.INGEST_STREAM_MAXLEN, len(entries)
+        )
+        return None
+    return [entry_id.decode() for entry_id in entry_ids]
+
+
+def append_event(remote_ip: str, method: str, task_data: t.Dict[str, t.Any]) -> t.Optional[str]:
+    """Append a single event to the stream. Returns the stream entry ID, or None if not appended."""
+    entry_ids = append_entries([make_entry(remote_ip, method, task_data)])
+    return entry_ids[0] if entry_ids else None
+
+
+class BufferConsumer:
+    """Consumer (of the consumer group) draining the ingest buffer into ApiLog"""
+
+    def __init__(self, name: str) -> None:
+        self.name = name
+        self.redis = settings.REDIS_CLIENT
+        self.stream = settings.INGEST_STREAM_NAME
+        self.group = settings.INGEST_STREAM_GROUP
+        self._claim_cursor = "0-0"
+
+    def ensure_group(self):
+        """Create the consumer group (and the stream) if it does not exist"""
+        try:
+            self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except redis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def leave_group(self):
+        """Remove this consumer from the group, if nothing is pending with it"""
+        pending = self.redis.xpending_range(self.stream, self.group, min="-", max="+", count=1, consumername=self.name)
+        if not pending:
+            self.redis.xgroup_delconsumer(self.stream, self.group, self.name)
+
+    def read(self, block_ms: int) -> t.List[t.Tuple[bytes, t.Dict[bytes, bytes]]]:
+        """Read a batch of entries. Entries idle with other (crashed) consumers are reclaimed first."""
+        self._claim_cursor, entries, deleted_ids = self.redis.xautoclaim(
+            self.stream,
+            self.group,
+            self.name,
+            min_idle_time=settings.INGEST_DRAIN_CLAIM_IDLE_MS,
+            start_id=self._claim_cursor,
+            count=settings.INGEST_DRAIN_BATCH_SIZE,
+        )
+        if deleted_ids:
+            # Should not happen, as the stream is never trimmed
+            logger.error("Ingest buffer entries deleted before being drained: %s", deleted_ids)
+            self.ack(deleted_ids)
+        if entries:
+            logger.info("[%s] Reclaimed %s pending entries", self.name, len(entries))
+            return entries
+
+        response = self.redis.xreadgroup(
+            self.group,
+            self.name,
+            {self.stream: ">"},
+            count=settings.INGEST_DRAIN_BATCH_SIZE,
+            block=block_ms,
+        )
+        return response[0][1] if response else []
+
+    def ack(self, entry_ids: t.List[bytes | str]):
+        """Ack & delete the entries, so that the stream only holds undrained events"""
+        pipe = self.redis.pipeline()
+        pipe.xack(self.stream, self.group, *entry_ids)
+        pipe.xdel(self.stream, *entry_ids)
+        pipe.execute()
+
+    def drain(self, block_ms: int) -> int:
+        """Drain one batch of entries into ApiLog. Returns the number of entries read."""
+        entries = self.read(block_ms)
+        if entries:
+            self.persist(entries)
+        return len(entries)
+
+    @atomic
+    def persist(self, entries: t.List[t.Tuple[bytes, t.Dict[bytes, bytes]]]):
+        """Bulk insert the ApiLogs and dispatch the ingest tasks, once committed"""
+        entry_ids = [entry_id.decode() for entry_id, _fields in entries]
+
+        # Entries already drained, but not acked (crash before ack)
+        existing = dict(ApiLog.objects.filter(buffer_entry_id__in=entry_ids).values_list("buffer_entry_id", "status"))
+        api_logs: t.List[ApiLog] = []
+        for entry_id, fields in entries:
+            entry_id = entry_id.decode()
+            if entry_id in existing:
+                continue
+            try:
+                entry = json.loads(fields[b"data"])
+                api_logs.append(
+                    ApiLog(
+                        remote_ip=entry["remote_ip"],
+                        method=entry["method"],
+                        task=ApiLog.TaskType.EVENT,
+                        task_data=entry["task_data"],
+                        created=datetime.fromisoformat(entry["created"]),
+                        event_uid=entry.get("event_uid") or new_ulid(),
+                        buffer_entry_id=entry_id,
+                    )
+                )
+            except (KeyError, ValueError) as e:
+                logger.error("[%s] Dropping malformed ingest buffer entry %s: %s", self.name, entry_id, str(e))
+
+        # `bulk_create` does not call `ApiLog.save()`
+        for remote_ip in {api_log.remote_ip for api_log in api_logs}:
+            monitor_tool_ip_cache.get_or_create(remote_ip)
+        ApiLog.objects.bulk_create(api_logs)
+
+        api_log_ids = [api_log.pk for api_log in api_logs]
+        # Dispatch might not have happened for the existing ones. Task ignores ApiLogs that are no longer NEW.
+        api_log_ids += ApiLog.objects.filter(
+            buffer_entry_id__in=[entry_id for entry_id, status in existing.items() if status == ApiLog.Status.NEW]
+        ).values_list("pk", flat=True)
+        for i in range(0, len(api_log_ids), settings.BULK_INGEST_CHUNK_SIZE):
+            chunk = api_log_ids[i : i + settings.BULK_INGEST_CHUNK_SIZE]
+            on_commit(lambda chunk=chunk: bulk_ingest_events.delay(api_logs=chunk))
+        on_commit(lambda: self.ack(entry_ids))
+
+        logger.info(
+            "[%s] Drained %s entries: Created [%s], Already Drained [%s]",
+            self.name,
+            len(entry_ids),
+            len(api_logs),
+            len(existing),
+        )
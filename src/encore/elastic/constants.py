@@ -51,6 +51,14 @@ COMPLETE_EVENT_STATUS = {
     EventStatus.ERROR,
 }
 
+# Events waiting on a change made elsewhere (to them or to their parent / child / linked Events).
+# With EVENT_DRIVEN_WAKEUPS, these are not polled. Check `task_handler` in elastic/tasks/common.py
+WAKEUP_EVENT_STATUS = {
+    EventStatus.SUPPRESSED,
+    EventStatus.ALERTED,
+    EventStatus.RESOLVING,
+}
+
 NON_ACTIVE_EVENT_STATUS = set(EventStatus) - ACTIVE_EVENT_STATUS
 NON_COMPLETE_EVENT_STATUS = set(EventStatus) - COMPLETE_EVENT_STATUS
 
@@ -128,6 +136,11 @@ class FieldNames(TextChoices):
     LINKED_EVENT = "linked_event_id"
     LINKED_EVENT_INDEX = "linked_event_index"
     ITSM_TICKET = "itsm_ticket"
+    # # Duplicate Compaction Info [Process] - Duplicates folded into the initial Event (check elastic/tasks/ingest.py)
+    DUP_COUNT = "dup_count"
+    FIRST_SEEN_TS = "first_seen_ts"  # Event TimeStamp of the initial Event
+    LAST_SEEN_TS = "last_seen_ts"  # Latest Event TimeStamp of the duplicates
+    DUP_SAMPLES = "dup_samples"  # Latest duplicates (event ts, received ts & event details)
 
 
 class EventExtrasKey(TextChoices):
@@ -136,3 +149,4 @@ class EventExtrasKey(TextChoices):
     TICKET_ID = "ticket_id"
     TICKET_COMMENT_ASSET_IS_DOWN = "asset_down_comment"  # A comment was added to ticket that the Asset is Down
     TICKET_COMMENT_ASSET_IS_UP = "asset_up_comment"  # A comment was added to ticket that the Asset is Up
+    PARKED = "parked"  # Retries exceeded the max retries of the retry policy. Not retried until unparked.
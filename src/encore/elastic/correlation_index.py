@@ -0,0 +1,210 @@
+"""Active Event Correlation Index (CORRELATION_LOOKUP = "redis")
+
+Active (not linked) Down Events by the normalized (monitor tool name, event title, asset unique id) key, in Redis
+sorted sets: the member is "{doc_index}|{doc_id}" and the score is the event timestamp. Check elastic/lookups.py
+
+- Maintained on every transition: Event post_save signal (elastic/signals.py), bulk ingest, batch sweep & Up linking.
+- Hits are verified against Elastic (mget) by the lookups and stale members are removed, so a missed removal is
+  harmless. A missed addition is not: the ready marker is cleared when an addition fails.
+- The index is used only while the ready marker exists. It is set by the `rebuild_correlation_index` command and is
+  lost with the Redis data, in which case the lookups fall back to Elastic until the index is rebuilt.
+"""
+
+import logging
+import typing as t
+
+import redis
+
+from django.conf import settings
+
+from elastic.constants import ACTIVE_EVENT_STATUS, EVENT_INDEX_RE, EventType, FieldNames
+from elastic.utils import SearchResponseType, correlation_key, parse_event_ts
+
+if t.TYPE_CHECKING:
+    from elastic.models import Event
+    from elastic.utils import CorrelatorElastic
+
+logger = logging.getLogger("correlator.elastic.correlation_index")
+
+REBUILD_PAGE_SIZE = 1000
+
+
+def _ready_key() -> str:
+    return f"{settings.CORRELATION_INDEX_PREFIX}:ready"
+
+
+def index_key(tool_name: str, title: str, asset_unique_id: str) -> str:
+    """Redis key of the (monitor tool name, event title, asset unique id). Asset unique id is case insensitive."""
+    return f"{settings.CORRELATION_INDEX_PREFIX}:key:{correlation_key(tool_name, title, asset_unique_id)}"
+
+
+def member(doc_index: str, doc_id: str) -> str:
+    """Index member of the Elastic Event"""
+    return f"{doc_index}|{doc_id}"
+
+
+def score(event_ts: t.Any) -> t.Optional[float]:
+    """Index score of the event timestamp. None if it cannot be parsed (check `parse_event_ts`)."""
+    if (_event_ts := parse_event_ts(event_ts)) is None:
+        return None
+    return _event_ts.timestamp()
+
+
+def is_ready() -> bool:
+    """Index is (re)built and can be used for the lookups"""
+    try:
+        return bool(settings.REDIS_CLIENT.exists(_ready_key()))
+    except redis.RedisError as e:
+        logger.error("Failed to check the correlation index: %s", str(e))
+        return False
+
+
+def set_ready(ready: bool = True):
+    """Set (or clear) the ready marker"""
+    if ready:
+        settings.REDIS_CLIENT.set(_ready_key(), 1)
+    else:
+        settings.REDIS_CLIENT.delete(_ready_key())
+
+
+def _event_key(event: "Event") -> str:
+    return f"{settings.CORRELATION_INDEX_PREFIX}:key:{event.correlation_key}"
+
+
+def _event_score(event: "Event") -> float:
+    """Index score of the Event. Its created timestamp if the event timestamp cannot be parsed."""
+    if (_score := score(event.event_ts)) is None:
+        return event.created.timestamp()
+    return _score
+
+
+def add_events(events: t.Iterable["Event"]):
+    """Add the active Down Events to the index"""
+    entries = [
+        (_event_key(event), member(event.doc_index, event.doc_id), _event_score(event))
+        for event in events
+        if event.event_type == EventType.DOWN and event.status in ACTIVE_EVENT_STATUS
+    ]
+    if settings.CORRELATION_LOOKUP != "redis" or not entries:
+        return
+    try:
+        pipe = settings.REDIS_CLIENT.pipeline(transaction=False)
+        for key, _member, _score in entries:
+            pipe.zadd(key, {_member: _score})
+        pipe.execute()
+    except redis.RedisError as e:
+        logger.error("Failed to add %s Events to the correlation index: %s", len(entries), str(e))
+        # The index misses these Events. Stop using it until it is rebuilt.
+        try:
+            set_ready(False)
+        except redis.RedisError:
+            pass
+
+
+def remove_members(entries: t.Iterable[t.Tuple[str, str]]):
+    """Remove the (key, member) entries from the index"""
+    if settings.CORRELATION_LOOKUP != "redis" or not (entries := list(entries)):
+        return
+    try:
+        pipe = settings.REDIS_CLIENT.pipeline(transaction=False)
+        for key, _member in entries:
+            pipe.zrem(key, _member)
+        pipe.execute()
+    except redis.RedisError as e:
+        # Stale members are removed by the lookups
+        logger.warning("Failed to remove %s members from the correlation index: %s", len(entries), str(e))
+
+
+def remove_events(events: t.Iterable["Event"]):
+    """Remove the Events (no longer active) from the index"""
+    remove_members((_event_key(event), member(event.doc_index, event.doc_id)) for event in events)
+
+
+def remove_elastic_events(elk_events: t.Iterable[t.Dict[str, t.Any]]):
+    """Remove the Elastic Events (hits) from the index"""
+    remove_members(
+        (
+            index_key(
+                elk_event["_source"][FieldNames.TOOL_NAME],
+                elk_event["_source"][FieldNames.EVENT_TITLE],
+                elk_event["_source"][FieldNames.ASSET_UNIQUE_ID],
+            ),
+            member(elk_event["_index"], elk_event["_id"]),
+        )
+        for elk_event in elk_events
+    )
+
+
+def get_members(
+    key: str, until_ts: t.Optional[float] = None, latest_first: bool = False, start: int = 0, count: int = 10
+) -> t.List[t.List[str]]:
+    """[doc_index, doc_id] of the key (with the event timestamp up to `until_ts`), ordered by the event timestamp"""
+    max_score = "+inf" if until_ts is None else until_ts
+    if latest_first:
+        members = settings.REDIS_CLIENT.zrevrangebyscore(key, max_score, "-inf", start=start, num=count)
+    else:
+        members = settings.REDIS_CLIENT.zrangebyscore(key, "-inf", max_score, start=start, num=count)
+    return [_member.decode().split("|", 1) for _member in members]
+
+
+def rebuild(es: "CorrelatorElastic", clear: bool = False) -> int:
+    """Add all the active (not linked) Down Events in Elastic to the index, then set the ready marker.
+    Returns the number of Events added.
+    """
+    set_ready(False)
+    if clear:
+        for key in settings.REDIS_CLIENT.scan_iter(match=f"{settings.CORRELATION_INDEX_PREFIX}:key:*", count=1000):
+            settings.REDIS_CLIENT.delete(key)
+
+    response = es.search(
+        index=EVENT_INDEX_RE,
+        query={
+            "bool": {
+                "must_not": {"exists": {"field": FieldNames.LINKED_EVENT}},
+                "must": [{"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}}],
+                "should": [
+                    {"term": {f"{FieldNames.EVENT_STATUS}.keyword": _estatus}} for _estatus in ACTIVE_EVENT_STATUS
+                ],
+                "minimum_should_match": 1,
+            }
+        },
+        source=[
+            FieldNames.TOOL_NAME,
+            FieldNames.EVENT_TITLE,
+            FieldNames.ASSET_UNIQUE_ID,
+            FieldNames.EVENT_TS,
+            FieldNames.RECEIVED_TS,
+        ],
+        size=REBUILD_PAGE_SIZE,
+        scroll="5m",
+        response_type=SearchResponseType.RAW,
+    )
+    added = 0
+    try:
+        while elk_events := response["hits"]["hits"]:
+            pipe = settings.REDIS_CLIENT.pipeline(transaction=False)
+            for elk_event in elk_events:
+                elk_event_src = elk_event["_source"]
+                # Received timestamp if the event timestamp cannot be parsed
+                if (_score := score(elk_event_src.get(FieldNames.EVENT_TS))) is None and (
+                    _score := score(elk_event_src.get(FieldNames.RECEIVED_TS))
+                ) is None:
+                    logger.warning("Skipping Event with an invalid Event Timestamp: %s", elk_event["_id"])
+                    continue
+                pipe.zadd(
+                    index_key(
+                        elk_event_src.get(FieldNames.TOOL_NAME),
+                        elk_event_src.get(FieldNames.EVENT_TITLE),
+                        elk_event_src.get(FieldNames.ASSET_UNIQUE_ID),
+                    ),
+                    {member(elk_event["_index"], elk_event["_id"]): _score},
+                )
+                added += 1
+            pipe.execute()
+            response = es.scroll(scroll_id=response["_scroll_id"], scroll="5m")
+    finally:
+        es.clear_scroll(scroll_id=response["_scroll_id"])
+
+    set_ready()
+    logger.info("Rebuilt the correlation index: %s Events", added)
+    return added
@@ -0,0 +1,122 @@
+"""Dedup at Ingest (DEDUP_AT_INGEST)
+
+A Down Event is a duplicate of the active Down Event with the same fingerprint (monitor tool name, event title,
+normalized asset unique id, event type) received before it: the initial Event. A duplicate is linked to its initial
+Event & marked DEDUPED by the ingest task itself, instead of by the NewDownEvent task.
+
+Fingerprints are kept in Redis: {DEDUP_KEY_PREFIX}:{sha1 of the fingerprint} -> initial Event, expiring DEDUP_WINDOW
+seconds after the last Event with the fingerprint (sliding window). The initial Event is checked to still be active in
+Postgres, else the Event takes its place. An Up Event drops the fingerprint of its Down Events, unless it is held as
+the asset is flapping (check elastic/flapping.py).
+Duplicates not found here (e.g. Redis is down, window expired) are still deduped by the NewDownEvent task.
+"""
+
+import hashlib
+import json
+import logging
+import typing as t
+
+import redis
+
+from django.conf import settings
+
+from elastic.constants import ACTIVE_EVENT_STATUS, EventStatus, EventType
+from elastic.models import Event
+from elastic.utils import correlation_key, parse_event_ts
+
+logger = logging.getLogger("correlator.elastic.dedup")
+
+# Initial Event of each fingerprint (KEYS): the existing one, whose window is extended, else the one in ARGV[i + 1]
+_CLAIM_SCRIPT = settings.REDIS_CLIENT.register_script(
+    """
+    local initials = {}
+    for i, key in ipairs(KEYS) do
+        local initial = redis.call('GET', key)
+        if initial then
+            redis.call('EXPIRE', key, ARGV[1])
+        else
+            redis.call('SET', key, ARGV[i + 1], 'EX', ARGV[1])
+        end
+        initials[i] = initial
+    end
+    return initials
+    """
+)
+
+
+def fingerprint_key(event: Event, event_type: t.Optional[str] = None) -> str:
+    """Redis key of the fingerprint of the Event (as of the event type, if given)"""
+    _correlation_key = correlation_key(event.monitor_tool_name, event.title, event.asset_unique_id)
+    fingerprint = f"{event_type or event.event_type}:{_correlation_key}"
+    return f"{settings.DEDUP_KEY_PREFIX}:{hashlib.sha1(fingerprint.encode()).hexdigest()}"
+
+
+def find_initial_events(events: t.List[Event], damped: t.Optional[t.Set[str]] = None) -> t.Dict[str, t.Tuple[str, str]]:
+    """(index, doc id) of the initial Event of each duplicate New Down Event, by doc id.
+    Events are in the order received. Fingerprints of the Down Events of the Up Events are dropped, except for the
+    Up Events received while damped (doc ids in `damped`).
+    """
+    damped = damped or set()
+    down_events = [event for event in events if event.event_type == EventType.DOWN and event.status == EventStatus.NEW]
+    up_events = [event for event in events if event.event_type == EventType.UP and event.doc_id not in damped]
+    if not down_events and not up_events:
+        return {}
+
+    keys = [fingerprint_key(event) for event in down_events]
+    members = [json.dumps([event.doc_index, event.doc_id]) for event in down_events]
+    try:
+        initials = (
+            _CLAIM_SCRIPT(keys=keys, args=[settings.DEDUP_WINDOW, *members], client=settings.REDIS_CLIENT)
+            if down_events
+            else []
+        )
+        if up_events:
+            settings.REDIS_CLIENT.delete(*{fingerprint_key(event, EventType.DOWN) for event in up_events})
+    except redis.RedisError as e:
+        logger.error("Failed to dedup %s Events at ingest: %s", len(events), str(e))
+        return {}
+
+    candidates = {
+        event.doc_id: tuple(json.loads(initial))
+        for event, initial in zip(down_events, initials)
+        if initial is not None and json.loads(initial)[1] != event.doc_id
+    }
+    if not candidates:
+        return {}
+
+    # Initial Events are active Down Events, either of this batch (claimed the fingerprint above) or in Postgres.
+    # Event timestamps of this batch are as received: if it cannot be parsed, the received timestamp is used.
+    initial_event_ts = {event.doc_id: parse_event_ts(event.event_ts) or event.api_log.created for event in down_events}
+    initial_event_ts.update(
+        (doc_id, parse_event_ts(event_ts))
+        for doc_id, event_ts in Event.objects.filter(
+            doc_id__in={doc_id for _, doc_id in candidates.values()} - initial_event_ts.keys(),
+            event_type=EventType.DOWN,
+            status__in=ACTIVE_EVENT_STATUS,
+            linked_event__isnull=True,
+        ).values_list("doc_id", "event_ts")
+    )
+
+    initial_events = {}
+    stale = {}
+    for key, member, event in zip(keys, members, down_events):
+        if not (initial := candidates.get(event.doc_id)):
+            continue
+        if key in stale:
+            # Event of this batch took the place of the initial Event
+            initial = tuple(json.loads(stale[key]))
+        if (ts := initial_event_ts.get(initial[1])) is None:
+            # Initial Event is no longer active. This Event takes its place.
+            stale[key] = member
+        elif (event_ts := parse_event_ts(event.event_ts)) is not None and ts <= event_ts:
+            # Event with an event timestamp that cannot be parsed is not a duplicate
+            initial_events[event.doc_id] = initial
+    if stale:
+        try:
+            pipe = settings.REDIS_CLIENT.pipeline(transaction=False)
+            for key, member in stale.items():
+                pipe.set(key, member, ex=settings.DEDUP_WINDOW)
+            pipe.execute()
+        except redis.RedisError as e:
+            logger.warning("Failed to replace %s stale fingerprints: %s", len(stale), str(e))
+    return initial_events
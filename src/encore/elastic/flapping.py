@@ -0,0 +1,145 @@
+"""Flapping Detection & Damping
+
+An asset flapping between Down & Up runs the whole correlation chain on each cycle (link, resolve, ticket comments &
+a New Down Event again). Transitions (Down <-> Up) are counted per correlation key (monitor tool name, event title,
+asset unique id) over the sliding `flap_window` of the Correlation Rule. Once `flap_threshold` is reached, the key is
+damped until no transition is received for `flap_stable_time` seconds:
+- Down Events are deduped onto the open Down Event, as usual (check elastic/dedup.py & the NewDownEvent task).
+- Up Events received meanwhile are held by the NewUpEvent task, so the open Down Event is not resolved.
+Once stable, the latest Up Event resolves the open Down Event if the asset is Up (last transition). The other held
+Up Events are absorbed (DEDUPED).
+
+Transitions are recorded by the ingest tasks in Redis: {FLAPPING_KEY_PREFIX}:{sha1 of the correlation key} holds the
+damping state & ...:t the transitions in the window.
+"""
+
+import hashlib
+import json
+import logging
+import time
+import typing as t
+from enum import StrEnum
+
+import redis
+
+from django.conf import settings
+
+from elastic.constants import EventType
+from elastic.models import Event
+
+logger = logging.getLogger("correlator.elastic.flapping")
+
+# KEYS: state, transitions. ARGV: now, doc id, event type, Up Event (index & doc id) or "", window, threshold,
+# stable time, state ttl. Returns 1 if damped.
+_RECORD_SCRIPT = settings.REDIS_CLIENT.register_script(
+    """
+    local now = tonumber(ARGV[1])
+    if ARGV[4] ~= '' then
+        redis.call('HSET', KEYS[1], 'last_up', ARGV[4])
+    end
+    redis.call('EXPIRE', KEYS[1], ARGV[8])
+    local damped_until = tonumber(redis.call('HGET', KEYS[1], 'damped_until') or '0')
+    if redis.call('HGET', KEYS[1], 'last_type') ~= ARGV[3] then
+        redis.call('HSET', KEYS[1], 'last_type', ARGV[3])
+        redis.call('ZADD', KEYS[2], now, ARGV[2])
+        redis.call('ZREMRANGEBYSCORE', KEYS[2], '-inf', now - tonumber(ARGV[5]))
+        redis.call('EXPIRE', KEYS[2], ARGV[5])
+        if damped_until > now then
+            damped_until = now + tonumber(ARGV[7])
+            redis.call('HSET', KEYS[1], 'damped_until', tostring(damped_until))
+        elseif redis.call('ZCARD', KEYS[2]) >= tonumber(ARGV[6]) then
+            damped_until = now + tonumber(ARGV[7])
+            redis.call('HSET', KEYS[1], 'damped_since', tostring(now), 'damped_until', tostring(damped_until))
+        end
+    end
+    if damped_until > now then
+        return 1
+    end
+    return 0
+    """
+)
+
+
+class FlapAction(StrEnum):
+    """Action on an Up Event (NewUpEvent task)"""
+
+    PROCESS = "process"  # Not damped
+    HOLD = "hold"  # Received while damped & still damped
+    ABSORB = "absorb"  # Received while damped, superseded by a later transition
+
+
+class UpEventDamping(t.NamedTuple):
+    """Damping of an Up Event"""
+
+    action: FlapAction
+    latest_up_event: t.Optional[t.Tuple[str, str]] = None  # (index, doc id) of the latest Up Event
+
+
+def _key(event: Event) -> str:
+    return f"{settings.FLAPPING_KEY_PREFIX}:{hashlib.sha1(event.correlation_key.encode()).hexdigest()}"
+
+
+def _flap_rule(event: Event):
+    if event.event_type in (EventType.DOWN, EventType.UP) and (rule := event.correlation_rule) and rule.flap_threshold:
+        return rule
+    return None
+
+
+def record_transitions(events: t.List[Event]) -> t.Set[str]:
+    """Record the transitions of the Events (in the order received) of the Correlation Rules detecting flapping.
+    Returns the doc ids of the Events received while damped.
+    """
+    now = time.time()
+    try:
+        pipe = settings.REDIS_CLIENT.pipeline(transaction=False)
+        recorded = []
+        for event in events:
+            if not (rule := _flap_rule(event)):
+                continue
+            key = _key(event)
+            _RECORD_SCRIPT(
+                keys=[key, f"{key}:t"],
+                args=[
+                    now,
+                    event.doc_id,
+                    event.event_type,
+                    json.dumps([event.doc_index, event.doc_id]) if event.event_type == EventType.UP else "",
+                    rule.flap_window,
+                    rule.flap_threshold,
+                    rule.flap_stable_time,
+                    settings.FLAPPING_STATE_TTL,
+                ],
+                client=pipe,
+            )
+            recorded.append(event.doc_id)
+        if not recorded:
+            return set()
+        return {doc_id for doc_id, damped in zip(recorded, pipe.execute()) if damped}
+    except redis.RedisError as e:
+        # Flapping goes undetected meanwhile
+        logger.error("Failed to record the transitions of %s Events: %s", len(events), str(e))
+        return set()
+
+
+def up_event_damping(event: Event) -> UpEventDamping:
+    """Damping of the Up Event (check the module docstring)"""
+    if not _flap_rule(event):
+        return UpEventDamping(FlapAction.PROCESS)
+    try:
+        state = settings.REDIS_CLIENT.hgetall(_key(event))
+    except redis.RedisError as e:
+        logger.warning("Failed to get the flapping state of %s: %s", event.doc_id, str(e))
+        return UpEventDamping(FlapAction.PROCESS)
+    if b"damped_since" not in state:
+        return UpEventDamping(FlapAction.PROCESS)
+
+    damped_since, damped_until = float(state[b"damped_since"]), float(state[b"damped_until"])
+    if not damped_since <= event.created.timestamp() <= damped_until:
+        # Received outside the damping
+        return UpEventDamping(FlapAction.PROCESS)
+    if damped_until > time.time():
+        return UpEventDamping(FlapAction.HOLD)
+    latest_up_event = tuple(json.loads(state[b"last_up"])) if b"last_up" in state else None
+    if state.get(b"last_type") == EventType.UP.encode() and latest_up_event and latest_up_event[1] == event.doc_id:
+        return UpEventDamping(FlapAction.PROCESS, latest_up_event)
+    return UpEventDamping(FlapAction.ABSORB, latest_up_event)
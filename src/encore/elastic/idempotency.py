@@ -0,0 +1,76 @@
+"""Idempotency Keys for the Ingest & Resolve Endpoints
+
+Monitor tools (and GLPI) retry on timeouts. A request carrying an Idempotency-Key header (or the payload field
+IDEMPOTENCY_KEY_FIELD) is processed only once: the key is claimed in Redis (SET NX with IDEMPOTENCY_KEY_TTL) and
+repeats within the TTL are acknowledged without being processed. The key is released if processing fails, so that
+the retry is processed.
+"""
+
+import logging
+import typing as t
+
+import redis
+
+from django.conf import settings
+from django.http import HttpResponse
+
+logger = logging.getLogger("correlator.elastic.idempotency")
+
+IDEMPOTENCY_KEY_PREFIX = "encore:idem"
+
+
+def get_idempotency_key(request, data: t.Optional[t.Dict[str, t.Any]] = None) -> t.Optional[str]:
+    """Idempotency key from the request header, else from the payload"""
+    if request is not None and (key := request.headers.get(settings.IDEMPOTENCY_KEY_HEADER)):
+        return key
+    if data and settings.IDEMPOTENCY_KEY_FIELD and (key := data.get(settings.IDEMPOTENCY_KEY_FIELD)):
+        return str(key)
+    return None
+
+
+def _redis_key(task: str, remote_ip: str, key: str) -> str:
+    return f"{IDEMPOTENCY_KEY_PREFIX}:{task}:{remote_ip}:{key}"
+
+
+def claim_keys(task: str, remote_ip: str, keys: t.List[t.Optional[str]]) -> t.List[bool]:
+    """Claim the keys. True for the keys seen for the first time (and for no key), False for the repeats."""
+    if settings.IDEMPOTENCY_KEY_TTL <= 0 or not any(keys):
+        return [True] * len(keys)
+    try:
+        pipe = settings.REDIS_CLIENT.pipeline(transaction=False)
+        for key in keys:
+            if key:
+                pipe.set(_redis_key(task, remote_ip, key), 1, nx=True, ex=settings.IDEMPOTENCY_KEY_TTL)
+        results = iter(pipe.execute())
+    except redis.RedisError as e:
+        # Better to process a repeat than to drop an event
+        logger.error("Failed to claim idempotency keys: %s", str(e))
+        return [True] * len(keys)
+    return [bool(next(results)) if key else True for key in keys]
+
+
+def claim_key(task: str, remote_ip: str, key: t.Optional[str]) -> bool:
+    """Claim the key. True if seen for the first time (or no key), False for a repeat."""
+    return claim_keys(task, remote_ip, [key])[0]
+
+
+def release_keys(task: str, remote_ip: str, keys: t.List[t.Optional[str]]):
+    """Release the claimed keys (processing failed), so that a retry is processed"""
+    if not (keys := [key for key in keys if key]) or settings.IDEMPOTENCY_KEY_TTL <= 0:
+        return
+    try:
+        settings.REDIS_CLIENT.delete(*[_redis_key(task, remote_ip, key) for key in keys])
+    except redis.RedisError as e:
+        logger.error("Failed to release idempotency keys: %s", str(e))
+
+
+def release_key(task: str, remote_ip: str, key: t.Optional[str]):
+    """Release the claimed key (processing failed), so that a retry is processed"""
+    release_keys(task, remote_ip, [key])
+
+
+def duplicate_response(status: int) -> HttpResponse:
+    """Response acknowledging a repeated request"""
+    response = HttpResponse(status=status)
+    response["Idempotent-Replayed"] = "true"
+    return response
@@ -0,0 +1,145 @@
+"""Correlation Lookups
+
+Active (not linked) Down Events for a (monitor tool name, event title, asset unique id), as Elastic hits. Used for
+the Up / Down linking, dedup and parent lookups (check elastic/tasks/new.py). CORRELATION_LOOKUP selects the backend:
+
+- "elastic": `events-*` search (near real time).
+- "redis": Correlation Index (check elastic/correlation_index.py), falls back to Elastic if the index is not ready.
+- "postgres": Event table (partial index on the active Down Events), read-your-writes. Hits are fetched by mget.
+"""
+
+import logging
+import typing as t
+
+import redis
+
+from django.conf import settings
+
+from elastic import correlation_index
+from elastic.constants import ACTIVE_EVENT_STATUS, EVENT_INDEX_RE, EventType, FieldNames
+from elastic.models import Event
+from elastic.utils import CorrelatorElastic, SearchResponseType, normalize_asset_key, parse_event_ts
+
+logger = logging.getLogger("correlator.elastic.lookups")
+
+# Extra members fetched by the Redis lookup, to make up for the stale ones
+_STALE_ALLOWANCE = 10
+
+
+def active_down_events(
+    es: CorrelatorElastic,
+    tool_name: str,
+    title: str,
+    asset_unique_id: str,
+    until_ts: t.Optional[str] = None,
+    latest_first: bool = False,
+    size: int = 1,
+) -> t.List[t.Dict[str, t.Any]]:
+    """Active (not linked) Down Events, with the event timestamp up to `until_ts`, ordered by the event timestamp"""
+    if settings.CORRELATION_LOOKUP == "postgres":
+        return _postgres_active_down_events(es, tool_name, title, asset_unique_id, until_ts, latest_first, size)
+    if settings.CORRELATION_LOOKUP == "redis" and correlation_index.is_ready():
+        try:
+            return _redis_active_down_events(es, tool_name, title, asset_unique_id, until_ts, latest_first, size)
+        except redis.RedisError as e:
+            logger.error("Correlation Index lookup failed, falling back to Elastic: %s", str(e))
+    return _elastic_active_down_events(es, tool_name, title, asset_unique_id, until_ts, latest_first, size)
+
+
+# Helper Functions used in active_down_events - Start
+
+
+def _elastic_active_down_events(es, tool_name, title, asset_unique_id, until_ts, latest_first, size):
+    must = [
+        {"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}},
+        {"term": {f"{FieldNames.TOOL_NAME}.keyword": tool_name}},
+        {"term": {f"{FieldNames.EVENT_TITLE}.keyword": title}},
+        {
+            "term": {
+                f"{FieldNames.ASSET_UNIQUE_ID}.keyword": {
+                    "value": asset_unique_id,
+                    "case_insensitive": True,
+                }
+            }
+        },
+    ]
+    if until_ts is not None:
+        must.append({"range": {FieldNames.EVENT_TS: {"lte": until_ts}}})
+    search_query = {
+        "bool": {
+            "must_not": {"exists": {"field": FieldNames.LINKED_EVENT}},
+            "must": must,
+            "should": [{"term": {f"{FieldNames.EVENT_STATUS}.keyword": _estatus}} for _estatus in ACTIVE_EVENT_STATUS],
+            "minimum_should_match": 1,
+        }
+    }
+    return es.search(
+        index=EVENT_INDEX_RE,
+        query=search_query,
+        sort=[{FieldNames.EVENT_TS: {"order": "desc" if latest_first else "asc"}}],
+        size=size,
+        response_type=SearchResponseType.HIT_LIST,
+    )
+
+
+def _redis_active_down_events(es, tool_name, title, asset_unique_id, until_ts, latest_first, size):
+    key = correlation_index.index_key(tool_name, title, asset_unique_id)
+    # No upper bound if the event timestamp cannot be parsed
+    max_score = None if until_ts is None else correlation_index.score(until_ts)
+    hits, stale = [], []
+    start = 0
+    while len(hits) < size:
+        members = correlation_index.get_members(
+            key, until_ts=max_score, latest_first=latest_first, start=start, count=size - len(hits) + _STALE_ALLOWANCE
+        )
+        if not members:
+            break
+        start += len(members)
+
+        # Verify the hits. Elastic GET is real time.
+        response = es.mget(
+            docs=[{"_index": doc_index, "_id": doc_id} for doc_index, doc_id in members],
+            source_excludes=[FieldNames.EVENT_DETAILS],
+        )
+        for (doc_index, doc_id), elk_event in zip(members, response["docs"]):
+            elk_event_src = elk_event.get("_source", {}) if elk_event.get("found", False) else {}
+            if elk_event_src.get(FieldNames.EVENT_STATUS) in ACTIVE_EVENT_STATUS and not elk_event_src.get(
+                FieldNames.LINKED_EVENT
+            ):
+                hits.append(elk_event)
+            else:
+                stale.append((key, correlation_index.member(doc_index, doc_id)))
+    correlation_index.remove_members(stale)
+    return hits[:size]
+
+
+def _postgres_active_down_events(es, tool_name, title, asset_unique_id, until_ts, latest_first, size):
+    events = Event.objects.filter(
+        event_type=EventType.DOWN,
+        status__in=ACTIVE_EVENT_STATUS,
+        linked_event__isnull=True,
+        monitor_tool_name=tool_name,
+        title=title,
+        asset_key=normalize_asset_key(asset_unique_id),
+    )
+    # No upper bound if the event timestamp cannot be parsed
+    if until_ts is not None and (until := parse_event_ts(until_ts)) is not None:
+        events = events.filter(event_ts__lte=until)
+    events = list(
+        events.order_by("-event_ts" if latest_first else "event_ts").values_list("doc_index", "doc_id")[:size]
+    )
+    if not events:
+        return []
+    response = es.mget(
+        docs=[{"_index": doc_index, "_id": doc_id} for doc_index, doc_id in events],
+        source_excludes=[FieldNames.EVENT_DETAILS],
+    )
+    # Events linked before the links were mirrored in Postgres are linked in Elastic only
+    return [
+        elk_event
+        for elk_event in response["docs"]
+        if elk_event.get("found", False) and not elk_event["_source"].get(FieldNames.LINKED_EVENT)
+    ]
+
+
+# Helper Functions used in active_down_events - End
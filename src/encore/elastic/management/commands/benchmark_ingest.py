@@ -0,0 +1,89 @@
+"""Benchmark Event Ingest"""
+
+import logging
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+
+logger = logging.getLogger("correlator.elastic.benchmark_ingest")
+
+BENCHMARK_EVENT = {
+    "ALERT_TITLE": "Benchmark Event",
+    "ASSET_UNIQUE_ID": "BENCHMARK-ASSET",
+    "EVENT_TYPE": "DOWN",
+    "LEVEL": "CRITICAL",
+}
+
+
+class Command(BaseCommand):
+    """Benchmark Ingest Command
+
+    Fires events at the ingest endpoint and reports the accept latency (time taken by the endpoint to acknowledge
+    the event) and throughput. Use `--compare-url` to benchmark the sync (WSGI) and async (ASGI) deployments side
+    by side.
+    """
+
+    help = "Benchmark accept latency & throughput of the event ingest endpoint"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument("--url", default="http://127.0.0.1:8000/event/", help="Ingest endpoint")
+        parser.add_argument("--compare-url", default=None, help="Second ingest endpoint to compare against")
+        parser.add_argument("-n", "--requests", type=int, default=1000, help="Number of events to send")
+        parser.add_argument("-c", "--concurrency", type=int, default=50, help="Number of concurrent clients")
+        parser.add_argument("--force", action="store_true", help="Execute even if environment is not dev")
+
+    def handle(self, *args, **options) -> str | None:
+        if settings.ENVIRONMENT != "dev" and not options["force"]:
+            logger.error("Cannot execute benchmark in environment %s [!= dev]", settings.ENVIRONMENT)
+            return
+
+        urls = [options["url"]]
+        if options["compare_url"]:
+            urls.append(options["compare_url"])
+
+        for url in urls:
+            self.benchmark(url, options["requests"], options["concurrency"])
+
+    def benchmark(self, url: str, num_requests: int, concurrency: int):
+        """Send `num_requests` events to `url` using `concurrency` clients and print the stats"""
+        logger.info("Benchmarking %s [requests=%s, concurrency=%s]", url, num_requests, concurrency)
+
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=concurrency, pool_maxsize=concurrency)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+
+        def _send(_):
+            start = time.perf_counter()
+            try:
+                res = session.post(url, json=BENCHMARK_EVENT, timeout=30)
+                ok = res.status_code < 300
+            except requests.RequestException:
+                ok = False
+            return time.perf_counter() - start, ok
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            results = list(executor.map(_send, range(num_requests)))
+        elapsed = time.perf_counter() - start
+
+        latencies = sorted(latency * 1000 for latency, ok in results if ok)
+        errors = len(results) - len(latencies)
+        if not latencies:
+            self.stdout.write(self.style.ERROR(f"{url}: all {errors} requests failed"))
+            return
+
+        quantiles = statistics.quantiles(latencies, n=100) if len(latencies) > 1 else latencies * 99
+        self.stdout.write(
+            f"{url}\n"
+            f"  requests: {len(results)}  errors: {errors}  elapsed: {elapsed:.2f}s\n"
+            f"  throughput: {len(latencies) / elapsed:.1f} events/s\n"
+            f"  accept latency (ms): p50={quantiles[49]:.1f} p90={quantiles[89]:.1f} p99={quantiles[98]:.1f} "
+            f"max={latencies[-1]:.1f}"
+        )
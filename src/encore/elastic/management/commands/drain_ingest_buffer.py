@@ -0,0 +1,62 @@
+"""Drain Ingest Buffer Command"""
+
+import logging
+import os
+import signal
+import socket
+import time
+
+import redis
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandParser
+from django.db import DatabaseError, close_old_connections
+
+from elastic.buffer import BufferConsumer
+
+logger = logging.getLogger("correlator.elastic.drain_ingest_buffer")
+
+
+class Command(BaseCommand):
+    """Drain Ingest Buffer Command
+
+    Long running consumer that drains the ingest buffer (Redis Stream) into ApiLog. Run as many as required,
+    each with a unique consumer name.
+    """
+
+    help = "Drain the ingest write-ahead buffer into ApiLog"
+
+    def add_arguments(self, parser: CommandParser) -> None:
+        super().add_arguments(parser)
+        parser.add_argument(
+            "--consumer", default=f"{socket.gethostname()}-{os.getpid()}", help="Unique name of this consumer"
+        )
+
+    def handle(self, *args, **options) -> str | None:
+        if not settings.INGEST_WRITE_BUFFER:
+            logger.info("Ingest Buffer is disabled [INGEST_WRITE_BUFFER]")
+            return
+        consumer = BufferConsumer(options["consumer"])
+        consumer.ensure_group()
+        logger.info("Starting Ingest Buffer Consumer %s for %s [%s]", consumer.name, consumer.stream, consumer.group)
+
+        running = True
+
+        def _stop(signum, _frame):
+            nonlocal running
+            logger.info("Stopping Ingest Buffer Consumer %s [signal %s]", consumer.name, signum)
+            running = False
+
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGTERM, _stop)
+
+        while running:
+            close_old_connections()
+            try:
+                consumer.drain(settings.INGEST_DRAIN_BLOCK_MS)
+            except (redis.RedisError, DatabaseError) as e:
+                # Entries stay pending & are drained again once reclaimed
+                logger.error("Ingest Buffer Consumer %s failed to drain: %s", consumer.name, str(e))
+                time.sleep(1)
+
+        consumer.leave_group()
@@ -0,0 +1,27 @@
+"""Rebuild Correlation Index Command"""
+
+import logging
+
+from django.core.management.base import BaseCommand
+
+from elastic import correlation_index
+from elastic.utils import CorrelatorElastic
+
+logger = logging.getLogger("correlator.elastic.rebuild_correlation_index")
+
+
+class Command(BaseCommand):
+    """Rebuild the Correlation Index (CORRELATION_LOOKUP = redis) from the active Down Events in Elastic.
+
+    Required on the first switch to CORRELATION_LOOKUP = redis & whenever the Redis data is lost (lookups fall back
+    to Elastic until then).
+    """
+
+    help = "Rebuild the Correlation Index from the active Down Events in Elastic"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clear", action="store_true", help="Delete the existing index keys first")
+
+    def handle(self, *args, **options) -> str | None:
+        added = correlation_index.rebuild(CorrelatorElastic(), clear=options["clear"])
+        self.stdout.write(f"Correlation Index rebuilt with {added} Events")
@@ -0,0 +1,51 @@
+"""Run Event Scheduler Command"""
+
+import logging
+import signal
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections
+
+from elastic.scheduler import pump
+
+logger = logging.getLogger("correlator.elastic.run_event_scheduler")
+
+
+class Command(BaseCommand):
+    """Run Event Scheduler Command
+
+    Long running pump that dispatches the due Events of the Event Scheduler (Redis sorted set). Multiple pumps can
+    run side by side.
+    """
+
+    help = "Dispatch the due Events of the Event Scheduler"
+
+    def handle(self, *args, **options) -> str | None:
+        if not settings.EVENT_SCHEDULER:
+            logger.info("Event Scheduler is disabled [EVENT_SCHEDULER]")
+            return
+        logger.info("Starting Event Scheduler [%s]", settings.EVENT_SCHEDULE_KEY)
+
+        running = True
+
+        def _stop(signum, _frame):
+            nonlocal running
+            logger.info("Stopping Event Scheduler [signal %s]", signum)
+            running = False
+
+        signal.signal(signal.SIGINT, _stop)
+        signal.signal(signal.SIGTERM, _stop)
+
+        while running:
+            close_old_connections()
+            try:
+                popped = pump(settings.EVENT_SCHEDULER_BATCH_SIZE)
+            except Exception as e:  # pylint: disable=broad-exception-caught
+                # Popped Events stay leased & are dispatched again once the lease expires
+                logger.error("Event Scheduler failed to dispatch: %s", str(e))
+                time.sleep(1)
+                continue
+            if popped < settings.EVENT_SCHEDULER_BATCH_SIZE:
+                time.sleep(settings.EVENT_SCHEDULER_POLL_INTERVAL)
@@ -0,0 +1,18 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:52
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("elastic", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="apilog",
+            name="buffer_entry_id",
+            field=models.CharField(blank=True, editable=False, max_length=64, null=True, unique=True),
+        ),
+    ]
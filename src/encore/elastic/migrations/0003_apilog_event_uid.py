@@ -0,0 +1,28 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:10
+
+from django.db import migrations, models
+
+import elastic.ulid
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("elastic", "0002_apilog_buffer_entry_id"),
+    ]
+
+    operations = [
+        # Existing ApiLogs keep a null `event_uid` (and so the legacy Event ID)
+        migrations.AddField(
+            model_name="apilog",
+            name="event_uid",
+            field=models.CharField(editable=False, max_length=26, null=True, unique=True),
+        ),
+        migrations.AlterField(
+            model_name="apilog",
+            name="event_uid",
+            field=models.CharField(
+                default=elastic.ulid.new_ulid, editable=False, max_length=26, null=True, unique=True
+            ),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("elastic", "0003_apilog_event_uid"),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(fields=["doc_id"], name="elastic_eve_doc_id_b6d181_idx"),
+        ),
+    ]
@@ -0,0 +1,77 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:18
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_lookup_fields(apps, schema_editor):
+    """Monitor Tool Name & Asset Key of the existing Events. Links are only in Elastic, for the existing Events."""
+    Event = apps.get_model("elastic", "Event")
+    events = []
+    for event in Event.objects.select_related("monitor_tool_ip__monitor_tool").iterator(chunk_size=2000):
+        monitor_tool = event.monitor_tool_ip.monitor_tool
+        event.monitor_tool_name = monitor_tool.name if monitor_tool else settings.DEFAULT_TOOL_NAME
+        event.asset_key = (event.asset_unique_id or "").upper()
+        events.append(event)
+        if len(events) >= 2000:
+            Event.objects.bulk_update(events, ["monitor_tool_name", "asset_key"])
+            events = []
+    Event.objects.bulk_update(events, ["monitor_tool_name", "asset_key"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("elastic", "0004_event_doc_id_index"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="asset_key",
+            field=models.TextField(blank=True, help_text="Normalized Asset Unique ID", null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="linked_event",
+            field=models.ForeignKey(
+                blank=True,
+                help_text="Linked Up / Down Event",
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="+",
+                to="elastic.event",
+            ),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="monitor_tool_name",
+            field=models.TextField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name="event",
+            name="parent_event",
+            field=models.ForeignKey(
+                blank=True,
+                null=True,
+                on_delete=django.db.models.deletion.SET_NULL,
+                related_name="child_events",
+                related_query_name="child_event",
+                to="elastic.event",
+            ),
+        ),
+        migrations.RunPython(fill_lookup_fields, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name="event",
+            index=models.Index(
+                condition=models.Q(
+                    ("event_type", "down"),
+                    ("linked_event__isnull", True),
+                    ("status__in", ["alerted", "creating_ticket", "new", "suppressed"]),
+                ),
+                fields=["monitor_tool_name", "title", "asset_key", "event_ts"],
+                name="event_active_down_lookup_idx",
+            ),
+        ),
+    ]
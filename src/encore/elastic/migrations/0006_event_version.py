@@ -0,0 +1,20 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("elastic", "0005_event_correlation_lookup_fields"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="event",
+            name="version",
+            field=models.PositiveIntegerField(
+                default=0, help_text="Incremented on every save (optimistic concurrency)"
+            ),
+        ),
+    ]
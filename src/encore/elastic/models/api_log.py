@@ -9,6 +9,8 @@ from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 from elastic.constants import EVENT_ID_DATETIME_FORMAT, EVENT_INDEX_PREFIX, INDEX_DATE_SUFFIX_FORMAT
+from elastic.ulid import new_ulid
+from launchpad.cache import monitor_tool_ip_cache
 from launchpad.models.monitor_tool import MonitorToolIP
 
 
@@ -51,6 +53,10 @@ class ApiLog(TimeStampedModel, StatusModel):
 
     STATUS = Status.choices
     failure_reason = models.TextField(blank=True, default="")
+    # Unique & time sortable ID of the Event. Null for the ApiLogs created before it was introduced.
+    event_uid = models.CharField(max_length=26, unique=True, null=True, default=new_ulid, editable=False)
+    # Redis Stream entry ID, when the event was accepted via the write-ahead buffer. Check elastic/buffer.py
+    buffer_entry_id = models.CharField(max_length=64, unique=True, null=True, blank=True, editable=False)
 
     class Meta:
         """Meta"""
@@ -69,6 +75,9 @@ class ApiLog(TimeStampedModel, StatusModel):
     def event_id(self) -> Optional[str]:
         """Event ID"""
         if self.task == ApiLog.TaskType.EVENT:
+            if self.event_uid:
+                return f"{settings.ENVIRONMENT}::{self.event_uid}"
+            # Legacy Event ID
             return f"{settings.ENVIRONMENT}::{self.remote_ip}::{self.created.strftime(EVENT_ID_DATETIME_FORMAT)}"
         return None
 
@@ -83,7 +92,7 @@ class ApiLog(TimeStampedModel, StatusModel):
     def monitor_tool_ip(self) -> Optional[MonitorToolIP]:
         """Monitor Tool IP"""
         if self.task == ApiLog.TaskType.EVENT and self.method in ApiLog.LogMethods.valid_event_methods():
-            return MonitorToolIP.objects.get(ip=self.remote_ip)
+            return monitor_tool_ip_cache.get(self.remote_ip)
         return None
 
     @property
@@ -107,5 +116,5 @@ class ApiLog(TimeStampedModel, StatusModel):
             and self.task == ApiLog.TaskType.EVENT
             and self.method in ApiLog.LogMethods.valid_event_methods()
         ):
-            MonitorToolIP.objects.get_or_create(ip=self.remote_ip)
+            monitor_tool_ip_cache.get_or_create(self.remote_ip)
         return super().save(*args, **kwargs)
@@ -2,15 +2,18 @@
 
 import typing as t
 
+from elasticsearch import ConflictError
 from model_utils.fields import StatusField
 from model_utils.models import StatusModel, TimeStampedModel
 
 from django.db import models
 
-from correlator.exceptions import CorrelatorProcessException
-from elastic.constants import EventStatus, EventType
-from elastic.utils import CorrelatorElastic
+from correlator.exceptions import CorrelatorProcessException, EventConflict
+from elastic.constants import ACTIVE_EVENT_STATUS, EventExtrasKey, EventStatus, EventType
+from elastic.utils import CorrelatorElastic, correlation_key
+from launchpad.cache import CompiledRule, correlation_rule_table, monitor_tool_ip_cache
 from launchpad.models import CorrelationRule, ItsmSettings, MonitorTool
+from launchpad.retry_policy import RetryPolicy, get_retry_policy
 
 
 class Event(TimeStampedModel, StatusModel):
@@ -37,16 +40,49 @@ class Event(TimeStampedModel, StatusModel):
     asset_unique_id = models.TextField(null=True, blank=True)
     asset_type = models.TextField(null=True, blank=True)
 
+    # Mirror of the Elastic Event, for the correlation lookups (CORRELATION_LOOKUP = postgres)
+    monitor_tool_name = models.TextField(null=True, blank=True)
+    asset_key = models.TextField(null=True, blank=True, help_text="Normalized Asset Unique ID")
+    linked_event = models.ForeignKey(
+        "self", null=True, blank=True, on_delete=models.SET_NULL, related_name="+", help_text="Linked Up / Down Event"
+    )
+    parent_event = models.ForeignKey(
+        "self",
+        null=True,
+        blank=True,
+        on_delete=models.SET_NULL,
+        related_name="child_events",
+        related_query_name="child_event",
+    )
+
     retry_count = models.PositiveIntegerField()
+    version = models.PositiveIntegerField(default=0, help_text="Incremented on every save (optimistic concurrency)")
 
     extras = models.JSONField(default=dict)
 
+    # Optimistic concurrency state (check `read_for_update`)
+    _read_version: t.Optional[int] = None
+    _elastic_seq: t.Optional[t.Tuple[int, int]] = None  # (seq_no, primary_term) of the Elastic Event read
+    elastic_conflict = False
+
     class Meta:
         """Meta"""
 
         verbose_name = "Event"
         verbose_name_plural = "Events"
-        indexes = [models.Index(fields=["status"])]
+        indexes = [
+            models.Index(fields=["status"]),
+            models.Index(fields=["doc_id"]),
+            models.Index(
+                fields=["monitor_tool_name", "title", "asset_key", "event_ts"],
+                name="event_active_down_lookup_idx",
+                condition=models.Q(
+                    event_type=EventType.DOWN,
+                    status__in=sorted(ACTIVE_EVENT_STATUS),
+                    linked_event__isnull=True,
+                ),
+            ),
+        ]
 
     def __str__(self) -> str:
         return f"[{self.doc_index}]{self.doc_id}"
@@ -54,30 +90,75 @@ class Event(TimeStampedModel, StatusModel):
     def __repr__(self) -> str:
         return f"[{self.doc_index}]{self.doc_id}"
 
+    def read_for_update(self):
+        """Update the Event (& its Elastic Event) only if unchanged since read, instead of locking the row.
+        A save raises EventConflict, and an Elastic update sets `elastic_conflict` & raises EventConflict.
+        """
+        self._read_version = self.version
+        self.elastic_conflict = False
+
+    def save(self, *args, **kwargs):
+        if self._read_version is not None:
+            self.version = self._read_version + 1
+        elif self.pk is not None:
+            self.version += 1
+        super().save(*args, **kwargs)
+        if self._read_version is not None:
+            self._read_version = self.version
+
+    def _do_update(self, base_qs, using, pk_val, values, update_fields, forced_update):
+        if self._read_version is None:
+            return super()._do_update(base_qs, using, pk_val, values, update_fields, forced_update)
+        if not super()._do_update(
+            base_qs.filter(version=self._read_version), using, pk_val, values, update_fields, forced_update
+        ):
+            raise EventConflict(f"Event [{pk_val}] changed since version {self._read_version}")
+        return True
+
     @property
     def monitor_tool(self) -> MonitorTool | None:
         """Monitor Tool"""
-        return self.monitor_tool_ip.monitor_tool
+        return monitor_tool_ip_cache.get(self.monitor_tool_ip_id).monitor_tool
+
+    @property
+    def correlation_key(self) -> str:
+        """Normalized (monitor tool name, event title, asset unique id)"""
+        return correlation_key(self.monitor_tool_name, self.title, self.asset_unique_id)
 
     @property
     def elastic_event(self):
         """Event stored in ELK"""
 
         es = CorrelatorElastic()
-        return es.get_event(event_index=self.doc_index, event_id=self.doc_id)
+        if elk_event := es.get_event(event_index=self.doc_index, event_id=self.doc_id):
+            self._elastic_seq = (elk_event["_seq_no"], elk_event["_primary_term"])
+        return elk_event
+
+    def update_elastic_event(self, doc: t.Dict[str, t.Any]):
+        """Update the Elastic Event. After `read_for_update`, only if unchanged since read (`elastic_event`)."""
+        kwargs = {}
+        if self._read_version is not None and self._elastic_seq is not None:
+            kwargs = {"if_seq_no": self._elastic_seq[0], "if_primary_term": self._elastic_seq[1]}
+        try:
+            response = CorrelatorElastic().update(index=self.doc_index, id=self.doc_id, doc=doc, **kwargs)
+        except ConflictError as e:
+            self.elastic_conflict = True
+            raise EventConflict(f"Elastic Event [{self.doc_id}] changed since read") from e
+        self._elastic_seq = (response["_seq_no"], response["_primary_term"])
+
+    @property
+    def compiled_rule(self) -> CompiledRule | None:
+        """Correlation Rule applicable, with its Event Level based Sub Rules (check launchpad/cache.py)"""
+        if not (monitor_tool := self.monitor_tool):
+            return None
+        return correlation_rule_table.get(monitor_tool.pk, self.title)
 
     @property
     def correlation_rule(self) -> CorrelationRule | None:
         """Correlation Rule applicable"""
-        if not self.monitor_tool:
-            return None
-        try:
-            return CorrelationRule.objects.get(monitor_tool=self.monitor_tool, event_title=self.title)
-        except (CorrelationRule.DoesNotExist, CorrelationRule.MultipleObjectsReturned):
-            try:
-                return CorrelationRule.objects.get(monitor_tool=self.monitor_tool, alert_title="*")
-            except CorrelationRule.DoesNotExist:
-                return None
+        if compiled_rule := self.compiled_rule:
+            return compiled_rule.rule
+        return None
 
     @property
     def parent_child_lookup_required(self) -> bool:
@@ -96,19 +177,30 @@ class Event(TimeStampedModel, StatusModel):
     @property
     def do_not_create_ticket_flag(self) -> bool:
         """Do Not Create Ticket Flag"""
-        if rule := self.correlation_rule:
-            if level_rule := rule.level_sub_rule(self.level):
+        if compiled_rule := self.compiled_rule:
+            if level_rule := compiled_rule.level_sub_rule(self.level):
                 return level_rule.do_not_create_ticket_flag
-            return rule.do_not_create_ticket_flag
+            return compiled_rule.rule.do_not_create_ticket_flag
         return True
 
     @property
     def itsm_settings(self) -> t.Optional[ItsmSettings]:
         """ITSM Settings"""
-        if rule := self.correlation_rule:
-            return rule.itsm_settings(self.level)
+        if compiled_rule := self.compiled_rule:
+            return compiled_rule.itsm_settings(self.level)
         return None
 
+    @property
+    def retry_policy(self) -> RetryPolicy:
+        """Retry Policy for the current status"""
+        rule = self.correlation_rule
+        return get_retry_policy(self.status, rule.retry_policy if rule else None)
+
+    @property
+    def parked(self) -> bool:
+        """Retries exceeded the max retries of the retry policy"""
+        return self.extras.get(EventExtrasKey.PARKED, False)
+
     def report_error(self, error_desc, incr_flag=True, check_repeat_count=True):
         """Add Error Log if it does not exist or update the repeat count"""
         err, created = ErrorLog.objects.get_or_create(event=self, event_status=self.status, error_desc=error_desc)
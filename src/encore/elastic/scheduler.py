@@ -0,0 +1,99 @@
+"""Event Scheduler
+
+Due times of the state-machine tasks live in a Redis sorted set (EVENT_SCHEDULE_KEY): the member is the Event pk and
+the score is the due timestamp. Unlike Celery countdowns (ETA tasks held in worker memory & redelivered on restart),
+the schedule costs the workers nothing, and an Event has at most one entry (rescheduling updates it).
+
+The `run_event_scheduler` command pops the due Events in batches and dispatches the task for their current status.
+Popped entries are leased (score moved to now + EVENT_SCHEDULER_LEASE) and removed once dispatched, unless the Event
+was rescheduled meanwhile. Entries popped by a crashed pump are dispatched again when their lease expires.
+"""
+
+import logging
+import time
+import typing as t
+
+import redis
+
+from django.conf import settings
+
+from elastic.models import Event
+
+logger = logging.getLogger("correlator.elastic.scheduler")
+
+# Lease (ARGV[2]) up to ARGV[3] entries due by ARGV[1]
+_POP_SCRIPT = settings.REDIS_CLIENT.register_script(
+    """
+    local members = redis.call('ZRANGEBYSCORE', KEYS[1], '-inf', ARGV[1], 'LIMIT', 0, tonumber(ARGV[3]))
+    for _, member in ipairs(members) do
+        redis.call('ZADD', KEYS[1], 'XX', ARGV[2], member)
+    end
+    return members
+    """
+)
+
+# Remove the entries (ARGV[2:]) still holding the lease (ARGV[1]), i.e. not rescheduled since they were popped
+_ACK_SCRIPT = settings.REDIS_CLIENT.register_script(
+    """
+    local lease = tonumber(ARGV[1])
+    local removed = 0
+    for i = 2, #ARGV do
+        local score = redis.call('ZSCORE', KEYS[1], ARGV[i])
+        if score and tonumber(score) == lease then
+            removed = removed + redis.call('ZREM', KEYS[1], ARGV[i])
+        end
+    end
+    return removed
+    """
+)
+
+
+def schedule_event(event_pk: int, due_ts: float) -> bool:
+    """(Re)schedule the Event at the due timestamp. False if it could not be scheduled (Redis is down)."""
+    try:
+        settings.REDIS_CLIENT.zadd(settings.EVENT_SCHEDULE_KEY, {event_pk: due_ts})
+    except redis.RedisError as e:
+        logger.error("Failed to schedule Event [%s]: %s", event_pk, str(e))
+        return False
+    return True
+
+
+def pop_due_events(limit: int) -> t.Tuple[t.List[int], float]:
+    """Lease up to `limit` due Events. Returns their pks & the lease (required to ack them)."""
+    now = time.time()
+    lease = now + settings.EVENT_SCHEDULER_LEASE
+    members = _POP_SCRIPT(keys=[settings.EVENT_SCHEDULE_KEY], args=[now, repr(lease), limit])
+    return [int(member) for member in members], lease
+
+
+def ack_events(event_pks: t.Iterable[int], lease: float):
+    """Remove the dispatched Events from the schedule, unless they were rescheduled meanwhile"""
+    if event_pks := list(event_pks):
+        _ACK_SCRIPT(keys=[settings.EVENT_SCHEDULE_KEY], args=[repr(lease), *event_pks])
+
+
+def pump(batch_size: int) -> int:
+    """Dispatch the task for the current status of (up to `batch_size`) due Events. Returns the number popped."""
+    from elastic.tasks.common import dispatch, get_event_task  # pylint: disable=import-outside-toplevel
+
+    event_pks, lease = pop_due_events(batch_size)
+    if not event_pks:
+        return 0
+
+    events = list(
+        Event.objects.filter(pk__in=event_pks).only(
+            "pk", "status", "event_type", "extras", "parent_event_id", "monitor_tool_name", "title", "asset_unique_id"
+        )
+    )
+    # Missing (purged) Events are done
+    done = set(event_pks) - {event.pk for event in events}
+    try:
+        for event in events:
+            if task := get_event_task(event):
+                dispatch(task, event)
+            done.add(event.pk)
+    finally:
+        # Events not dispatched (broker is down) stay leased, & are dispatched again when the lease expires
+        ack_events(done, lease)
+    logger.debug("Dispatched %s due Events", len(done))
+    return len(event_pks)
@@ -0,0 +1,21 @@
+"""Elastic Signals"""
+
+from django.conf import settings
+from django.db.models.signals import post_save
+from django.db.transaction import on_commit
+from django.dispatch import receiver
+
+from . import correlation_index
+from .constants import ACTIVE_EVENT_STATUS, EventType
+from .models import Event
+
+
+@receiver(post_save, sender=Event)
+def update_correlation_index(sender, instance: Event, created: bool, **kwargs):
+    """Add the new active Down Event to the Correlation Index, remove it once it is no longer active"""
+    if settings.CORRELATION_LOOKUP != "redis" or instance.event_type != EventType.DOWN:
+        return
+    if instance.status not in ACTIVE_EVENT_STATUS:
+        on_commit(lambda: correlation_index.remove_events([instance]))
+    elif created:
+        on_commit(lambda: correlation_index.add_events([instance]))
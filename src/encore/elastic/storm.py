@@ -0,0 +1,110 @@
+"""Event Storm Mode (EVENT_STORM_DETECTION)
+
+A mass outage (e.g. a core router failing) brings thousands of Down Events without a parent relation, each creating
+its own Ticket once its wait is over. Down Events moving to Creating Ticket (NewDownEvent task) are counted per scope
+(EVENT_STORM_SCOPE: asset region, monitor tool or Correlation Rule) over the sliding EVENT_STORM_WINDOW, except those
+without a scope (e.g. no asset region). Once EVENT_STORM_THRESHOLD is reached, a storm starts: the Down Event reaching
+it is the master incident (creates the Ticket), and the following Down Events of the scope are suppressed as its child
+Events instead. Like the child Events of a parent asset, they get its Ticket & are moved back to New if it resolves
+before them.
+The storm ends once no Down Event joins it for EVENT_STORM_QUIET_TIME seconds.
+
+Kept in Redis: {EVENT_STORM_KEY_PREFIX}:{sha1 of the scope} -> master incident & ...:t the Down Events in the window.
+"""
+
+import hashlib
+import json
+import logging
+import time
+import typing as t
+
+import redis
+
+from django.conf import settings
+
+from elastic.constants import ACTIVE_EVENT_STATUS, FieldNames
+from elastic.models import Event
+from elastic.utils import CorrelatorElastic
+
+logger = logging.getLogger("correlator.elastic.storm")
+
+# KEYS: Down Events in the window, master incident. ARGV: now, doc id, Event (index & doc id), window, threshold,
+# quiet time. Returns the master incident of the storm, nil if there is no storm.
+_JOIN_SCRIPT = settings.REDIS_CLIENT.register_script(
+    """
+    local now = tonumber(ARGV[1])
+    redis.call('ZADD', KEYS[1], now, ARGV[2])
+    redis.call('ZREMRANGEBYSCORE', KEYS[1], '-inf', now - tonumber(ARGV[4]))
+    redis.call('EXPIRE', KEYS[1], ARGV[4])
+    local master = redis.call('GET', KEYS[2])
+    if not master then
+        if redis.call('ZCARD', KEYS[1]) < tonumber(ARGV[5]) then
+            return false
+        end
+        master = ARGV[3]
+    end
+    redis.call('SET', KEYS[2], master, 'EX', ARGV[6])
+    return master
+    """
+)
+
+
+def _scope(event: Event, elk_event_src: t.Dict[str, t.Any]) -> t.Optional[str]:
+    if settings.EVENT_STORM_SCOPE == "region":
+        value = elk_event_src.get(FieldNames.ASSET_REGION)
+    elif settings.EVENT_STORM_SCOPE == "rule":
+        value = rule.pk if (rule := event.correlation_rule) else None
+    else:
+        value = event.monitor_tool_name
+    if value is None or value == "":
+        # Events without a scope are not counted together
+        return None
+    return f"{settings.EVENT_STORM_SCOPE}:{value}"
+
+
+def master_event(
+    es: CorrelatorElastic, event: Event, elk_event_src: t.Dict[str, t.Any]
+) -> t.Optional[t.Dict[str, t.Any]]:
+    """Elastic master incident Event of the storm the Down Event (moving to Creating Ticket) joins.
+    None if there is no storm, the Event is the master incident or has no scope (e.g. no asset region).
+    """
+    if (scope := _scope(event, elk_event_src)) is None:
+        return None
+    key = f"{settings.EVENT_STORM_KEY_PREFIX}:{hashlib.sha1(scope.encode()).hexdigest()}"
+    member = json.dumps([event.doc_index, event.doc_id])
+    try:
+        master = _JOIN_SCRIPT(
+            keys=[f"{key}:t", key],
+            args=[
+                time.time(),
+                event.doc_id,
+                member,
+                settings.EVENT_STORM_WINDOW,
+                settings.EVENT_STORM_THRESHOLD,
+                settings.EVENT_STORM_QUIET_TIME,
+            ],
+            client=settings.REDIS_CLIENT,
+        )
+    except redis.RedisError as e:
+        logger.error("Failed to check Event Storm [%s] for %s: %s", scope, event.doc_id, str(e))
+        return None
+    if master is None:
+        return None
+
+    master_index, master_id = json.loads(master)
+    if master_id == event.doc_id:
+        logger.warning("Event Storm [%s]: Master Incident %s", scope, event.doc_id)
+        return None
+    if Event.objects.filter(doc_id=master_id, status__in=ACTIVE_EVENT_STATUS, linked_event__isnull=True).exists() and (
+        elk_master_event := es.get_event(event_index=master_index, event_id=master_id)
+    ):
+        logger.debug("Event Storm [%s]: %s joins Master Incident %s", scope, event.doc_id, master_id)
+        return elk_master_event
+
+    # Master incident is no longer active. This Event takes its place.
+    logger.warning("Event Storm [%s]: Master Incident %s (was %s)", scope, event.doc_id, master_id)
+    try:
+        settings.REDIS_CLIENT.set(key, member, ex=settings.EVENT_STORM_QUIET_TIME)
+    except redis.RedisError as e:
+        logger.error("Failed to replace Event Storm [%s] Master Incident: %s", scope, str(e))
+    return None
@@ -1,10 +1,12 @@
 """Init File"""
 
 from .alerted import process_alerted_event  # NOQA
+from .batch_sweep import batch_sweep_events  # NOQA
 from .create_ticket import process_creating_ticket_event  # NOQA
-from .ingest import ingest_event  # NOQA
+from .ingest import bulk_ingest_events, ingest_event  # NOQA
 from .new import process_new_down_event, process_new_up_event  # NOQA
 from .purge import purge_db_events_and_apilogs, purge_event_indices  # NOQA
 from .resolve import resolve_event  # NOQA
 from .resolving import process_resolving_event  # NOQA
 from .suppressed import process_suppressed_event  # NOQA
+from .sweep import sweep_waiting_events  # NOQA
@@ -0,0 +1,208 @@
+"""Batch Sweeper of the Events in BATCH_SWEEP_STATUS
+
+Alerted & Suppressed Events mostly wait to be linked (or manually resolved). Instead of a task per Event, the
+sweeper pages through the Events of the status, gets their Elastic Events with one `mget`, decides the transitions
+(the same transition functions used by the tasks) and persists them with one `_bulk` and one `bulk_update`.
+With OPTIMISTIC_CONCURRENCY, Events changed since read are left to the task that changed them.
+Events that move to another status are handed back to `task_handler`. Events retried more than the max retries of
+their retry policy are parked, as by `task_handler`.
+"""
+
+import logging
+import typing as t
+from datetime import timedelta
+
+from celery import shared_task
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Q
+from django.db.transaction import on_commit
+from django.utils import timezone
+
+from correlator.celery import only_one_task_at_a_time
+from correlator.celery_utils import CorrelatorPeriodicTask
+from correlator.exceptions import EventConflict
+from elastic import correlation_index
+from elastic.constants import ACTIVE_EVENT_STATUS, EventExtrasKey, EventStatus, EventType, FieldNames
+from elastic.models import Event
+from elastic.tasks.alerted import alerted_transition
+from elastic.tasks.common import Transition, report_parked, task_handler
+from elastic.tasks.suppressed import suppressed_transition
+from elastic.utils import CorrelatorElastic
+
+logger = logging.getLogger("correlator.elastic.tasks.batch_sweep")
+
+# Status -> (Transition function, Events handled by the sweeper). Check `is_batch_swept` in elastic/tasks/common.py
+SWEEPERS: t.Dict[str, t.Tuple[t.Callable[[t.Dict[str, t.Any]], t.Optional[Transition]], Q]] = {
+    EventStatus.ALERTED: (alerted_transition, Q()),
+    EventStatus.SUPPRESSED: (
+        suppressed_transition,
+        Q(**{f"extras__{EventExtrasKey.TICKET_COMMENT_ASSET_IS_DOWN}": True}),
+    ),
+}
+
+
+@shared_task(
+    name="BatchSweepEvents",
+    base=CorrelatorPeriodicTask,
+    run_every=timedelta(seconds=settings.BATCH_SWEEP_INTERVAL),
+    bind=True,
+)
+@only_one_task_at_a_time(key="BatchSweepEvents", timeout_in_seconds=60 * 10)
+def batch_sweep_events():
+    """Task to process the Events in BATCH_SWEEP_STATUS in batches"""
+    for status in settings.BATCH_SWEEP_STATUS:
+        if status in SWEEPERS:
+            sweep_status(status)
+
+
+def sweep_status(status: str):
+    """Process all the Events of the status, a page at a time"""
+    transition_func, events_filter = SWEEPERS[status]
+    es = CorrelatorElastic()
+    last_pk, swept, moved = 0, 0, 0
+    while True:
+        with transaction.atomic():
+            # Events locked by their own task are skipped
+            events = list(
+                Event.objects.select_for_update(skip_locked=True)
+                .filter(events_filter, status=status, event_type=EventType.DOWN, pk__gt=last_pk)
+                .exclude(extras__has_key=EventExtrasKey.PARKED)
+                .order_by("pk")[: settings.BATCH_SWEEP_PAGE_SIZE]
+            )
+            if not events:
+                break
+            last_pk = events[-1].pk
+            swept += len(events)
+            moved += _sweep_page(es, events, transition_func)
+    logger.info("Batch Swept %s Events [%s]: %s Moved", swept, status, moved)
+
+
+# Helper Functions used in sweep_status - Start
+
+
+def _sweep_page(
+    es: CorrelatorElastic,
+    events: t.List[Event],
+    transition_func: t.Callable[[t.Dict[str, t.Any]], t.Optional[Transition]],
+) -> int:
+    update_ts = timezone.now()
+    if settings.OPTIMISTIC_CONCURRENCY:
+        # Tasks do not lock the Event, so `skip_locked` skips none. Save only the Events unchanged since read.
+        for event in events:
+            event.read_for_update()
+    response = es.mget(
+        docs=[{"_index": event.doc_index, "_id": event.doc_id} for event in events],
+        source_excludes=[FieldNames.EVENT_DETAILS],
+    )
+
+    ops = []
+    transitions: t.List[t.Tuple[Event, Transition]] = []
+    retried: t.List[Event] = []
+    for event, elk_event in zip(events, response["docs"]):
+        if not elk_event.get("found", False):
+            _report_error(event, "Elastic Event Does not Exist [Task: BatchSweepEvents]")
+        elif transition := transition_func(elk_event["_source"]):
+            logger.debug("Moving %s: %s", transition.desc, event.doc_id)
+            action = {"_index": event.doc_index, "_id": event.doc_id}
+            if settings.OPTIMISTIC_CONCURRENCY:
+                # Do not override a change made since the mget
+                action.update(if_seq_no=elk_event["_seq_no"], if_primary_term=elk_event["_primary_term"])
+            ops.extend([{"update": action}, {"doc": transition.elastic_doc(update_ts)}])
+            transitions.append((event, transition))
+        else:
+            event.retry_count += 1
+            if event.retry_policy.exceeded(event.retry_count):
+                # As in `task_handler`: not swept again until unparked
+                event.extras[EventExtrasKey.PARKED] = True
+            retried.append(event)
+
+    moved_events: t.List[t.Tuple[Event, str]] = []
+    if ops:
+        try:
+            items = es.bulk(operations=ops)["items"]
+        except Exception as e:  # pylint: disable=broad-exception-caught
+            logger.error("Failed to Move %s Events [Reason: %s]", len(transitions), e)
+            items = [{"update": {"error": str(e)}}] * len(transitions)
+        for (event, transition), item in zip(transitions, items):
+            if item["update"].get("status") == 409:
+                # Left to the task that changed it
+                logger.debug("Elastic Event changed meanwhile, not Moving %s: %s", transition.desc, event.doc_id)
+                continue
+            if "error" in item["update"]:
+                _report_error(
+                    event,
+                    f"Failed to Move {transition.desc} [Task: BatchSweepEvents]. Reason: {item['update']['error']}",
+                )
+                continue
+            moved_events.append((event, event.status))
+            transition.apply(event)
+            event.status_changed = update_ts
+            logger.info("Moved %s: %s", transition.desc, event.doc_id)
+
+    saved = _save_events([event for event, _ in moved_events] + retried, update_ts)
+    for event, previous_status in moved_events:
+        if event.pk not in saved:
+            _save_moved_event(event, previous_status, update_ts)
+    for event in retried:
+        if event.pk in saved and event.parked:
+            report_parked(event, event.retry_policy, logger=logger)
+    inactive_events = [event for event, _ in moved_events if event.status not in ACTIVE_EVENT_STATUS]
+    on_commit(lambda: correlation_index.remove_events(inactive_events))
+    for event, previous_status in moved_events:
+        task_handler(event, previous_status=previous_status)
+    return len(moved_events)
+
+
+def _report_error(event: Event, error_desc: str):
+    try:
+        event.report_error(error_desc, check_repeat_count=False)
+    except EventConflict:
+        logger.debug("Event changed meanwhile, not reporting [%s]: %s", error_desc, event.doc_id)
+
+
+_SAVED_FIELDS = ["status", "status_changed", "retry_count", "parent_event", "extras", "version", "modified"]
+
+
+def _save_events(events: t.List[Event], update_ts) -> t.Set[int]:
+    """Save the Events. With OPTIMISTIC_CONCURRENCY, only those unchanged since read. Returns the pks saved."""
+    for event in events:
+        event.modified = update_ts
+    if not settings.OPTIMISTIC_CONCURRENCY:
+        for event in events:
+            event.version += 1
+        Event.objects.bulk_update(events, _SAVED_FIELDS)
+        return {event.pk for event in events}
+
+    saved = set()
+    for event in events:
+        values = {field.attname: getattr(event, field.attname) for field in map(Event._meta.get_field, _SAVED_FIELDS)}
+        values["version"] = event.version + 1
+        if Event.objects.filter(pk=event.pk, version=event.version).update(**values):
+            event.version += 1
+            event.read_for_update()
+            saved.add(event.pk)
+        else:
+            logger.debug("Event changed meanwhile, not saving: %s", event.doc_id)
+    return saved
+
+
+def _save_moved_event(event: Event, previous_status: str, update_ts):
+    """Event changed since read, but its Elastic Event is moved: move it too, unless it moved on meanwhile"""
+    moved = Event.objects.filter(pk=event.pk, status=previous_status).update(
+        status=event.status,
+        status_changed=event.status_changed,
+        retry_count=0,
+        parent_event_id=event.parent_event_id,
+        version=F("version") + 1,
+        modified=update_ts,
+    )
+    if moved:
+        event.refresh_from_db()
+        event.read_for_update()
+    else:
+        logger.warning("Event moved on meanwhile, from %s: %s", previous_status, event.doc_id)
+
+
+# Helper Functions used in sweep_status - End
@@ -1,23 +1,77 @@
 """Common Functions for Elastic Tasks"""
 
 import logging
+import time
 import typing as t
 
-from celery import shared_task
+from celery import Task, shared_task
 
 from django.apps import apps
+from django.conf import settings
 from django.db import transaction
+from django.db.models import Q
 from django.db.transaction import on_commit
 from django.db.utils import OperationalError
 from django.utils import timezone
 
-from elastic.constants import EVENT_INDEX_RE, EventExtrasKey, EventStatus, EventType, FieldNames, ResolvingAction
+from correlator.exceptions import EventConflict
+from elastic.constants import (
+    EVENT_INDEX_RE,
+    WAKEUP_EVENT_STATUS,
+    EventExtrasKey,
+    EventStatus,
+    EventType,
+    FieldNames,
+    ResolvingAction,
+)
 from elastic.models import Event
-from elastic.utils import CorrelatorElastic, SearchResponseType
+from elastic.scheduler import schedule_event
+from elastic.utils import CorrelatorElastic, SearchResponseType, partition_of
 from glpi.utils import GLPIException, add_comment, get_glpi_session, kill_glpi_session
+from launchpad.retry_policy import RetryPolicy
 
 elastic_task_logger = logging.getLogger("correlator.elastic.tasks")
 
+MAX_PARENT_DEPTH = 10
+
+
+class Transition(t.NamedTuple):
+    """Status Transition of an Event, decided from its Elastic Event"""
+
+    status: str
+    doc: t.Dict[str, t.Any]  # Fields to update in Elastic (besides status)
+    desc: str  # e.g. "Linked Down Event to Resolving"
+
+    def elastic_doc(self, update_ts=None) -> t.Dict[str, t.Any]:
+        """Elastic Event update"""
+        return {
+            **self.doc,
+            FieldNames.EVENT_STATUS: self.status,
+            FieldNames.LAST_UPDATE_TS: update_ts or timezone.now(),
+        }
+
+    def apply(self, event: Event):
+        """Update the Event (not saved) as the Elastic Event is updated"""
+        event.status = self.status
+        event.retry_count = 0
+        if FieldNames.PARENT_EVENT in self.doc and not self.doc[FieldNames.PARENT_EVENT]:
+            event.parent_event = None
+
+
+def apply_transition(event: Event, transition: Transition, task_name: str, logger=elastic_task_logger) -> bool:
+    """Update the Elastic Event, then the Event. False if Elastic update failed."""
+    logger.debug("Moving %s: %s", transition.desc, event.doc_id)
+    try:
+        event.update_elastic_event(transition.elastic_doc())
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        event.report_error(f"Failed to Move {transition.desc} [Task: {task_name}]. Reason: {e}")
+        logger.error("Failed to Move %s: %s [Reason: %s]", transition.desc, event.doc_id, e)
+        return False
+    transition.apply(event)
+    event.save()
+    logger.info("Moved %s: %s", transition.desc, event.doc_id)
+    return True
+
 
 def correlator_task(
     name: str,
@@ -27,12 +81,16 @@ def correlator_task(
     valid_start_status: t.Optional[t.Set[str]] = None,
     valid_start_types: t.Optional[t.Set[str]] = None,
     logger: logging.Logger = elastic_task_logger,
+    external_side_effects: bool = False,
 ):
     """Create a Correlator Shared Task (decorator)
 
     NOTE: Do not use this decorator to define PeriodicTasks. Use `CorrelatorPeriodicTask` as the base class
     with `shared_task` decorator to define PeriodicTasks.
 
+    A task with `external_side_effects` (e.g. creating a Ticket in GLPI) locks the Event even with
+    OPTIMISTIC_CONCURRENCY, as a run rolled back on a conflict cannot undo them.
+
     """
 
     def _dec(run_func):
@@ -44,6 +102,7 @@ def correlator_task(
             """Caller"""
             model_class = apps.get_model(model)
             model_id = kwargs.get(key_value_field)
+            wakeup = kwargs.pop("wakeup", False)
 
             logger.debug(
                 "[%s][%s]: %s [%s] Starting",
@@ -53,7 +112,11 @@ def correlator_task(
                 model_id,
             )
 
-            model_qs = model_class.objects.select_for_update(nowait=True).filter(**{model_key_field: model_id})
+            # With OPTIMISTIC_CONCURRENCY, the Event is not locked. Check `_run_optimistic`.
+            optimistic = model_class == Event and settings.OPTIMISTIC_CONCURRENCY and not external_side_effects
+            model_qs = model_class.objects.filter(**{model_key_field: model_id})
+            if not optimistic:
+                model_qs = model_qs.select_for_update(nowait=True)
 
             try:
                 if len(model_qs) == 0:
@@ -74,11 +137,34 @@ def correlator_task(
                     model_id,
                     e,
                 )
-                if model_class == Event:
+                if model_class == Event and wakeup:
+                    # The task holding the lock may have read the Elastic Event before the change that woke it up
+                    locked_event = Event.objects.get(pk=model_id)
+                    on_commit(
+                        lambda: dispatch(
+                            celery_task, locked_event, countdown=settings.EVENT_WAKEUP_RETRY_DELAY, wakeup=True
+                        )
+                    )
+                elif model_class == Event:
                     Event.objects.get(pk=model_id).report_error(f"Failed to get lock [Task: {name}]", incr_flag=False)
                 return
 
             model_ins = model_qs[0]
+            if wakeup and (
+                not awaits_wakeup(model_ins) or (valid_start_status and model_ins.status not in valid_start_status)
+            ):
+                # Status changed after the wakeup was sent
+                logger.debug(
+                    "[%s][%s]: %s [%s] Stale wakeup [%s].",
+                    celery_task.request.id,
+                    name,
+                    model_class.__name__,
+                    model_id,
+                    model_ins.status,
+                )
+                if awaits_wakeup(model_ins):
+                    _wake(model_ins)
+                return
             if valid_start_status and model_ins.status not in valid_start_status:
                 logger.warning(
                     "[%s][%s]: %s [%s] Invalid Status [%s].",
@@ -105,10 +191,16 @@ def correlator_task(
                 return
 
             kwargs[key_value_field] = model_ins
-            run_func(**kwargs)
+            previous_status = model_ins.status
+            if optimistic:
+                if not (result := _run_optimistic(run_func, kwargs, key_value_field, valid_start_status, name, logger)):
+                    return
+                model_ins, previous_status = result
+            else:
+                run_func(**kwargs)
 
             if model_class == Event:
-                task_handler(model_ins)
+                task_handler(model_ins, previous_status=previous_status)
 
             logger.debug(
                 "[%s][%s]: %s [%s] Completed",
@@ -123,44 +215,230 @@ def correlator_task(
     return _dec
 
 
-def task_handler(event: Event):
-    """Handle Task"""
+def _run_optimistic(
+    run_func, kwargs, key_value_field: str, valid_start_status: t.Optional[t.Set[str]], name: str, logger
+) -> t.Optional[t.Tuple[Event, t.Optional[str]]]:
+    """Run the task on the Event read without a lock. Returns the Event & its status before the run.
+    On a conflict (check `Event.read_for_update`), the run is rolled back (incl. the errors it reported) & retried on
+    the Event read again, up to OPTIMISTIC_CONCURRENCY_RETRIES times. None if the Event was moved on meanwhile.
+    """
+    event: Event = kwargs[key_value_field]
+    for attempt in range(settings.OPTIMISTIC_CONCURRENCY_RETRIES + 1):
+        event.read_for_update()
+        previous_status = event.status
+        kwargs[key_value_field] = event
+        savepoint = transaction.savepoint()
+        try:
+            run_func(**kwargs)
+            conflict = event.elastic_conflict
+        except EventConflict:
+            conflict = True
+        except Exception:  # pylint: disable=broad-exception-caught
+            if not event.elastic_conflict:
+                raise
+            conflict = True
+        if not conflict:
+            transaction.savepoint_commit(savepoint)
+            return event, previous_status
+
+        transaction.savepoint_rollback(savepoint)
+        logger.info("[%s]: Event [%s] changed by another task [attempt %s]", name, event.pk, attempt + 1)
+        event = Event.objects.get(pk=event.pk)
+        if valid_start_status and event.status not in valid_start_status:
+            # Moved on by the other task, which takes care of the next run
+            return None
+
+    logger.warning("[%s]: Event [%s] kept changing. Retrying later.", name, event.pk)
+    return event, None
+
+
+def get_event_task(event: Event) -> t.Optional[Task]:
+    """Task to process the Event in its current status. None if the Event is Inactive."""
+    # pylint: disable=import-outside-toplevel
     if event.status == EventStatus.NEW:
         if event.event_type == EventType.DOWN:
-            from .new import process_new_down_event  # pylint: disable=import-outside-toplevel
+            from .new import process_new_down_event
 
-            on_commit(lambda: process_new_down_event.apply_async(kwargs={"event": event.pk}, countdown=10))
-            elastic_task_logger.debug("Invoked New Down Event: [%s]", event.pk)
-        elif event.event_type == EventType.UP:
-            from .new import process_new_up_event  # pylint: disable=import-outside-toplevel
+            return process_new_down_event
+        if event.event_type == EventType.UP:
+            from .new import process_new_up_event
 
-            on_commit(lambda: process_new_up_event.apply_async(kwargs={"event": event.pk}, countdown=10))
-            elastic_task_logger.debug("Invoked New Up Event: [%s]", event.pk)
-        else:
-            elastic_task_logger.debug("Event [%s] is Inactive [%s]", event.pk, event.status)
+            return process_new_up_event
     elif event.status == EventStatus.ALERTED:
-        from .alerted import process_alerted_event  # pylint: disable=import-outside-toplevel
+        from .alerted import process_alerted_event
 
-        on_commit(lambda: process_alerted_event.apply_async(kwargs={"event": event.pk}, countdown=30))
-        elastic_task_logger.debug("Invoked Alerted Down Event: [%s]", event.pk)
+        return process_alerted_event
     elif event.status == EventStatus.SUPPRESSED:
-        from .suppressed import process_suppressed_event  # pylint: disable=import-outside-toplevel
+        from .suppressed import process_suppressed_event
 
-        countdown = 30 if event.extras.get(EventExtrasKey.TICKET_COMMENT_ASSET_IS_DOWN, False) else 10
-        on_commit(lambda: process_suppressed_event.apply_async(kwargs={"event": event.pk}, countdown=countdown))
-        elastic_task_logger.debug("Invoked Suppressed Down Event: [%s]", event.pk)
+        return process_suppressed_event
     elif event.status == EventStatus.CREATING_TICKET:
-        from .create_ticket import process_creating_ticket_event  # pylint: disable=import-outside-toplevel
+        from .create_ticket import process_creating_ticket_event
 
-        on_commit(lambda: process_creating_ticket_event.apply_async(kwargs={"event": event.pk}, countdown=10))
-        elastic_task_logger.debug("Invoked Creating Ticket Down Event: [%s]", event.pk)
+        return process_creating_ticket_event
     elif event.status == EventStatus.RESOLVING:
-        from .resolving import process_resolving_event  # pylint: disable=import-outside-toplevel
+        from .resolving import process_resolving_event
 
-        on_commit(lambda: process_resolving_event.apply_async(kwargs={"event": event.pk}, countdown=30))
-        elastic_task_logger.debug("Invoked Resolving Ticket Down Event: [%s]", event.pk)
-    else:
+        return process_resolving_event
+    return None
+
+
+def awaits_wakeup(event: Event) -> bool:
+    """Event is not polled, it waits to be woken up (check `wake_events`)"""
+    return settings.EVENT_DRIVEN_WAKEUPS and event.status in WAKEUP_EVENT_STATUS
+
+
+def is_batch_swept(event: Event) -> bool:
+    """Event is processed by the Batch Sweeper (check elastic/tasks/batch_sweep.py), instead of its own task"""
+    if event.status not in settings.BATCH_SWEEP_STATUS:
+        return False
+    if event.status == EventStatus.SUPPRESSED:
+        # ITSM activity is done by its own task
+        return event.extras.get(EventExtrasKey.TICKET_COMMENT_ASSET_IS_DOWN, False)
+    return event.status == EventStatus.ALERTED
+
+
+def task_handler(event: Event, previous_status: t.Optional[str] = None):
+    """Handle Task
+
+    The next run is after the delay of the retry policy (check launchpad/retry_policy.py) for the current status.
+    An Event retried more than the max retries is parked: it is not retried until unparked (Event admin action).
+
+    With EVENT_SCHEDULER, the next run is scheduled in the Event Scheduler (check elastic/scheduler.py) instead of
+    as a Celery countdown. A New Down Event waiting to create the Ticket is scheduled at the end of the wait.
+
+    An Event in BATCH_SWEEP_STATUS is processed once on entering the status, and then by the Batch Sweeper.
+
+    With EVENT_DRIVEN_WAKEUPS, an Event waiting on a change made elsewhere is processed once on entering the status.
+    After that, it is processed only when woken up (check `wake_events`) or by the safety sweep.
+    """
+    if not (task := get_event_task(event)):
         elastic_task_logger.debug("Event [%s] is Inactive [%s]", event.pk, event.status)
+        return
+    if awaits_wakeup(event) and event.status == previous_status:
+        elastic_task_logger.debug("Event [%s] is Waiting for a Wakeup [%s]", event.pk, event.status)
+        return
+    if is_batch_swept(event) and event.status == previous_status:
+        elastic_task_logger.debug("Event [%s] is left to the Batch Sweeper [%s]", event.pk, event.status)
+        return
+    retry_policy = event.retry_policy
+    if retry_policy.exceeded(event.retry_count):
+        _park(event, retry_policy)
+        return
+    if event.extras.pop(EventExtrasKey.PARKED, None):
+        event.save()
+    countdown = retry_policy.delay(event.retry_count)
+    if settings.EVENT_SCHEDULER:
+        if event.status == EventStatus.NEW and event.event_type == EventType.DOWN and event.retry_count:
+            # Waiting to create the Ticket. Process it when the wait is over, instead of polling.
+            if (wait := event.wait_time_in_seconds + 1 - (timezone.now() - event.event_ts).total_seconds()) > 0:
+                countdown = wait
+        on_commit(lambda: _schedule(task, event, countdown))
+    else:
+        on_commit(lambda: dispatch(task, event, countdown=countdown))
+    elastic_task_logger.debug("Invoked %s: [%s]", task.name, event.pk)
+
+
+def affinity_key(event: Event) -> str:
+    """Correlation key of the root parent Event (of the Event itself, if it has no parent)"""
+    root_event = event
+    for _ in range(MAX_PARENT_DEPTH):
+        if not root_event.parent_event_id or not (
+            parent_event := Event.objects.filter(pk=root_event.parent_event_id)
+            .only("pk", "parent_event_id", "monitor_tool_name", "title", "asset_unique_id")
+            .first()
+        ):
+            break
+        root_event = parent_event
+    return root_event.correlation_key
+
+
+def affinity_queue(event: Event) -> t.Optional[str]:
+    """Affinity queue of the Event (check AFFINITY_QUEUES). None to use the default queue."""
+    if settings.AFFINITY_QUEUES <= 0:
+        return None
+    return f"{settings.AFFINITY_QUEUE_PREFIX}.{partition_of(affinity_key(event), settings.AFFINITY_QUEUES)}"
+
+
+def dispatch(task: Task, event: Event, countdown: float = 0, **kwargs):
+    """Send the task of the Event to Celery. With AFFINITY_QUEUES, to the affinity queue of the Event: all the tasks
+    of an Event (& of the Events under the same root parent) are run by the same worker, one at a time.
+    """
+    options: t.Dict[str, t.Any] = {"countdown": countdown}
+    if queue := affinity_queue(event):
+        options["queue"] = queue
+    task.apply_async(kwargs={"event": event.pk, **kwargs}, **options)
+
+
+def _schedule(task: Task, event: Event, countdown: float):
+    if not schedule_event(event.pk, time.time() + countdown):
+        # Fall back to Celery countdown
+        dispatch(task, event, countdown=countdown)
+
+
+def _park(event: Event, retry_policy: RetryPolicy):
+    event.extras[EventExtrasKey.PARKED] = True
+    event.save()
+    report_parked(event, retry_policy)
+
+
+def report_parked(event: Event, retry_policy: RetryPolicy, logger=elastic_task_logger):
+    """Report the Event as Parked (after its retries exceeded the max retries of the retry policy)"""
+    event.report_error(
+        f"Parked after {event.retry_count} retries [Max Retries: {retry_policy.max_retries}]",
+        incr_flag=False,
+        check_repeat_count=False,
+    )
+    logger.warning("Event [%s] is Parked [%s]", event.pk, event.status)
+
+
+def _wake(event: Event, countdown: int = 0):
+    if task := get_event_task(event):
+        on_commit(lambda: dispatch(task, event, countdown=countdown, wakeup=True))
+        elastic_task_logger.debug("Woke up %s: [%s]", task.name, event.pk)
+
+
+def wake_events(event_pks: t.Iterable[int] = (), doc_ids: t.Iterable[str] = ()):
+    """Wake up the Events (waiting for a wakeup) after a change is made to them in Elastic.
+    No-op unless EVENT_DRIVEN_WAKEUPS. Events being polled will see the change on their next run.
+    """
+    event_pks, doc_ids = list(event_pks), list(doc_ids)
+    if not settings.EVENT_DRIVEN_WAKEUPS or not (event_pks or doc_ids):
+        return
+    for event in Event.objects.filter(Q(pk__in=event_pks) | Q(doc_id__in=doc_ids), status__in=WAKEUP_EVENT_STATUS):
+        _wake(event)
+
+
+def wake_child_events(event: Event, logger=elastic_task_logger):
+    """Wake up the immediate active child Events (e.g. after the Event got a Ticket)"""
+    if not settings.EVENT_DRIVEN_WAKEUPS:
+        return
+    es = CorrelatorElastic()
+    try:
+        elk_child_events = es.search(
+            index=EVENT_INDEX_RE,
+            query={
+                "bool": {
+                    "must": [
+                        {"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}},
+                        {"term": {f"{FieldNames.PARENT_EVENT}.keyword": event.doc_id}},
+                    ],
+                    "should": [
+                        {"term": {f"{FieldNames.EVENT_STATUS}.keyword": EventStatus.SUPPRESSED}},
+                        {"term": {f"{FieldNames.EVENT_STATUS}.keyword": EventStatus.RESOLVING}},
+                    ],
+                    "minimum_should_match": 1,
+                }
+            },
+            source=False,
+            size=1000,
+            response_type=SearchResponseType.HIT_LIST,
+        )
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # Child Events will be picked up by the safety sweep
+        logger.warning("Failed to find child Events to wake up: %s [Reason: %s]", event.doc_id, e)
+        return
+    wake_events(doc_ids=[elk_child_event["_id"] for elk_child_event in elk_child_events])
 
 
 def itsm_activity(event: Event, elk_event_src, logger=elastic_task_logger):
@@ -200,7 +478,7 @@ def itsm_activity(event: Event, elk_event_src, logger=elastic_task_logger):
             FieldNames.LAST_UPDATE_TS: timezone.now(),
         }
         try:
-            es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+            event.update_elastic_event(doc)
         except Exception as e:
             event.report_error(f"Failed to Update Ticket ID in Elastic. Reason: {e}")
             logger.error("Failed to Update Ticket ID in Elastic: %s [Reason: %s]", event.doc_id, e)
@@ -297,6 +575,7 @@ def all_immediate_child_events_are_resolved_manually(
     """
     es = CorrelatorElastic()
     ret_value = True
+    updated_doc_ids = []
     for elk_child_event in es.search(
         index=EVENT_INDEX_RE,
         query={
@@ -335,7 +614,9 @@ def all_immediate_child_events_are_resolved_manually(
                 )
                 ret_value = False
             else:
+                updated_doc_ids.append(elk_child_event["_id"])
                 logger.debug("Done Setting Resolving Action to MANUAL [%s]: %s", elk_child_event["_id"], event.doc_id)
+    wake_events(doc_ids=updated_doc_ids)
     return ret_value
 
 
@@ -347,6 +628,7 @@ def all_immediate_active_child_events_are_set_as_new(event: Event, logger=elasti
 
     es = CorrelatorElastic()
     ret_value = True
+    updated_doc_ids = []
     for elk_child_event in es.search(
         index=EVENT_INDEX_RE,
         query={
@@ -381,6 +663,7 @@ def all_immediate_active_child_events_are_set_as_new(event: Event, logger=elasti
                 )
                 ret_value = False
             else:
+                updated_doc_ids.append(elk_child_event["_id"])
                 logger.debug("Initiated move to New status [%s]: %s", elk_child_event["_id"], event.doc_id)
         if elk_child_event["_source"][FieldNames.EVENT_STATUS] == EventStatus.RESOLVING:
             # Set Resolving Action to NEW
@@ -398,5 +681,7 @@ def all_immediate_active_child_events_are_set_as_new(event: Event, logger=elasti
                 )
                 ret_value = False
             else:
+                updated_doc_ids.append(elk_child_event["_id"])
                 logger.debug("Done Setting Resolving Action to NEW [%s]: %s", elk_child_event["_id"], event.doc_id)
+    wake_events(doc_ids=updated_doc_ids)
     return ret_value
@@ -6,7 +6,7 @@ from django.utils import timezone
 
 from elastic.constants import EventExtrasKey, EventStatus, EventType, FieldNames, ResolvingAction
 from elastic.models import Event
-from elastic.tasks.common import correlator_task
+from elastic.tasks.common import correlator_task, wake_child_events
 from elastic.utils import CorrelatorElastic
 from glpi.constants import GLPI_TICKET_SEVERITY_MAP
 from glpi.utils import GLPIException, create_ticket, get_glpi_session, kill_glpi_session
@@ -28,6 +28,7 @@ class DefaultNA(dict):
     valid_start_status={EventStatus.CREATING_TICKET},
     valid_start_types={EventType.DOWN},
     logger=logger,
+    external_side_effects=True,  # ITSM (GLPI)
 )
 def process_creating_ticket_event(event: int | Event):
     """Logic to process Event in Creating Ticket status."""
@@ -52,7 +53,7 @@ def process_creating_ticket_event(event: int | Event):
             FieldNames.LAST_UPDATE_TS: timezone.now(),
         }
         try:
-            es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+            event.update_elastic_event(doc)
         except Exception as e:
             event.report_error(f"Failed to Move Linked Down Event to Resolving [Task: CreateTicketEvent]. Reason: {e}")
             logger.error("Failed to Move Linked Down Event to Resolving: %s [Reason: %s]", event.doc_id, e)
@@ -111,7 +112,7 @@ def process_creating_ticket_event(event: int | Event):
         FieldNames.LAST_UPDATE_TS: timezone.now(),
     }
     try:
-        es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+        event.update_elastic_event(doc)
     except Exception as e:
         event.report_error(f"Failed to Move Down Event to Alerted [Task: NewDownEvent]. Reason: {e}")
         logger.error("Failed to Move Down Event to Alerted: %s [Reason: %s]", event.doc_id, e)
@@ -120,3 +121,5 @@ def process_creating_ticket_event(event: int | Event):
     event.retry_count = 0
     event.save()
     logger.debug("Moved Down Event to Alerted: %s", event.doc_id)
+    # Suppressed child Events can now get the Ticket ID
+    wake_child_events(event=event, logger=logger)
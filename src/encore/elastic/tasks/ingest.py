@@ -1,16 +1,45 @@
 """Task to Ingest Event to ELK"""
 
 import logging
+import typing as t
+from datetime import datetime
+from datetime import timezone as dt_timezone
+
+from celery import shared_task
 
 from django.conf import settings
+from django.db import transaction
+from django.db.transaction import on_commit
+from django.utils import timezone
 
-from elastic.constants import FieldNames
+from elastic import correlation_index, dedup, flapping
+from elastic.constants import EventStatus, FieldNames
 from elastic.models import ApiLog, Event
-from elastic.utils import CorrelatorElastic
+from elastic.utils import CorrelatorElastic, normalize_asset_key, parse_event_ts
+from launchpad.cache import monitor_tool_ip_cache
+from launchpad.models import MonitorToolIP
 from .common import correlator_task, task_handler
 
 logger = logging.getLogger("correlator.elastic.tasks.ingest")
 
+_COMPACT_SCRIPT_SOURCE = f"""
+    def src = ctx._source;
+    if (src.{FieldNames.DUP_COUNT} == null) {{
+        src.{FieldNames.DUP_COUNT} = 0;
+        src.{FieldNames.FIRST_SEEN_TS} = src.{FieldNames.EVENT_TS};
+        src.{FieldNames.DUP_SAMPLES} = [];
+    }}
+    src.{FieldNames.DUP_COUNT} += params.count;
+    if (src.{FieldNames.LAST_SEEN_TS} == null || src.{FieldNames.LAST_SEEN_TS}.compareTo(params.last_seen) < 0) {{
+        src.{FieldNames.LAST_SEEN_TS} = params.last_seen;
+    }}
+    src.{FieldNames.DUP_SAMPLES}.addAll(params.samples);
+    while (src.{FieldNames.DUP_SAMPLES}.size() > params.max_samples) {{
+        src.{FieldNames.DUP_SAMPLES}.remove(0);
+    }}
+    src.{FieldNames.LAST_UPDATE_TS} = params.update_ts;
+"""
+
 
 @correlator_task(
     name="IngestEvent",
@@ -24,14 +53,6 @@ def ingest_event(*, api_log: int | ApiLog):
     if not isinstance(api_log, ApiLog):
         return
 
-    event_json = {
-        FieldNames.EVENT_DETAILS: api_log.task_data,
-        FieldNames.TOOL_IP: api_log.remote_ip,
-        FieldNames.TOOL_NAME: api_log.monitor_tool_name,
-        FieldNames.METHOD: api_log.method,
-        FieldNames.RECEIVED_TS: api_log.created,
-    }
-
     event_id = api_log.event_id
     event_index = api_log.event_index
 
@@ -42,7 +63,7 @@ def ingest_event(*, api_log: int | ApiLog):
             index=event_index,
             id=event_id,
             pipeline=settings.MAIN_PIPELINE,
-            document=event_json,
+            document=_event_document(api_log, api_log.monitor_tool_name),
             op_type="create",
         )
     except Exception as e:
@@ -54,12 +75,116 @@ def ingest_event(*, api_log: int | ApiLog):
 
     logger.info("[ApiLog: %s] %s [%s]: Ingested", api_log.pk, event_id, event_index)
     elk_event = es.get_event(event_index=event_index, event_id=event_id)
-    elk_event_src = elk_event["_source"]
-    event = Event.objects.create(
+    event = _new_event(api_log, api_log.monitor_tool_ip, elk_event["_source"])
+    damped = flapping.record_transitions([event])
+    if not _dedup_events(es, [event], damped):
+        api_log.status = ApiLog.Status.COMPLETED
+        api_log.save()
+        logger.debug("[ApiLog: %s] %s [%s]: Compacted", api_log.pk, event_id, event_index)
+        return
+    _normalize_event_ts([event])
+    event.save()
+    api_log.status = ApiLog.Status.COMPLETED
+    api_log.save()
+    logger.debug("[ApiLog: %s] %s [%s]: Event [%s] Saved", api_log.pk, event_id, event_index, event.pk)
+    task_handler(event)
+
+
+@shared_task(name="BulkIngestEvents", bind=True)
+@transaction.atomic
+def bulk_ingest_events(celery_task, *, api_logs: t.List[int]):
+    """Task to Ingest a batch of Events using a single Elastic `_bulk` request"""
+
+    # ApiLogs locked by another task are skipped. That task will ingest them.
+    api_log_list: t.List[ApiLog] = list(
+        ApiLog.objects.select_for_update(skip_locked=True)
+        .filter(pk__in=api_logs, task=ApiLog.TaskType.EVENT, status=ApiLog.Status.NEW)
+        .order_by("pk")
+    )
+    logger.debug(
+        "[%s][BulkIngestEvents]: Ingesting %s of %s ApiLogs", celery_task.request.id, len(api_log_list), len(api_logs)
+    )
+    if not api_log_list:
+        return
+
+    monitor_tool_ips = monitor_tool_ip_cache.get_many({api_log.remote_ip for api_log in api_log_list})
+
+    ops = []
+    for api_log in api_log_list:
+        monitor_tool = monitor_tool_ips[api_log.remote_ip].monitor_tool
+        ops.extend(
+            [
+                {"create": {"_index": api_log.event_index, "_id": api_log.event_id}},
+                _event_document(api_log, monitor_tool.name if monitor_tool else None),
+            ]
+        )
+
+    es = CorrelatorElastic()
+    ingested_api_logs: t.List[ApiLog] = []
+    try:
+        response = es.bulk(operations=ops, pipeline=settings.MAIN_PIPELINE)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        logger.error("[%s][BulkIngestEvents]: Failed to Ingest [Reason: %s]", celery_task.request.id, e)
+        for api_log in api_log_list:
+            _set_api_log_status(api_log, ApiLog.Status.FAILED, str(e))
+    else:
+        for api_log, item in zip(api_log_list, response["items"]):
+            result = item["create"]
+            if "error" in result:
+                logger.error("[ApiLog: %s] %s: Failed to Ingest", api_log.pk, api_log.event_id)
+                _set_api_log_status(api_log, ApiLog.Status.FAILED, str(result["error"]))
+            else:
+                ingested_api_logs.append(api_log)
+
+    events: t.List[Event] = []
+    if ingested_api_logs:
+        # Read back the documents processed by the ingest pipeline
+        response = es.mget(
+            docs=[{"_index": api_log.event_index, "_id": api_log.event_id} for api_log in ingested_api_logs]
+        )
+        for api_log, elk_event in zip(ingested_api_logs, response["docs"]):
+            if not elk_event.get("found", False):
+                logger.error("[ApiLog: %s] %s: Ingested Event not found", api_log.pk, api_log.event_id)
+                _set_api_log_status(api_log, ApiLog.Status.FAILED, "Ingested Event not found")
+                continue
+            events.append(_new_event(api_log, monitor_tool_ips[api_log.remote_ip], elk_event["_source"]))
+            _set_api_log_status(api_log, ApiLog.Status.COMPLETED)
+        damped = flapping.record_transitions(events)
+        events = _dedup_events(es, events, damped)
+        _normalize_event_ts(events)
+        Event.objects.bulk_create(events)
+        on_commit(lambda: correlation_index.add_events(events))
+
+    ApiLog.objects.bulk_update(api_log_list, ["status", "status_changed", "failure_reason", "modified"])
+    logger.info(
+        "[%s][BulkIngestEvents]: Ingested %s of %s ApiLogs", celery_task.request.id, len(events), len(api_log_list)
+    )
+
+    for event in events:
+        task_handler(event)
+
+
+# Helper Functions used in ingest tasks - Start
+
+
+def _event_document(api_log: ApiLog, monitor_tool_name: t.Optional[str]) -> t.Dict[str, t.Any]:
+    """Event document sent to the main ingest pipeline"""
+    return {
+        FieldNames.EVENT_DETAILS: api_log.task_data,
+        FieldNames.TOOL_IP: api_log.remote_ip,
+        FieldNames.TOOL_NAME: monitor_tool_name,
+        FieldNames.METHOD: api_log.method,
+        FieldNames.RECEIVED_TS: api_log.created,
+    }
+
+
+def _new_event(api_log: ApiLog, monitor_tool_ip: MonitorToolIP, elk_event_src: t.Dict[str, t.Any]) -> Event:
+    """Event (not yet saved) for the ingested Elastic document"""
+    return Event(
         api_log=api_log,
-        monitor_tool_ip=api_log.monitor_tool_ip,
-        doc_id=event_id,
-        doc_index=event_index,
+        monitor_tool_ip=monitor_tool_ip,
+        doc_id=api_log.event_id,
+        doc_index=api_log.event_index,
         status=elk_event_src[FieldNames.EVENT_STATUS],
         level=elk_event_src[FieldNames.EVENT_LEVEL] if FieldNames.EVENT_LEVEL in elk_event_src else None,
         title=elk_event_src[FieldNames.EVENT_TITLE] if FieldNames.EVENT_TITLE in elk_event_src else None,
@@ -69,9 +194,164 @@ def ingest_event(*, api_log: int | ApiLog):
             elk_event_src[FieldNames.ASSET_UNIQUE_ID] if FieldNames.ASSET_UNIQUE_ID in elk_event_src else None
         ),
         asset_type=(elk_event_src[FieldNames.ASSET_TYPE] if FieldNames.ASSET_TYPE in elk_event_src else None),
+        monitor_tool_name=elk_event_src.get(FieldNames.TOOL_NAME),
+        asset_key=normalize_asset_key(elk_event_src.get(FieldNames.ASSET_UNIQUE_ID)),
         retry_count=0,
     )
-    api_log.status = ApiLog.Status.COMPLETED
-    api_log.save()
-    logger.debug("[ApiLog: %s] %s [%s]: Event [%s] Saved", api_log.pk, event_id, event_index, event.pk)
-    task_handler(event)
+
+
+def _normalize_event_ts(events: t.List[Event]):
+    """Event timestamp (as received) as an aware datetime. The received timestamp if it cannot be parsed."""
+    for event in events:
+        if (event_ts := parse_event_ts(event.event_ts)) is None:
+            logger.warning(
+                "Invalid Event Timestamp [%s], using the Received Timestamp: %s", event.event_ts, event.doc_id
+            )
+            event_ts = event.api_log.created
+        event.event_ts = event_ts
+
+
+def _dedup_events(es: CorrelatorElastic, events: t.List[Event], damped: t.Set[str]) -> t.List[Event]:
+    """Link the duplicate Down Events to their initial Event & mark them DEDUPED (check elastic/dedup.py)
+
+    Duplicates of a Correlation Rule compacting duplicates are instead folded into their initial Event (duplicate
+    count, first / last seen & latest samples), with the other updates in a single `_bulk` request. They are deleted
+    with a second `_bulk` request, only once folded. If folding fails, they are linked & marked DEDUPED instead.
+    `damped` are the doc ids of the Events received while the asset is flapping (check elastic/flapping.py).
+    Returns the Events to save.
+    """
+    if not settings.DEDUP_AT_INGEST or not (initial_events := dedup.find_initial_events(events, damped)):
+        return events
+
+    duplicate_events = []
+    compacted_events: t.Dict[t.Tuple[str, str], t.List[Event]] = {}
+    for event in events:
+        if event.doc_id not in initial_events:
+            continue
+        if (rule := event.correlation_rule) and rule.compact_duplicates:
+            compacted_events.setdefault(initial_events[event.doc_id], []).append(event)
+        else:
+            duplicate_events.append(event)
+
+    _update_ts = timezone.now()
+    ops = []
+    for event in duplicate_events:
+        ops.extend(_dedup_ops(event, initial_events[event.doc_id], _update_ts))
+    for (initial_event_index, initial_event_id), _events in compacted_events.items():
+        ops.extend(
+            [
+                {"update": {"_index": initial_event_index, "_id": initial_event_id, "retry_on_conflict": 3}},
+                {"script": _compact_script(_events, _update_ts)},
+            ]
+        )
+    try:
+        response = es.bulk(operations=ops)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # Left to the NewDownEvent task
+        logger.error("Failed to Dedup %s Down Events at Ingest [Reason: %s]", len(initial_events), e)
+        return events
+
+    items = iter(response["items"])
+    for event in duplicate_events:
+        _set_deduped(event, next(items)["update"], initial_events[event.doc_id][1])
+
+    # Delete the folded duplicates. Link the others (their initial Event could not be updated).
+    folded_events, unfolded_events = [], []
+    for (initial_event_index, initial_event_id), _events in compacted_events.items():
+        if "error" in (result := next(items)["update"]):
+            logger.error(
+                "Failed to Compact %s Down Events into %s [Reason: %s]", len(_events), initial_event_id, result["error"]
+            )
+            unfolded_events.extend(_events)
+        else:
+            logger.info("Compacted %s Down Events at Ingest into %s", len(_events), initial_event_id)
+            folded_events.extend(_events)
+    if not (folded_events or unfolded_events):
+        return events
+
+    ops = [{"delete": {"_index": event.doc_index, "_id": event.doc_id}} for event in folded_events]
+    for event in unfolded_events:
+        ops.extend(_dedup_ops(event, initial_events[event.doc_id], _update_ts))
+    try:
+        response = es.bulk(operations=ops)
+    except Exception as e:  # pylint: disable=broad-exception-caught
+        # Folded duplicates are kept (& left to the NewDownEvent task, like the others)
+        logger.error("Failed to Remove %s Compacted Down Events at Ingest [Reason: %s]", len(folded_events), e)
+        return events
+
+    removed = set()
+    items = iter(response["items"])
+    for event in folded_events:
+        if "error" in (result := next(items)["delete"]):
+            logger.warning("Failed to Remove Compacted Down Event: %s [Reason: %s]", event.doc_id, result["error"])
+            continue
+        removed.add(event.doc_id)
+        logger.debug("Compacted Down Event at Ingest: %s -> %s", event.doc_id, initial_events[event.doc_id][1])
+    for event in unfolded_events:
+        _set_deduped(event, next(items)["update"], initial_events[event.doc_id][1])
+    return [event for event in events if event.doc_id not in removed]
+
+
+def _dedup_ops(event: Event, initial_event: t.Tuple[str, str], update_ts) -> t.List[t.Dict[str, t.Any]]:
+    """`_bulk` update linking the Event to its initial Event & marking it DEDUPED"""
+    initial_event_index, initial_event_id = initial_event
+    return [
+        {"update": {"_index": event.doc_index, "_id": event.doc_id}},
+        {
+            "doc": {
+                FieldNames.INITIAL_EVENT: initial_event_id,
+                FieldNames.INITIAL_EVENT_INDEX: initial_event_index,
+                FieldNames.EVENT_STATUS: EventStatus.DEDUPED,
+                FieldNames.LAST_UPDATE_TS: update_ts,
+            }
+        },
+    ]
+
+
+def _set_deduped(event: Event, result: t.Dict[str, t.Any], initial_event_id: str):
+    if "error" in result:
+        logger.warning("Failed to Dedup Down Event at Ingest: %s [Reason: %s]", event.doc_id, result["error"])
+        return
+    event.status = EventStatus.DEDUPED
+    logger.info("Linked Initial and Deduped Down Event at Ingest: %s -> %s", event.doc_id, initial_event_id)
+
+
+def _iso_ts(ts: datetime) -> str:
+    """UTC ISO 8601 timestamp, in a fixed format (compared as strings by the compact script)"""
+    return ts.astimezone(dt_timezone.utc).isoformat(timespec="milliseconds")
+
+
+def _compact_script(events: t.List[Event], update_ts) -> t.Dict[str, t.Any]:
+    """Script folding the duplicate Events into their initial Event"""
+    # Event timestamps are not normalized yet (check `_normalize_event_ts`)
+    event_ts = {event.doc_id: parse_event_ts(event.event_ts) or event.api_log.created for event in events}
+    samples = [
+        {
+            FieldNames.EVENT_TS: _iso_ts(event_ts[event.doc_id]),
+            FieldNames.RECEIVED_TS: _iso_ts(event.api_log.created),
+            FieldNames.EVENT_DETAILS: event.api_log.task_data,
+        }
+        for event in events[-settings.DEDUP_SAMPLE_SIZE :]
+    ]
+    return {
+        "lang": "painless",
+        "source": _COMPACT_SCRIPT_SOURCE,
+        "params": {
+            "count": len(events),
+            "last_seen": _iso_ts(max(event_ts.values())),
+            "samples": samples,
+            "max_samples": settings.DEDUP_SAMPLE_SIZE,
+            "update_ts": update_ts,
+        },
+    }
+
+
+def _set_api_log_status(api_log: ApiLog, status: str, failure_reason: str = ""):
+    """Set ApiLog status. Used with `bulk_update` which bypasses `save()`."""
+    api_log.status = status
+    api_log.status_changed = timezone.now()
+    api_log.failure_reason = failure_reason
+    api_log.modified = api_log.status_changed
+
+
+# Helper Functions used in ingest tasks - End
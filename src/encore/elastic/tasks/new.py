@@ -1,24 +1,34 @@
 """Task to process New Event."""
 
 import logging
+import typing as t
 
+from django.conf import settings
+from django.db.models import F
+from django.db.transaction import on_commit
 from django.utils import timezone
 
-from elastic.constants import (
-    ACTIVE_EVENT_STATUS,
-    EVENT_INDEX_RE,
-    EventExtrasKey,
-    EventStatus,
-    EventType,
-    FieldNames,
-    ResolvingAction,
-)
+from elastic import correlation_index, flapping, storm
+from elastic.constants import EVENT_INDEX_RE, EventExtrasKey, EventStatus, EventType, FieldNames, ResolvingAction
+from elastic.lookups import active_down_events
 from elastic.models import Event
-from elastic.tasks.common import correlator_task
+from elastic.tasks.common import correlator_task, wake_events
 from elastic.utils import CorrelatorElastic, SearchResponseType
 
 logger = logging.getLogger("correlator.elastic.tasks.new")
 
+# Check-and-set of the link, so linking is idempotent: a Down Event already linked to another Up Event is left as is
+_LINK_SCRIPT_SOURCE = f"""
+    def src = ctx._source;
+    if (src.{FieldNames.LINKED_EVENT} == null || src.{FieldNames.LINKED_EVENT} == params.linked_event) {{
+        src.{FieldNames.LINKED_EVENT} = params.linked_event;
+        src.{FieldNames.LINKED_EVENT_INDEX} = params.linked_event_index;
+        src.{FieldNames.LAST_UPDATE_TS} = params.update_ts;
+    }} else {{
+        ctx.op = 'noop';
+    }}
+"""
+
 
 @correlator_task(
     name="NewUpEvent",
@@ -34,6 +44,28 @@ def process_new_up_event(event: int | Event):
     if not isinstance(event, Event):
         return
 
+    # Is Flapping?
+    damping = flapping.up_event_damping(event)
+    if damping.action == flapping.FlapAction.HOLD:
+        logger.debug("Holding Up Event of Flapping Asset: %s", event.doc_id)
+        return
+    if damping.action == flapping.FlapAction.ABSORB:
+        # Mark Up Event as Deduped (Link the latest Up Event, if any)
+        doc = {FieldNames.EVENT_STATUS: EventStatus.DEDUPED, FieldNames.LAST_UPDATE_TS: timezone.now()}
+        if damping.latest_up_event:
+            doc[FieldNames.INITIAL_EVENT] = damping.latest_up_event[1]
+            doc[FieldNames.INITIAL_EVENT_INDEX] = damping.latest_up_event[0]
+        try:
+            event.update_elastic_event(doc)
+        except Exception as e:
+            event.report_error(f"Failed to Absorb Up Event of Flapping Asset [Task: NewUpEvent]. Reason: {e}")
+            logger.error("Failed to Absorb Up Event of Flapping Asset: %s [Reason: %s]", event.doc_id, e)
+            return
+        event.status = EventStatus.DEDUPED
+        event.save()
+        logger.info("Absorbed Up Event of Flapping Asset: %s", event.doc_id)
+        return
+
     es = CorrelatorElastic()
 
     if not (elk_event := event.elastic_event):
@@ -42,93 +74,88 @@ def process_new_up_event(event: int | Event):
     elk_event_src = elk_event["_source"]
 
     logger.debug("Finding Active Down Event: %s", event.doc_id)
-    search_query = {
-        "bool": {
-            "must_not": {"exists": {"field": FieldNames.LINKED_EVENT}},
-            "must": [
-                {"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}},
-                {"range": {FieldNames.EVENT_TS: {"lte": elk_event_src[FieldNames.EVENT_TS]}}},
-                {"term": {f"{FieldNames.TOOL_NAME}.keyword": elk_event_src[FieldNames.TOOL_NAME]}},
-                {"term": {f"{FieldNames.EVENT_TITLE}.keyword": elk_event_src[FieldNames.EVENT_TITLE]}},
-                {
-                    "term": {
-                        f"{FieldNames.ASSET_UNIQUE_ID}.keyword": {
-                            "value": elk_event_src[FieldNames.ASSET_UNIQUE_ID],
-                            "case_insensitive": True,
-                        }
-                    }
-                },
-            ],
-            "should": [{"term": {f"{FieldNames.EVENT_STATUS}.keyword": _estatus}} for _estatus in ACTIVE_EVENT_STATUS],
-            "minimum_should_match": 1,
-        }
-    }
-    elk_down_events = es.search(
-        index=EVENT_INDEX_RE,
-        query=search_query,
-        sort=[{FieldNames.EVENT_TS: {"order": "desc"}}],
+    elk_down_events = active_down_events(
+        es,
+        tool_name=elk_event_src[FieldNames.TOOL_NAME],
+        title=elk_event_src[FieldNames.EVENT_TITLE],
+        asset_unique_id=elk_event_src[FieldNames.ASSET_UNIQUE_ID],
+        until_ts=elk_event_src[FieldNames.EVENT_TS],
+        latest_first=True,
         size=1000,
-        response_type=SearchResponseType.HIT_LIST,
     )
 
+    if not elk_down_events:
+        elk_down_events = _get_elk_linked_down_events(es, event)
+
     if elk_down_events:
         # Link Up and Down Events
         # Mark Up Event as Resolved
 
         logger.debug("Found Active Down Event: %s -> %s", event.doc_id, elk_down_events[0]["_id"])
         _update_ts = timezone.now()
-        down_doc = {
-            FieldNames.LINKED_EVENT: event.doc_id,
-            FieldNames.LINKED_EVENT_INDEX: event.doc_index,
-            FieldNames.LAST_UPDATE_TS: _update_ts,
-        }
-
-        up_doc = {
-            FieldNames.LINKED_EVENT: elk_down_events[0]["_id"],
-            FieldNames.LINKED_EVENT_INDEX: elk_down_events[0]["_index"],
-            FieldNames.EVENT_STATUS: EventStatus.RESOLVED,
-            FieldNames.LAST_UPDATE_TS: _update_ts,
-        }
-
-        try:
-            # First Update the UP Event in Elastic
-            es.update(index=event.doc_index, id=event.doc_id, doc=up_doc)
-            # Then Update the latest Down Event in Elastic
-            es.update(index=elk_down_events[0]["_index"], id=elk_down_events[0]["_id"], doc=down_doc)
-        except Exception as e:
-            event.report_error(f"Failed to Link Event [Task: NewUpEvent]. Reason: {e}")
-            logger.error("Failed to Link Event: %s -> %s [Reason: %s]", event.doc_id, elk_down_events[0]["_id"], e)
-            return
-
-        # Now Update rest of the Down Events (if any) in Elastic
         ops = []
-        for elk_down_event in elk_down_events[1:]:
+        for elk_down_event in elk_down_events:
             ops.extend(
                 [
                     {"update": {"_index": elk_down_event["_index"], "_id": elk_down_event["_id"]}},
-                    {"doc": down_doc},
+                    {"script": _link_script(event, _update_ts)},
                 ]
             )
-        if ops:
-            try:
-                es.bulk(operations=ops)
-            except Exception as e:
-                event.report_error(
-                    f"Failed to Link Additional Events [Task: NewUpEvent]. Reason: {e}",
-                    incr_flag=False,
-                    check_repeat_count=False,
-                )
+        try:
+            # First Link the Down Events in Elastic
+            items = es.bulk(operations=ops)["items"]
+        except Exception as e:
+            event.report_error(f"Failed to Link Event [Task: NewUpEvent]. Reason: {e}")
+            logger.error("Failed to Link Event: %s -> %s [Reason: %s]", event.doc_id, elk_down_events[0]["_id"], e)
+            return
+
+        # Down Events linked to another Up Event meanwhile are left out (noop)
+        linked_elk_down_events = []
+        for elk_down_event, item in zip(elk_down_events, items):
+            if item["update"].get("result") == "updated":
+                linked_elk_down_events.append(elk_down_event)
+            elif "error" in item["update"]:
                 logger.warning(
-                    "Failed to Link Additional Events: %s -> %s [Reason: %s]",
+                    "Failed to Link Event: %s -> %s [Reason: %s]",
                     event.doc_id,
-                    elk_down_events[0]["_id"],
-                    e,
+                    elk_down_event["_id"],
+                    item["update"]["error"],
                 )
+        if not linked_elk_down_events:
+            event.report_error("Failed to Link Event [Task: NewUpEvent]. Reason: Down Events were not linked")
+            logger.error("Failed to Link Event: %s -> %s", event.doc_id, elk_down_events[0]["_id"])
+            return
 
-        # Finally Update the Up Event in Postgres
+        up_doc = {
+            FieldNames.LINKED_EVENT: linked_elk_down_events[0]["_id"],
+            FieldNames.LINKED_EVENT_INDEX: linked_elk_down_events[0]["_index"],
+            FieldNames.EVENT_STATUS: EventStatus.RESOLVED,
+            FieldNames.LAST_UPDATE_TS: _update_ts,
+        }
+        try:
+            # Then Update the UP Event in Elastic
+            event.update_elastic_event(up_doc)
+        except Exception as e:
+            event.report_error(f"Failed to Link Event [Task: NewUpEvent]. Reason: {e}")
+            logger.error(
+                "Failed to Link Event: %s -> %s [Reason: %s]", event.doc_id, linked_elk_down_events[0]["_id"], e
+            )
+            return
+
+        # Finally Update the Up & Down Events in Postgres
+        # Only the Down Events not linked yet (by a previous run), so their version is bumped once: a task that read
+        # a Down Event before the link fails to save it (conflict), instead of overriding the link.
+        Event.objects.filter(
+            doc_id__in=[elk_down_event["_id"] for elk_down_event in linked_elk_down_events],
+            linked_event__isnull=True,
+        ).update(linked_event=event, version=F("version") + 1, modified=timezone.now())
+        event.linked_event = Event.objects.filter(doc_id=linked_elk_down_events[0]["_id"]).first()
         event.status = EventStatus.RESOLVED
         event.save()
-        logger.info("Linked and Resolved Up Event: %s -> %s", event.doc_id, elk_down_events[0]["_id"])
+        logger.info("Linked and Resolved Up Event: %s -> %s", event.doc_id, linked_elk_down_events[0]["_id"])
+        # Linked Down Events are no longer looked up
+        on_commit(lambda: correlation_index.remove_elastic_events(linked_elk_down_events))
+        wake_events(doc_ids=[elk_down_event["_id"] for elk_down_event in linked_elk_down_events])
     else:
         if event.retry_count:  # is >0
             logger.warning("Failed to find Active Down Event: %s", event.doc_id)
@@ -139,7 +166,7 @@ def process_new_up_event(event: int | Event):
             }
             try:
                 # Mark Up Event as Error[Missing Down Event]
-                es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+                event.update_elastic_event(doc)
             except Exception as e:
                 event.report_error(f"Failed to Un-Resolved Up Event [Task: NewUpEvent]. Reason: {e}")
                 logger.error("Failed to Un-Resolved Up Event: %s [Reason: %s]", event.doc_id, e)
@@ -183,7 +210,7 @@ def process_new_down_event(event: int | Event):
             FieldNames.LAST_UPDATE_TS: timezone.now(),
         }
         try:
-            es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+            event.update_elastic_event(doc)
         except Exception as e:
             event.report_error(f"Failed to Move Linked Down Event to Resolving [Task: NewDownEvent]. Reason: {e}")
             logger.error("Failed to Move Linked Down Event to Resolving: %s [Reason: %s]", event.doc_id, e)
@@ -195,7 +222,7 @@ def process_new_down_event(event: int | Event):
         return
 
     # Is Duplicate?
-    # TODO: Can dedup be done at the time of ingestion?
+    # NOTE: With DEDUP_AT_INGEST, most duplicates are deduped by the ingest tasks (check elastic/dedup.py)
     if event.retry_count < 3 and (elk_initial_event := _get_elk_initial_event(es, elk_event)):
         # Link Initial Event
         # Mark Down Events as Deduped
@@ -207,7 +234,7 @@ def process_new_down_event(event: int | Event):
             FieldNames.LAST_UPDATE_TS: timezone.now(),
         }
         try:
-            es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+            event.update_elastic_event(doc)
         except Exception as e:
             event.report_error(
                 f"Failed to Link Initial and Dedup Down Event [{elk_initial_event["_id"]}]"
@@ -234,35 +261,20 @@ def process_new_down_event(event: int | Event):
         and elk_event_src[FieldNames.PARENT_ASSET_UNIQUE_ID]
     ):
         logger.debug("Finding Active Parent Down Event: %s", event.doc_id)
-        search_query = {
-            "bool": {
-                "must_not": {"exists": {"field": FieldNames.LINKED_EVENT}},
-                "must": [
-                    {"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}},
-                    {"term": {f"{FieldNames.TOOL_NAME}.keyword": elk_event_src[FieldNames.TOOL_NAME]}},
-                    {"term": {f"{FieldNames.EVENT_TITLE}.keyword": elk_event_src[FieldNames.EVENT_TITLE]}},
-                    {
-                        "term": {
-                            f"{FieldNames.ASSET_UNIQUE_ID}.keyword": {
-                                "value": elk_event_src[FieldNames.PARENT_ASSET_UNIQUE_ID],
-                                "case_insensitive": True,
-                            }
-                        }
-                    },
-                ],
-                "should": [
-                    {"term": {f"{FieldNames.EVENT_STATUS}.keyword": _estatus}} for _estatus in ACTIVE_EVENT_STATUS
-                ],
-                "minimum_should_match": 1,
-            }
-        }
+        if elk_parent_down_events := active_down_events(
+            es,
+            tool_name=elk_event_src[FieldNames.TOOL_NAME],
+            title=elk_event_src[FieldNames.EVENT_TITLE],
+            asset_unique_id=elk_event_src[FieldNames.PARENT_ASSET_UNIQUE_ID],
+        ):
+            elk_parent_down_event = elk_parent_down_events[0]
+
+    # Check wait time before creating a ticket
+    wait_time_over = (timezone.now() - event.event_ts).total_seconds() > event.wait_time_in_seconds
 
-        elk_parent_down_event = es.search(
-            index=EVENT_INDEX_RE,
-            query=search_query,
-            sort=[{FieldNames.EVENT_TS: {"order": "asc"}}],
-            response_type=SearchResponseType.FIRST_HIT,
-        )
+    if not elk_parent_down_event and wait_time_over and settings.EVENT_STORM_DETECTION:
+        # Is an Event Storm? Suppress under its Master Incident instead of creating one more ticket
+        elk_parent_down_event = storm.master_event(es, event, elk_event_src)
 
     if elk_parent_down_event:
         logger.debug("Found Active Parent Down Event: %s -> %s", event.doc_id, elk_parent_down_event["_id"])
@@ -279,7 +291,7 @@ def process_new_down_event(event: int | Event):
             doc[FieldNames.ITSM_TICKET] = elk_parent_down_event["_source"][FieldNames.ITSM_TICKET]
 
         try:
-            es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+            event.update_elastic_event(doc)
         except Exception as e:
             event.report_error(
                 f"Failed to Link Parent and Suppress Down Event [{elk_parent_down_event["_id"]}]"
@@ -293,6 +305,7 @@ def process_new_down_event(event: int | Event):
             )
             return
         event.status = EventStatus.SUPPRESSED
+        event.parent_event = Event.objects.filter(doc_id=elk_parent_down_event["_id"]).first()
         if FieldNames.ITSM_TICKET in elk_parent_down_event["_source"]:
             event.extras[EventExtrasKey.TICKET_ID] = elk_parent_down_event["_source"][FieldNames.ITSM_TICKET]
         event.retry_count = 0
@@ -302,14 +315,14 @@ def process_new_down_event(event: int | Event):
         # Either Parent Child Lookup is not required OR
         # Asset does not have a valid Parent defined in Asset Mapping OR
         # NO Active Down event received for Parent Asset
+        # (AND NO Event Storm)
 
-        # Check wait time before creating a ticket
-        if (timezone.now() - event.event_ts).total_seconds() > event.wait_time_in_seconds:
+        if wait_time_over:
             logger.debug("Moving Down Event to Creating Ticket: %s", event.doc_id)
             doc = {FieldNames.EVENT_STATUS: EventStatus.CREATING_TICKET, FieldNames.LAST_UPDATE_TS: timezone.now()}
             try:
                 # Mark Down Event as Creating Ticket
-                es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+                event.update_elastic_event(doc)
             except Exception as e:
                 event.report_error(f"Failed to Move Down Event to Creating Ticket [Task: NewDownEvent]. Reason: {e}")
                 logger.error("Failed to Move Down Event to Creating Ticket: %s [Reason: %s]", event.doc_id, e)
@@ -323,40 +336,54 @@ def process_new_down_event(event: int | Event):
         event.save()
 
 
+# Helper Functions used in process_new_up_event - Start
+
+
+def _link_script(event: Event, update_ts) -> t.Dict[str, t.Any]:
+    """Link the Down Event to the Up Event, unless it is linked to another Up Event (noop)"""
+    return {
+        "source": _LINK_SCRIPT_SOURCE,
+        "params": {"linked_event": event.doc_id, "linked_event_index": event.doc_index, "update_ts": update_ts},
+    }
+
+
+def _get_elk_linked_down_events(es: CorrelatorElastic, event: Event):
+    """Down Events linked to the Up Event by a previous run, which did not resolve the Up Event (e.g. rolled back on
+    a conflict). They are no longer active, so they are not found by the lookup.
+    """
+    return es.search(
+        index=EVENT_INDEX_RE,
+        query={
+            "bool": {
+                "must": [
+                    {"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}},
+                    {"term": {f"{FieldNames.LINKED_EVENT}.keyword": event.doc_id}},
+                ]
+            }
+        },
+        sort=[{FieldNames.EVENT_TS: {"order": "desc"}}],
+        size=1000,
+        response_type=SearchResponseType.HIT_LIST,
+    )
+
+
+# Helper Functions used in process_new_up_event - End
+
+
 # Helper Functions used in process_new_down_event - Start
 
 
 def _get_elk_initial_event(es: CorrelatorElastic, elk_event):
     elk_event_src = elk_event["_source"]
     logger.debug("Finding Active Initial Down Event: %s", elk_event["_id"])
-    search_query = {
-        "bool": {
-            "must_not": {"exists": {"field": FieldNames.LINKED_EVENT}},
-            "must": [
-                {"term": {f"{FieldNames.EVENT_TYPE}.keyword": EventType.DOWN}},
-                {"range": {FieldNames.EVENT_TS: {"lte": elk_event_src[FieldNames.EVENT_TS]}}},
-                {"term": {f"{FieldNames.TOOL_NAME}.keyword": elk_event_src[FieldNames.TOOL_NAME]}},
-                {"term": {f"{FieldNames.EVENT_TITLE}.keyword": elk_event_src[FieldNames.EVENT_TITLE]}},
-                {
-                    "term": {
-                        f"{FieldNames.ASSET_UNIQUE_ID}.keyword": {
-                            "value": elk_event_src[FieldNames.ASSET_UNIQUE_ID],
-                            "case_insensitive": True,
-                        }
-                    }
-                },
-            ],
-            "should": [{"term": {f"{FieldNames.EVENT_STATUS}.keyword": _estatus}} for _estatus in ACTIVE_EVENT_STATUS],
-            "minimum_should_match": 1,
-        }
-    }
-
-    if elk_initial_event := es.search(
-        index=EVENT_INDEX_RE,
-        query=search_query,
-        sort=[{FieldNames.EVENT_TS: {"order": "asc"}}],
-        response_type=SearchResponseType.FIRST_HIT,
+    if elk_initial_events := active_down_events(
+        es,
+        tool_name=elk_event_src[FieldNames.TOOL_NAME],
+        title=elk_event_src[FieldNames.EVENT_TITLE],
+        asset_unique_id=elk_event_src[FieldNames.ASSET_UNIQUE_ID],
+        until_ts=elk_event_src[FieldNames.EVENT_TS],
     ):
+        elk_initial_event = elk_initial_events[0]
         if elk_initial_event["_id"] != elk_event["_id"]:
             logger.debug("Found Active Initial Down Event: %s --> %s", elk_event["_id"], elk_initial_event["_id"])
             return elk_initial_event
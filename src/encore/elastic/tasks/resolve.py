@@ -7,7 +7,7 @@ from django.utils import timezone
 from elastic.constants import EventExtrasKey, EventStatus, EventType, FieldNames, ResolvingAction
 from elastic.models import ApiLog, Event
 from elastic.utils import CorrelatorElastic
-from .common import correlator_task
+from .common import correlator_task, wake_events
 
 logger = logging.getLogger("correlator.elastic.tasks.resolve")
 
@@ -48,6 +48,8 @@ def resolve_event(*, api_log: int | ApiLog):
 
     # NOTE: Since we are not locking Event row, we cannot update Event. The only way to pass this message
     # is by updating the Elastiic Event.
+    # With OPTIMISTIC_CONCURRENCY, a task that read the Elastic Event before this update fails to update it (conflict)
+    # & runs again on the updated one, instead of overriding it.
     es = CorrelatorElastic()
     doc = {
         FieldNames.RESOLVING_ACTION: ResolvingAction.MANUAL,
@@ -69,6 +71,7 @@ def resolve_event(*, api_log: int | ApiLog):
         return
     api_log.status = ApiLog.Status.COMPLETED
     api_log.save()
+    wake_events(event_pks=[event.pk])
     logger.info(
         "[ApiLog: %s]: Manually Resolved Alerted Event [%s] with ITSM [%s]", api_log.pk, event.pk, itsm_ticket_id
     )
@@ -12,8 +12,8 @@ from elastic.tasks.common import (
     all_immediate_child_events_are_resolved_manually,
     correlator_task,
     itsm_activity,
+    wake_events,
 )
-from elastic.utils import CorrelatorElastic
 from glpi.utils import GLPIException, add_comment, close_ticket, get_glpi_session, kill_glpi_session
 
 logger = logging.getLogger("correlator.elastic.tasks.resolving")
@@ -26,6 +26,7 @@ logger = logging.getLogger("correlator.elastic.tasks.resolving")
     valid_start_status={EventStatus.RESOLVING},
     valid_start_types={EventType.DOWN},
     logger=logger,
+    external_side_effects=True,  # ITSM (GLPI)
 )
 def process_resolving_event(event: int | Event):
     """Logic to process Event in Resolving status."""
@@ -33,8 +34,6 @@ def process_resolving_event(event: int | Event):
     if not isinstance(event, Event):
         return
 
-    es = CorrelatorElastic()
-
     if not (elk_event := event.elastic_event):
         event.report_error("Elastic Event Does not Exist [Task: ResolvingEvent]")
         return
@@ -93,7 +92,7 @@ def process_resolving_event(event: int | Event):
     # Mark Event as Resolved
     doc = {FieldNames.EVENT_STATUS: EventStatus.RESOLVED, FieldNames.LAST_UPDATE_TS: timezone.now()}
     try:
-        es.update(index=event.doc_index, id=event.doc_id, doc=doc)
+        event.update_elastic_event(doc)
     except Exception as e:
         event.report_error(f"Failed to Resolve Event [Task: ResolvingEvent]. Reason: {e}")
         logger.error("Failed to Resolve Event: %s [Reason: %s]", event.doc_id, e)
@@ -101,3 +100,6 @@ def process_resolving_event(event: int | Event):
     event.status = EventStatus.RESOLVED
     event.save()
     logger.info("Resolved Event: %s", event.doc_id)
+    # Parent Event may be waiting for all its child Events to resolve
+    if elk_event_src.get(FieldNames.PARENT_EVENT, None):
+        wake_events(doc_ids=[elk_event_src[FieldNames.PARENT_EVENT]])
@@ -0,0 +1,43 @@
+"""Safety Sweep of the Events waiting for a Wakeup (EVENT_DRIVEN_WAKEUPS)"""
+
+import logging
+from datetime import timedelta
+
+from celery import shared_task
+
+from django.conf import settings
+from django.utils import timezone
+
+from correlator.celery import only_one_task_at_a_time
+from correlator.celery_utils import CorrelatorPeriodicTask
+from elastic.constants import WAKEUP_EVENT_STATUS, EventExtrasKey
+from elastic.models import Event
+from elastic.tasks.common import wake_events
+
+logger = logging.getLogger("correlator.elastic.tasks.sweep")
+
+SWEEP_CHUNK_SIZE = 1000
+
+
+@shared_task(
+    name="SweepWaitingEvents",
+    base=CorrelatorPeriodicTask,
+    run_every=timedelta(seconds=settings.EVENT_SWEEP_INTERVAL),
+    bind=True,
+)
+@only_one_task_at_a_time(key="SweepWaitingEvents", timeout_in_seconds=settings.EVENT_SWEEP_INTERVAL)
+def sweep_waiting_events():
+    """Wake up the waiting Events that were not processed in the last EVENT_SWEEP_INTERVAL.
+    Catches the wakeups that were missed (e.g. failed ITSM activity, or a change racing with the Event's own task).
+    """
+    if not settings.EVENT_DRIVEN_WAKEUPS:
+        return
+    cutoff_ts = timezone.now() - timedelta(seconds=settings.EVENT_SWEEP_INTERVAL)
+    event_pks = list(
+        Event.objects.filter(status__in=WAKEUP_EVENT_STATUS, modified__lt=cutoff_ts)
+        .exclude(extras__has_key=EventExtrasKey.PARKED)
+        .values_list("pk", flat=True)
+    )
+    for idx in range(0, len(event_pks), SWEEP_CHUNK_SIZE):
+        wake_events(event_pks=event_pks[idx : idx + SWEEP_CHUNK_SIZE])
+    logger.info("Woke up %s waiting Events", len(event_pks))
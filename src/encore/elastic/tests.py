@@ -1,3 +1,1052 @@
-from django.test import TestCase
+"""Elastic Test Cases"""
 
-# Create your tests here.
+import copy
+import json
+import time
+import typing as t
+import zlib
+from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
+from unittest import mock
+
+import redis
+from elasticsearch import ConflictError
+
+from django.db.models import F
+from django.test import RequestFactory, SimpleTestCase, TestCase, override_settings
+from django.utils import timezone
+
+from elastic import correlation_index, dedup, flapping, scheduler, storm
+from elastic.constants import EventExtrasKey, EventStatus, EventType, FieldNames
+from elastic.lookups import active_down_events
+from elastic.models import ApiLog, ErrorLog, Event
+from elastic.tasks import common, ingest, new
+from elastic.tasks.batch_sweep import sweep_status
+from elastic.tasks.create_ticket import process_creating_ticket_event
+from elastic.utils import parse_event_ts
+from elastic.views.common import PayloadError, decode_body
+from elastic.views.event import event_bulk
+from launchpad.cache import correlation_rule_table
+from launchpad.models import CorrelationRule, MonitorTool, MonitorToolIP
+
+ELASTIC_MODULES = [
+    "elastic.tasks.batch_sweep",
+    "elastic.models.event",
+    "elastic.tasks.common",
+    "elastic.tasks.create_ticket",
+    "elastic.tasks.new",
+]
+
+
+class FakeElastic:
+    """In-memory Elastic Events, with the seq_no checks of the optimistic concurrency"""
+
+    def __init__(self) -> None:
+        self.docs: t.Dict[str, t.Dict[str, t.Any]] = {}  # doc id -> {"_index", "_seq_no", "_source"}
+        self.seq_no = 0
+        self.stale_reads: t.Dict[str, t.Dict[str, t.Any]] = {}  # doc id -> hit, returned by the next get
+        self.hooks: t.Dict[str, t.Callable[[], None]] = {}  # "before_bulk" / "after_bulk" -> run once, as another task
+        self.bulk_count = 0
+
+    def add(self, index: str, doc_id: str, source: t.Dict[str, t.Any]):
+        """Add an Elastic Event"""
+        self.seq_no += 1
+        self.docs[doc_id] = {"_index": index, "_seq_no": self.seq_no, "_source": copy.deepcopy(source)}
+
+    def source(self, doc_id: str) -> t.Dict[str, t.Any]:
+        """Source of the Elastic Event"""
+        return self.docs[doc_id]["_source"]
+
+    def change(self, doc_id: str, doc: t.Dict[str, t.Any]):
+        """Change the Elastic Event, as another task would"""
+        self.seq_no += 1
+        self.docs[doc_id]["_seq_no"] = self.seq_no
+        self.docs[doc_id]["_source"].update(doc)
+
+    def _hit(self, doc_id: str) -> t.Dict[str, t.Any]:
+        doc = self.docs[doc_id]
+        return {
+            "_index": doc["_index"],
+            "_id": doc_id,
+            "_seq_no": doc["_seq_no"],
+            "_primary_term": 1,
+            "_source": copy.deepcopy(doc["_source"]),
+        }
+
+    def _run_hook(self, name: str):
+        if hook := self.hooks.pop(name, None):
+            hook()
+
+    def get_event(self, event_index: str, event_id: str, **kwargs):
+        """Get the Elastic Event"""
+        if event_id in self.stale_reads:
+            return self.stale_reads.pop(event_id)
+        return self._hit(event_id) if event_id in self.docs else None
+
+    def mget(self, docs, **kwargs):
+        """Get the Elastic Events"""
+        return {"docs": [{**self._hit(doc["_id"]), "found": True} if doc["_id"] in self.docs else {} for doc in docs]}
+
+    def get_nested_field_value(self, elk_event, field: str):
+        """Value of the nested field"""
+        return None
+
+    def update(self, index: str, id: str, doc=None, if_seq_no=None, if_primary_term=None, **kwargs):
+        """Update the Elastic Event"""
+        # pylint: disable=redefined-builtin
+        if if_seq_no is not None and self.docs[id]["_seq_no"] != if_seq_no:
+            raise ConflictError("version_conflict_engine_exception", mock.Mock(status=409), {})
+        self.change(id, doc)
+        return {"_seq_no": self.docs[id]["_seq_no"], "_primary_term": 1, "result": "updated"}
+
+    def _run_link_script(self, doc_id: str, script: t.Dict[str, t.Any]) -> str:
+        assert script["source"] == new._LINK_SCRIPT_SOURCE  # pylint: disable=protected-access
+        params = script["params"]
+        if self.source(doc_id).get(FieldNames.LINKED_EVENT) not in (None, params["linked_event"]):
+            return "noop"
+        self.change(
+            doc_id,
+            {
+                FieldNames.LINKED_EVENT: params["linked_event"],
+                FieldNames.LINKED_EVENT_INDEX: params["linked_event_index"],
+                FieldNames.LAST_UPDATE_TS: params["update_ts"],
+            },
+        )
+        return "updated"
+
+    def _run_compact_script(self, doc_id: str, script: t.Dict[str, t.Any]) -> str:
+        assert script["source"] == ingest._COMPACT_SCRIPT_SOURCE  # pylint: disable=protected-access
+        params = script["params"]
+        self.change(
+            doc_id,
+            {
+                FieldNames.DUP_COUNT: self.source(doc_id).get(FieldNames.DUP_COUNT, 0) + params["count"],
+                FieldNames.LAST_SEEN_TS: params["last_seen"],
+            },
+        )
+        return "updated"
+
+    def bulk(self, operations, **kwargs):
+        """Delete or update the Elastic Events (the doc, or the link / compact script)"""
+        self.bulk_count += 1
+        self._run_hook("before_bulk")
+        items = []
+        operations = iter(operations)
+        for action in operations:
+            ((op_type, meta),) = action.items()
+            doc_id = meta["_id"]
+            body = next(operations) if op_type == "update" else {}
+            if doc_id not in self.docs:
+                items.append({op_type: {"_id": doc_id, "status": 404, "error": {"type": "document_missing_exception"}}})
+                continue
+            if (if_seq_no := meta.get("if_seq_no")) is not None and self.docs[doc_id]["_seq_no"] != if_seq_no:
+                items.append({op_type: {"_id": doc_id, "status": 409, "error": {"type": "version_conflict"}}})
+                continue
+            if op_type == "delete":
+                del self.docs[doc_id]
+                result = "deleted"
+            elif "script" not in body:
+                self.change(doc_id, body["doc"])
+                result = "updated"
+            elif body["script"]["source"] == new._LINK_SCRIPT_SOURCE:  # pylint: disable=protected-access
+                result = self._run_link_script(doc_id, body["script"])
+            else:
+                result = self._run_compact_script(doc_id, body["script"])
+            items.append({op_type: {"_id": doc_id, "status": 200, "result": result}})
+        self._run_hook("after_bulk")
+        return {"items": items}
+
+    def search(self, query, **kwargs):
+        """Elastic Events matching all the terms of the bool query"""
+        terms = {}
+        for clause in query["bool"]["must"]:
+            ((field, value),) = clause["term"].items()
+            terms[field.removesuffix(".keyword")] = value
+        return [
+            self._hit(doc_id)
+            for doc_id, doc in self.docs.items()
+            if all(doc["_source"].get(field) == value for field, value in terms.items())
+        ]
+
+
+class ElasticTestCase(TestCase):
+    """Base Test Case: a monitor tool with a default Correlation Rule, and Elastic replaced by FakeElastic"""
+
+    def setUp(self):
+        self.es = FakeElastic()
+        for module in ELASTIC_MODULES:
+            patcher = mock.patch(f"{module}.CorrelatorElastic", return_value=self.es)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch("celery.app.task.Task.apply_async")
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.monitor_tool = MonitorTool.objects.create(name="Nagios")
+        self.monitor_tool_ip = MonitorToolIP.objects.create(ip="10.0.0.1", monitor_tool=self.monitor_tool)
+        CorrelationRule.objects.create(
+            monitor_tool=self.monitor_tool,
+            event_title="*",
+            parent_child_lookup_required=False,
+            wait_time_in_seconds=0,
+            do_not_create_ticket_flag=False,
+            itsm_severity=4,
+        )
+        correlation_rule_table.invalidate()
+        self.addCleanup(correlation_rule_table.invalidate)
+
+    def create_event(self, doc_id: str, event_type: str, status: str = EventStatus.NEW, **source) -> Event:
+        """Create the Event & its Elastic Event"""
+        event_ts = timezone.now() - timedelta(minutes=10 if event_type == EventType.DOWN else 0)
+        api_log = ApiLog.objects.create(
+            remote_ip=self.monitor_tool_ip.ip, task=ApiLog.TaskType.EVENT, task_data={}, method=ApiLog.LogMethods.POST
+        )
+        event = Event.objects.create(
+            api_log=api_log,
+            monitor_tool_ip=self.monitor_tool_ip,
+            doc_id=doc_id,
+            doc_index="events-test",
+            status=status,
+            title="Host Down",
+            event_ts=event_ts,
+            event_type=event_type,
+            asset_unique_id="host1",
+            monitor_tool_name=self.monitor_tool.name,
+            asset_key="HOST1",
+            retry_count=0,
+        )
+        self.es.add(
+            event.doc_index,
+            doc_id,
+            {
+                FieldNames.TOOL_NAME: self.monitor_tool.name,
+                FieldNames.EVENT_TITLE: event.title,
+                FieldNames.EVENT_DESC: "",
+                FieldNames.ASSET_UNIQUE_ID: event.asset_unique_id,
+                FieldNames.EVENT_TYPE: event_type,
+                FieldNames.EVENT_STATUS: status,
+                FieldNames.EVENT_TS: event_ts.isoformat(),
+                **source,
+            },
+        )
+        return event
+
+
+@override_settings(OPTIMISTIC_CONCURRENCY=True)
+class OptimisticConcurrencyTestCase(ElasticTestCase):
+    """Tasks running concurrently on the same Events, with OPTIMISTIC_CONCURRENCY"""
+
+    def test_ticket_created_while_down_event_is_linked(self):
+        """A Ticket created in GLPI is kept, even if the Down Event is linked by an Up Event meanwhile"""
+        down_event = self.create_event("down", EventType.DOWN, status=EventStatus.CREATING_TICKET)
+        up_event = self.create_event("up", EventType.UP, status=EventStatus.RESOLVED)
+
+        def create_ticket(**kwargs):
+            # NewUpEvent links the Down Event in Elastic while the Ticket is created (& waits for the lock to link it
+            # in Postgres)
+            self.es.change(down_event.doc_id, {FieldNames.LINKED_EVENT: up_event.doc_id})
+            return 42
+
+        with (
+            mock.patch("elastic.tasks.create_ticket.get_glpi_session"),
+            mock.patch("elastic.tasks.create_ticket.kill_glpi_session"),
+            mock.patch("elastic.tasks.create_ticket.create_ticket", side_effect=create_ticket) as glpi_create_ticket,
+        ):
+            process_creating_ticket_event.apply(kwargs={"event": down_event.pk})
+
+        glpi_create_ticket.assert_called_once()
+        down_event.refresh_from_db()
+        self.assertEqual(down_event.status, EventStatus.ALERTED)
+        self.assertEqual(down_event.extras[EventExtrasKey.TICKET_ID], 42)
+        self.assertEqual(self.es.source(down_event.doc_id)[FieldNames.ITSM_TICKET], 42)
+        self.assertEqual(self.es.source(down_event.doc_id)[FieldNames.LINKED_EVENT], up_event.doc_id)
+
+
+@override_settings(
+    ADMISSION_CONTROL=True,
+    ADMISSION_MAX_QUEUE_LENGTH=0,
+    ADMISSION_MAX_NEW_API_LOGS=0,
+    ADMISSION_MAX_BUFFER_LENGTH=0,
+    IDEMPOTENCY_KEY_FIELD="id",
+    INGEST_WRITE_BUFFER=False,
+)
+class IngestQuotaTestCase(ElasticTestCase):
+    """Ingest quota of the Monitor Tool (Redis is mocked)"""
+
+    def setUp(self):
+        super().setUp()
+        self.monitor_tool.ingest_quota_per_minute = 10
+        self.monitor_tool.save()
+        self.redis_client = mock.MagicMock()
+        redis_settings = override_settings(REDIS_CLIENT=self.redis_client)
+        redis_settings.enable()
+        self.addCleanup(redis_settings.disable)
+
+    def _post_bulk(self, body: bytes):
+        request = RequestFactory().post(
+            "/", data=body, content_type="application/json", HTTP_X_FORWARDED_FOR=self.monitor_tool_ip.ip
+        )
+        return event_bulk(request)
+
+    def test_charged_for_accepted_events(self):
+        """Repeated & malformed events are not charged"""
+        pipe = self.redis_client.pipeline.return_value
+        pipe.execute.side_effect = [[True, None], [1, True]]  # Idempotency keys claimed, quota count
+        response = self._post_bulk(b'{"id": "1"}\n{"id": "2"}\nnot json\n')
+
+        self.assertEqual(response.status_code, 202)
+        self.assertEqual(json.loads(response.content)["accepted"], 1)
+        pipe.incrby.assert_called_once_with(mock.ANY, 1)
+
+    def test_quota_exceeded(self):
+        """Claimed idempotency keys are released, so that the retry is processed"""
+        pipe = self.redis_client.pipeline.return_value
+        pipe.execute.side_effect = [[True, True], [12, True]]
+        response = self._post_bulk(b'{"id": "1"}\n{"id": "2"}\n')
+
+        self.assertEqual(response.status_code, 429)
+        self.redis_client.decrby.assert_called_once_with(mock.ANY, 2)
+        self.redis_client.delete.assert_called_once_with(
+            f"encore:idem:event:{self.monitor_tool_ip.ip}:1", f"encore:idem:event:{self.monitor_tool_ip.ip}:2"
+        )
+        self.assertFalse(ApiLog.objects.filter(status=ApiLog.Status.NEW).exists())
+
+
+class BatchSweepTestCase(ElasticTestCase):
+    """Batch Sweeper of the Events in BATCH_SWEEP_STATUS"""
+
+    def test_sweep_status(self):
+        """Transitions are persisted in bulk, & the moved Events handed back to `task_handler`"""
+        linked_event = self.create_event(
+            "linked", EventType.DOWN, EventStatus.ALERTED, **{FieldNames.LINKED_EVENT: "up"}
+        )
+        waiting_event = self.create_event("waiting", EventType.DOWN, EventStatus.ALERTED)
+        missing_event = self.create_event("missing", EventType.DOWN, EventStatus.ALERTED)
+        del self.es.docs[missing_event.doc_id]
+
+        with mock.patch("elastic.tasks.batch_sweep.task_handler") as task_handler:
+            sweep_status(EventStatus.ALERTED)
+
+        self.assertEqual(self.es.bulk_count, 1)
+        linked_event.refresh_from_db()
+        self.assertEqual((linked_event.status, linked_event.version), (EventStatus.RESOLVING, 1))
+        self.assertEqual(self.es.source(linked_event.doc_id)[FieldNames.EVENT_STATUS], EventStatus.RESOLVING)
+        task_handler.assert_called_once_with(mock.ANY, previous_status=EventStatus.ALERTED)
+        self.assertEqual(task_handler.call_args.args[0].pk, linked_event.pk)
+        waiting_event.refresh_from_db()
+        self.assertEqual((waiting_event.status, waiting_event.retry_count), (EventStatus.ALERTED, 1))
+        missing_event.refresh_from_db()
+        self.assertEqual(missing_event.retry_count, 1)
+        self.assertTrue(ErrorLog.objects.filter(event=missing_event, error_desc__contains="Does not Exist").exists())
+
+    def test_suppressed_events_swept(self):
+        """Only the Suppressed Events not waiting to comment on the Ticket of the parent"""
+        swept_event = self.create_event("swept", EventType.DOWN, EventStatus.SUPPRESSED)
+        swept_event.extras[EventExtrasKey.TICKET_COMMENT_ASSET_IS_DOWN] = True
+        swept_event.save()
+        commenting_event = self.create_event("commenting", EventType.DOWN, EventStatus.SUPPRESSED)
+
+        sweep_status(EventStatus.SUPPRESSED)
+
+        swept_event.refresh_from_db()
+        self.assertEqual(swept_event.retry_count, 1)
+        commenting_event.refresh_from_db()
+        self.assertEqual(commenting_event.retry_count, 0)
+
+    def test_parked(self):
+        """Events retried more than the max retries are parked, & no longer swept"""
+        CorrelationRule.objects.update(retry_policy={EventStatus.ALERTED: {"max_retries": 2}})
+        correlation_rule_table.invalidate()
+        event = self.create_event("waiting", EventType.DOWN, EventStatus.ALERTED)
+        Event.objects.filter(pk=event.pk).update(retry_count=2)
+
+        sweep_status(EventStatus.ALERTED)
+        sweep_status(EventStatus.ALERTED)
+
+        event.refresh_from_db()
+        self.assertTrue(event.parked)
+        self.assertEqual(event.retry_count, 3)
+        self.assertTrue(ErrorLog.objects.filter(event=event, error_desc__startswith="Parked after 3 retries").exists())
+
+
+@override_settings(OPTIMISTIC_CONCURRENCY=True)
+class BatchSweepOptimisticTestCase(ElasticTestCase):
+    """Batch Sweeper running while tasks change the Events, with OPTIMISTIC_CONCURRENCY"""
+
+    def test_events_changed_meanwhile(self):
+        """Changes made by the tasks since the sweeper read the Events are kept"""
+        linked_event = self.create_event(
+            "linked", EventType.DOWN, EventStatus.ALERTED, **{FieldNames.LINKED_EVENT: "up"}
+        )
+        resolved_event = self.create_event(
+            "resolved", EventType.DOWN, EventStatus.ALERTED, **{FieldNames.LINKED_EVENT: "up"}
+        )
+        waiting_event = self.create_event("waiting", EventType.DOWN, EventStatus.ALERTED)
+
+        def woken_tasks():
+            # Moved to Resolving (in Elastic & Postgres), & retried
+            self.es.change(resolved_event.doc_id, {FieldNames.EVENT_STATUS: EventStatus.RESOLVING})
+            Event.objects.filter(pk=resolved_event.pk).update(status=EventStatus.RESOLVING, version=F("version") + 1)
+            Event.objects.filter(pk=waiting_event.pk).update(retry_count=5, version=F("version") + 1)
+
+        self.es.hooks["before_bulk"] = woken_tasks
+        sweep_status(EventStatus.ALERTED)
+
+        linked_event.refresh_from_db()
+        self.assertEqual((linked_event.status, linked_event.version), (EventStatus.RESOLVING, 1))
+        self.assertEqual(self.es.source(linked_event.doc_id)[FieldNames.EVENT_STATUS], EventStatus.RESOLVING)
+        resolved_event.refresh_from_db()
+        self.assertEqual(
+            (resolved_event.status, resolved_event.retry_count, resolved_event.version), (EventStatus.RESOLVING, 0, 1)
+        )
+        waiting_event.refresh_from_db()
+        self.assertEqual(
+            (waiting_event.status, waiting_event.retry_count, waiting_event.version), (EventStatus.ALERTED, 5, 1)
+        )
+
+    def test_moved_event_changed_meanwhile(self):
+        """Event (not its Elastic Event) changed since read is moved along with its Elastic Event"""
+        event = self.create_event("linked", EventType.DOWN, EventStatus.ALERTED, **{FieldNames.LINKED_EVENT: "up"})
+        self.es.hooks["before_bulk"] = lambda: Event.objects.filter(pk=event.pk).update(
+            retry_count=5, version=F("version") + 1
+        )
+        sweep_status(EventStatus.ALERTED)
+
+        event.refresh_from_db()
+        self.assertEqual((event.status, event.retry_count, event.version), (EventStatus.RESOLVING, 0, 2))
+
+
+@override_settings(OPTIMISTIC_CONCURRENCY=True, CORRELATION_LOOKUP="postgres")
+class UpEventLinkingTestCase(ElasticTestCase):
+    """NewUpEvent linking the Down Events while other tasks run on them, with OPTIMISTIC_CONCURRENCY"""
+
+    def setUp(self):
+        super().setUp()
+        self.down_event = self.create_event("down", EventType.DOWN)
+        self.up_event = self.create_event("up", EventType.UP)
+
+    def test_down_event_linked_after_new_down_event_read_it(self):
+        """NewDownEvent fails to move the Down Event to Creating Ticket & moves it to Resolving instead"""
+        # NewDownEvent reads the Down Event, then NewUpEvent links it
+        self.es.stale_reads[self.down_event.doc_id] = self.es.get_event(
+            self.down_event.doc_index, self.down_event.doc_id
+        )
+        new.process_new_up_event.apply(kwargs={"event": self.up_event.pk})
+        new.process_new_down_event.apply(kwargs={"event": self.down_event.pk})
+
+        self.up_event.refresh_from_db()
+        self.assertEqual(self.up_event.status, EventStatus.RESOLVED)
+        self.assertEqual(self.up_event.linked_event, self.down_event)
+        self.down_event.refresh_from_db()
+        self.assertEqual(self.down_event.status, EventStatus.RESOLVING)
+        self.assertEqual(self.down_event.linked_event, self.up_event)
+        self.assertEqual(self.es.source(self.down_event.doc_id)[FieldNames.EVENT_STATUS], EventStatus.RESOLVING)
+        self.assertEqual(self.es.source(self.down_event.doc_id)[FieldNames.LINKED_EVENT], self.up_event.doc_id)
+
+    def test_up_event_rolled_back_after_linking(self):
+        """NewUpEvent run again after a conflict finds the Down Event it linked, & links it once"""
+        down_event_version = self.down_event.version
+        # Up Event is changed by another task once the Down Event is linked: the run is rolled back & retried
+        self.es.hooks["after_bulk"] = lambda: self.es.change(
+            self.up_event.doc_id, {FieldNames.LAST_UPDATE_TS: timezone.now()}
+        )
+        new.process_new_up_event.apply(kwargs={"event": self.up_event.pk})
+
+        self.assertEqual(self.es.bulk_count, 2)
+        self.up_event.refresh_from_db()
+        self.assertEqual(self.up_event.status, EventStatus.RESOLVED)
+        self.assertEqual(self.up_event.linked_event, self.down_event)
+        self.assertEqual(self.es.source(self.up_event.doc_id)[FieldNames.LINKED_EVENT], self.down_event.doc_id)
+        self.down_event.refresh_from_db()
+        self.assertEqual(self.down_event.linked_event, self.up_event)
+        self.assertEqual(self.down_event.version, down_event_version + 1)
+
+    def test_down_event_linked_by_another_up_event(self):
+        """NewUpEvent does not override the link of a Down Event linked by another Up Event meanwhile"""
+        self.es.hooks["before_bulk"] = lambda: self.es.change(
+            self.down_event.doc_id, {FieldNames.LINKED_EVENT: "another-up"}
+        )
+        new.process_new_up_event.apply(kwargs={"event": self.up_event.pk})
+
+        self.assertEqual(self.es.source(self.down_event.doc_id)[FieldNames.LINKED_EVENT], "another-up")
+        self.up_event.refresh_from_db()
+        self.assertEqual(self.up_event.status, EventStatus.NEW)
+        self.assertEqual(self.up_event.retry_count, 1)
+        self.assertIsNone(self.up_event.linked_event)
+        self.assertEqual(self.es.source(self.up_event.doc_id)[FieldNames.EVENT_STATUS], EventStatus.NEW)
+
+
+@override_settings(CORRELATION_LOOKUP="postgres")
+class FlappingTestCase(ElasticTestCase):
+    """Flapping detection & damping of the Up Events (Redis & the transitions script are mocked)"""
+
+    def setUp(self):
+        super().setUp()
+        CorrelationRule.objects.update(flap_threshold=3, flap_window=600, flap_stable_time=300)
+        correlation_rule_table.invalidate()
+        self.redis_client = mock.MagicMock()
+        redis_settings = override_settings(REDIS_CLIENT=self.redis_client)
+        redis_settings.enable()
+        self.addCleanup(redis_settings.disable)
+
+        self.now = time.time()
+        patcher = mock.patch.object(flapping, "time")
+        patcher.start().time.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(flapping, "_RECORD_SCRIPT", side_effect=self._record)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.state: t.Dict[str, t.Dict[str, str]] = {}  # Damping state (hash)
+        self.transitions: t.Dict[str, t.Dict[str, float]] = {}  # Transitions in the window (sorted set)
+        self.results: t.List[int] = []
+        self.redis_client.pipeline.return_value.execute.side_effect = self._execute
+        self.redis_client.hgetall.side_effect = lambda key: {
+            field.encode(): value.encode() for field, value in self.state.get(key, {}).items()
+        }
+
+    def _record(self, keys, args, client):
+        # Same as the Lua script
+        now, doc_id, event_type, last_up, window, threshold, stable_time, _ = args
+        state = self.state.setdefault(keys[0], {})
+        transitions = self.transitions.setdefault(keys[1], {})
+        if last_up:
+            state["last_up"] = last_up
+        damped_until = float(state.get("damped_until", 0))
+        if state.get("last_type") != event_type:
+            state["last_type"] = str(event_type)
+            transitions[doc_id] = now
+            for member, score in list(transitions.items()):
+                if score <= now - window:
+                    del transitions[member]
+            if damped_until > now:
+                damped_until = now + stable_time
+                state["damped_until"] = str(damped_until)
+            elif len(transitions) >= threshold:
+                damped_until = now + stable_time
+                state.update(damped_since=str(now), damped_until=str(damped_until))
+        self.results.append(1 if damped_until > now else 0)
+
+    def _execute(self):
+        results, self.results = self.results, []
+        return results
+
+    def _flap(self, *event_types: str) -> t.List[t.Set[str]]:
+        """Record a transition per Event received, a second apart. Returns the doc ids damped, per Event"""
+        damped = []
+        for event_type in event_types:
+            event = self.create_event(f"{event_type}-{len(self.es.docs)}", event_type)
+            event.created = datetime.fromtimestamp(self.now, dt_timezone.utc)
+            Event.objects.filter(pk=event.pk).update(created=event.created)
+            damped.append(flapping.record_transitions([event]))
+            self.now += 1
+        return damped
+
+    def test_transitions_counted(self):
+        """Asset is damped once the threshold of transitions is reached within the window"""
+        self.assertEqual(self._flap(EventType.DOWN, EventType.DOWN, EventType.UP), [set(), set(), set()])
+        self.now += 600  # Transitions out of the window
+        self.assertEqual(self._flap(EventType.DOWN, EventType.UP), [set(), set()])
+        self.assertEqual(self._flap(EventType.DOWN), [{"down-5"}])
+
+    def test_damping_extended(self):
+        """Damping of the asset lasts until no transition is received for the stable time"""
+        self._flap(EventType.DOWN, EventType.UP, EventType.DOWN)
+        self.now += 200
+        self.assertEqual(self._flap(EventType.UP), [{"up-3"}])
+        self.now += 200  # Still damped, 300 seconds since the last transition are not over
+        self.assertEqual(self._flap(EventType.UP), [{"up-4"}])
+        self.now += 300
+        self.assertEqual(self._flap(EventType.UP), [set()])
+
+    def test_up_event_damping(self):
+        """Up Events received while damped are held, then the latest processed & the others absorbed"""
+        self._flap(EventType.DOWN, EventType.UP, EventType.DOWN, EventType.UP, EventType.DOWN, EventType.UP)
+        up_event, absorbed_up_event, latest_up_event = Event.objects.filter(event_type=EventType.UP).order_by("pk")
+        self.assertEqual(flapping.up_event_damping(up_event), flapping.UpEventDamping(flapping.FlapAction.PROCESS))
+        self.assertEqual(flapping.up_event_damping(latest_up_event).action, flapping.FlapAction.HOLD)
+
+        self.now += 300
+        latest = (latest_up_event.doc_index, latest_up_event.doc_id)
+        self.assertEqual(
+            flapping.up_event_damping(latest_up_event), flapping.UpEventDamping(flapping.FlapAction.PROCESS, latest)
+        )
+        self.assertEqual(
+            flapping.up_event_damping(absorbed_up_event), flapping.UpEventDamping(flapping.FlapAction.ABSORB, latest)
+        )
+
+    def test_held_up_event_resolves_down_event(self):
+        """Held Up Event resolves the open Down Event once stable, & the Up Events superseded are absorbed"""
+        self._flap(EventType.DOWN, EventType.UP, EventType.DOWN, EventType.UP, EventType.UP)
+        down_event, deduped_down_event = Event.objects.filter(event_type=EventType.DOWN).order_by("pk")
+        _, absorbed_up_event, latest_up_event = Event.objects.filter(event_type=EventType.UP).order_by("pk")
+        # Repeated Down Event is deduped onto the open Down Event
+        Event.objects.filter(pk=deduped_down_event.pk).update(status=EventStatus.DEDUPED)
+        self.es.change(deduped_down_event.doc_id, {FieldNames.EVENT_STATUS: EventStatus.DEDUPED})
+
+        new.process_new_up_event.apply(kwargs={"event": latest_up_event.pk})
+        latest_up_event.refresh_from_db()
+        self.assertEqual(latest_up_event.status, EventStatus.NEW)
+        self.assertEqual(latest_up_event.retry_count, 0)
+        self.assertNotIn(FieldNames.LINKED_EVENT, self.es.source(down_event.doc_id))
+
+        self.now += 300
+        new.process_new_up_event.apply(kwargs={"event": absorbed_up_event.pk})
+        new.process_new_up_event.apply(kwargs={"event": latest_up_event.pk})
+        absorbed_up_event.refresh_from_db()
+        self.assertEqual(absorbed_up_event.status, EventStatus.DEDUPED)
+        self.assertEqual(self.es.source(absorbed_up_event.doc_id)[FieldNames.INITIAL_EVENT], latest_up_event.doc_id)
+        latest_up_event.refresh_from_db()
+        self.assertEqual(latest_up_event.status, EventStatus.RESOLVED)
+        self.assertEqual(latest_up_event.linked_event, down_event)
+        self.assertEqual(self.es.source(down_event.doc_id)[FieldNames.LINKED_EVENT], latest_up_event.doc_id)
+
+
+@override_settings(
+    EVENT_STORM_DETECTION=True,
+    EVENT_STORM_SCOPE="tool",
+    EVENT_STORM_THRESHOLD=3,
+    EVENT_STORM_WINDOW=60,
+    CORRELATION_LOOKUP="postgres",
+)
+class EventStormTestCase(ElasticTestCase):
+    """Master incident of the Event Storm (Redis & the join script are mocked)"""
+
+    def setUp(self):
+        super().setUp()
+        self.redis_client = mock.MagicMock()
+        redis_settings = override_settings(REDIS_CLIENT=self.redis_client)
+        redis_settings.enable()
+        self.addCleanup(redis_settings.disable)
+        self.redis_client.set.side_effect = lambda key, value, ex: self.masters.__setitem__(key, value)
+
+        self.now = time.time()
+        patcher = mock.patch.object(storm, "time")
+        patcher.start().time.side_effect = lambda: self.now
+        self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(storm, "_JOIN_SCRIPT", side_effect=self._join)
+        self.join_script = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.windows: t.Dict[str, t.Dict[str, float]] = {}  # Down Events in the window (sorted set)
+        self.masters: t.Dict[str, str] = {}  # Master incident
+
+    def _join(self, keys, args, client):
+        # Same as the Lua script
+        now, doc_id, member, window, threshold, _ = args
+        events = self.windows.setdefault(keys[0], {})
+        events[doc_id] = now
+        for event_id, score in list(events.items()):
+            if score <= now - window:
+                del events[event_id]
+        if (master := self.masters.get(keys[1])) is None:
+            if len(events) < threshold:
+                return None
+            master = member
+        self.masters[keys[1]] = master
+        return master.encode()
+
+    def _down_event(self, doc_id: str, **source) -> Event:
+        """Down Event of another asset"""
+        event = self.create_event(doc_id, EventType.DOWN, **{FieldNames.ASSET_UNIQUE_ID: doc_id}, **source)
+        Event.objects.filter(pk=event.pk).update(asset_unique_id=doc_id)
+        event.asset_unique_id = doc_id
+        return event
+
+    def _master_event(self, event: Event) -> t.Optional[str]:
+        """Doc id of the master incident the Down Event joins"""
+        elk_master_event = storm.master_event(self.es, event, self.es.source(event.doc_id))
+        self.now += 1
+        return elk_master_event["_id"] if elk_master_event else None
+
+    def test_threshold(self):
+        """Down Event reaching the threshold within the window is the master incident"""
+        self.assertIsNone(self._master_event(self._down_event("down1")))
+        self.now += 60  # Out of the window
+        self.assertIsNone(self._master_event(self._down_event("down2")))
+        self.assertIsNone(self._master_event(self._down_event("down3")))
+        self.assertEqual(self.masters, {})
+        self.assertIsNone(self._master_event(self._down_event("master")))
+        self.assertEqual(self._master_event(self._down_event("child")), "master")
+
+    def test_child_suppressed(self):
+        """Down Event of the storm is suppressed under the master incident, instead of creating a Ticket"""
+        events = [self._down_event(doc_id) for doc_id in ("down1", "down2", "master", "child")]
+        for event in events:
+            new.process_new_down_event.apply(kwargs={"event": event.pk})
+            event.refresh_from_db()
+        master_event, child_event = events[2:]
+        self.assertEqual(master_event.status, EventStatus.CREATING_TICKET)
+        self.assertEqual(child_event.status, EventStatus.SUPPRESSED)
+        self.assertEqual(child_event.parent_event, master_event)
+        self.assertEqual(self.es.source(child_event.doc_id)[FieldNames.PARENT_EVENT], master_event.doc_id)
+
+    def test_inactive_master_replaced(self):
+        """Down Event joining a storm whose master incident is resolved takes its place"""
+        for doc_id in ("down1", "down2", "master"):
+            self._master_event(self._down_event(doc_id))
+        Event.objects.filter(doc_id="master").update(status=EventStatus.RESOLVED)
+
+        self.assertIsNone(self._master_event(self._down_event("new-master")))
+        self.assertEqual(self._master_event(self._down_event("child")), "new-master")
+
+    @override_settings(EVENT_STORM_SCOPE="region")
+    def test_no_scope(self):
+        """Down Events without an asset region are not counted together"""
+        for doc_id in ("down1", "down2", "down3", "down4"):
+            self.assertIsNone(self._master_event(self._down_event(doc_id)))
+        self.join_script.assert_not_called()
+
+        for doc_id in ("down5", "down6", "master"):
+            self._master_event(self._down_event(doc_id, **{FieldNames.ASSET_REGION: "eu"}))
+        self.assertEqual(self._master_event(self._down_event("child", **{FieldNames.ASSET_REGION: "eu"})), "master")
+
+
+@override_settings(EVENT_SCHEDULER=True, EVENT_SCHEDULER_LEASE=60)
+class EventSchedulerTestCase(ElasticTestCase):
+    """Event Scheduler leasing & acking the due Events (Redis & the scripts are mocked)"""
+
+    def setUp(self):
+        super().setUp()
+        self.redis_client = mock.MagicMock()
+        redis_settings = override_settings(REDIS_CLIENT=self.redis_client)
+        redis_settings.enable()
+        self.addCleanup(redis_settings.disable)
+        self.redis_client.zadd.side_effect = lambda key, mapping: self.schedule.update(
+            {str(member): float(score) for member, score in mapping.items()}
+        )
+
+        self.now = time.time()
+        for module in (scheduler, common):
+            patcher = mock.patch.object(module, "time")
+            patcher.start().time.side_effect = lambda: self.now
+            self.addCleanup(patcher.stop)
+        for script, side_effect in (("_POP_SCRIPT", self._pop), ("_ACK_SCRIPT", self._ack)):
+            patcher = mock.patch.object(scheduler, script, side_effect=side_effect)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        patcher = mock.patch.object(common, "dispatch")
+        self.dispatch = patcher.start()
+        self.addCleanup(patcher.stop)
+
+        self.schedule: t.Dict[str, float] = {}  # Event pk -> due timestamp (sorted set)
+
+    def _pop(self, keys, args):
+        # Same as the Lua script
+        due_ts, lease, limit = args
+        members = sorted((score, member) for member, score in self.schedule.items() if score <= due_ts)[:limit]
+        for _, member in members:
+            self.schedule[member] = float(lease)
+        return [member.encode() for _, member in members]
+
+    def _ack(self, keys, args):
+        # Same as the Lua script
+        lease, *members = args
+        removed = 0
+        for member in map(str, members):
+            if self.schedule.get(member) == float(lease):
+                del self.schedule[member]
+                removed += 1
+        return removed
+
+    def _dispatched(self) -> t.List[int]:
+        return [call.args[1].pk for call in self.dispatch.call_args_list]
+
+    def test_pump(self):
+        """Due Events are dispatched & removed from the schedule, the others are left for later"""
+        due_events = [self.create_event(doc_id, EventType.DOWN) for doc_id in ("due1", "due2")]
+        later_event = self.create_event("later", EventType.DOWN)
+        for event in due_events:
+            scheduler.schedule_event(event.pk, self.now - 1)
+        scheduler.schedule_event(later_event.pk, self.now + 60)
+        scheduler.schedule_event(0, self.now - 1)  # Purged Event
+
+        self.assertEqual(scheduler.pump(10), 3)
+        self.assertCountEqual(self._dispatched(), [event.pk for event in due_events])
+        self.assertEqual(self.schedule, {str(later_event.pk): self.now + 60})
+        self.assertEqual(scheduler.pump(10), 0)
+
+    def test_batch_size(self):
+        """Due Events are dispatched in batches, the earliest due first"""
+        events = [self.create_event(f"due{i}", EventType.DOWN) for i in range(3)]
+        for i, event in enumerate(events):
+            scheduler.schedule_event(event.pk, self.now - 10 + i)
+
+        self.assertEqual(scheduler.pump(2), 2)
+        self.assertEqual(self._dispatched(), [event.pk for event in events[:2]])
+        self.assertEqual(scheduler.pump(2), 1)
+        self.assertEqual(self.schedule, {})
+
+    def test_rescheduled_while_dispatched(self):
+        """Event rescheduled after it was popped is not acked, & keeps the new due time"""
+        event = self.create_event("down", EventType.DOWN)
+        scheduler.schedule_event(event.pk, self.now - 1)
+        self.dispatch.side_effect = lambda task, event: scheduler.schedule_event(event.pk, self.now + 30)
+
+        scheduler.pump(10)
+        self.assertEqual(self.schedule, {str(event.pk): self.now + 30})
+
+    def test_dispatch_failed(self):
+        """Events not dispatched stay leased, & are dispatched again once the lease expires"""
+        events = [self.create_event(doc_id, EventType.DOWN) for doc_id in ("down1", "down2")]
+        for event in events:
+            scheduler.schedule_event(event.pk, self.now - 1)
+        self.dispatch.side_effect = [None, ConnectionError("Broker is down")]
+
+        with self.assertRaises(ConnectionError):
+            scheduler.pump(10)
+        leased_pk = self._dispatched()[1]
+        self.assertEqual(self.schedule, {str(leased_pk): self.now + 60})
+        self.assertEqual(scheduler.pump(10), 0)
+
+        self.dispatch.reset_mock(side_effect=True)
+        self.now += 61
+        self.assertEqual(scheduler.pump(10), 1)
+        self.assertEqual(self._dispatched(), [leased_pk])
+        self.assertEqual(self.schedule, {})
+
+    def _waiting_down_event(self) -> Event:
+        """New Down Event retried, 10 minutes into the 15 minutes wait of its Correlation Rule"""
+        CorrelationRule.objects.update(wait_time_in_seconds=900)
+        correlation_rule_table.invalidate()
+        event = self.create_event("down", EventType.DOWN)
+        event.retry_count = 1
+        event.save()
+        return event
+
+    def test_scheduled_at_end_of_wait(self):
+        """New Down Event waiting to create the Ticket is scheduled once the wait is over, instead of polling"""
+        event = self._waiting_down_event()
+        with self.captureOnCommitCallbacks(execute=True):
+            common.task_handler(event)
+        wait = (event.event_ts + timedelta(seconds=901)).timestamp() - timezone.now().timestamp()
+        self.assertAlmostEqual(self.schedule[str(event.pk)], self.now + wait, delta=1)
+        self.dispatch.assert_not_called()
+
+    def test_schedule_failed(self):
+        """Event is dispatched with a Celery countdown if it cannot be scheduled"""
+        event = self._waiting_down_event()
+        self.redis_client.zadd.side_effect = redis.ConnectionError
+        with self.captureOnCommitCallbacks(execute=True):
+            common.task_handler(event)
+        self.dispatch.assert_called_once_with(new.process_new_down_event, event, countdown=mock.ANY)
+        self.assertAlmostEqual(self.dispatch.call_args.kwargs["countdown"], 301, delta=1)
+
+
+class EventTimestampTestCase(SimpleTestCase):
+    """Event timestamp, as received from the monitor tool"""
+
+    def test_parse_event_ts(self):
+        """ISO 8601 (UTC without an offset) & epoch seconds / milliseconds"""
+        expected = datetime(2024, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+        for value in [
+            "2024-05-01T10:00:00",
+            "2024-05-01 10:00:00Z",
+            "2024-05-01T12:00:00+02:00",
+            datetime(2024, 5, 1, 10, 0),
+            expected,
+            1714557600,
+            1714557600.0,
+            "1714557600",
+            1714557600000,
+        ]:
+            with self.subTest(value=value):
+                self.assertEqual(parse_event_ts(value), expected)
+                self.assertFalse(parse_event_ts(value).tzinfo is None)
+
+    def test_parse_invalid_event_ts(self):
+        """None if it cannot be parsed"""
+        for value in [None, "", "yesterday", "2024-13-01T10:00:00", "nan", float("inf"), True, 10**20, {}]:
+            with self.subTest(value=value):
+                self.assertIsNone(parse_event_ts(value))
+
+
+@override_settings(DEDUP_AT_INGEST=True)
+class DedupAtIngestTestCase(ElasticTestCase):
+    """Initial Events of the Down Events of an ingested batch (Redis fingerprints are mocked)"""
+
+    def setUp(self):
+        super().setUp()
+        self.initial_event = self.create_event("initial", EventType.DOWN)
+        patcher = mock.patch.object(dedup, "_CLAIM_SCRIPT", side_effect=self._claim)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _claim(self, keys, args, client):
+        # Every fingerprint is claimed by the initial Event
+        return [json.dumps([self.initial_event.doc_index, self.initial_event.doc_id]) for _ in keys]
+
+    def _ingested_event(self, doc_id: str, event_ts: t.Any) -> Event:
+        return Event(
+            api_log=ApiLog(created=timezone.now()),
+            doc_id=doc_id,
+            doc_index="events-test",
+            status=EventStatus.NEW,
+            title=self.initial_event.title,
+            event_ts=event_ts,
+            event_type=EventType.DOWN,
+            asset_unique_id=self.initial_event.asset_unique_id,
+            monitor_tool_name=self.monitor_tool.name,
+            monitor_tool_ip=self.monitor_tool_ip,
+        )
+
+    def test_event_ts_as_received(self):
+        """Event timestamps without an offset or as epoch are compared with the initial Event, in UTC"""
+        later_ts = self.initial_event.event_ts + timedelta(minutes=1)
+        earlier_ts = self.initial_event.event_ts - timedelta(minutes=1)
+        events = [
+            self._ingested_event("naive", later_ts.replace(tzinfo=None).isoformat()),
+            self._ingested_event("epoch", later_ts.timestamp() * 1000),
+            self._ingested_event("earlier", earlier_ts.replace(tzinfo=None).isoformat()),
+        ]
+        initial = (self.initial_event.doc_index, self.initial_event.doc_id)
+        self.assertEqual(dedup.find_initial_events(events), {"naive": initial, "epoch": initial})
+
+    def test_invalid_event_ts(self):
+        """Event with an event timestamp that cannot be parsed is not a duplicate"""
+        self.assertEqual(dedup.find_initial_events([self._ingested_event("invalid", "yesterday")]), {})
+
+    def _compacted_events(self) -> t.List[Event]:
+        CorrelationRule.objects.update(compact_duplicates=True)
+        correlation_rule_table.invalidate()
+        events = [self._ingested_event(doc_id, timezone.now().isoformat()) for doc_id in ("dup1", "dup2")]
+        for event in events:
+            self.es.add(event.doc_index, event.doc_id, {FieldNames.EVENT_STATUS: EventStatus.NEW})
+        return events
+
+    @override_settings(DEDUP_AT_INGEST=True)
+    def test_compacted(self):
+        """Duplicates are deleted once folded into the initial Event"""
+        events = self._compacted_events()
+        self.assertEqual(ingest._dedup_events(self.es, events, set()), [])  # pylint: disable=protected-access
+        self.assertEqual(self.es.source(self.initial_event.doc_id)[FieldNames.DUP_COUNT], 2)
+        self.assertNotIn("dup1", self.es.docs)
+        self.assertNotIn("dup2", self.es.docs)
+
+    @override_settings(DEDUP_AT_INGEST=True)
+    def test_compact_failed(self):
+        """Duplicates are kept as DEDUPED if they could not be folded into the initial Event"""
+        events = self._compacted_events()
+        initial_doc = self.es.docs.pop(self.initial_event.doc_id)
+        self.assertEqual(ingest._dedup_events(self.es, events, set()), events)  # pylint: disable=protected-access
+        self.assertEqual([event.status for event in events], [EventStatus.DEDUPED] * 2)
+        for event in events:
+            self.assertEqual(self.es.source(event.doc_id)[FieldNames.EVENT_STATUS], EventStatus.DEDUPED)
+            self.assertEqual(self.es.source(event.doc_id)[FieldNames.INITIAL_EVENT], self.initial_event.doc_id)
+        self.assertNotIn(FieldNames.DUP_COUNT, initial_doc["_source"])
+
+    def test_compact_script_timestamps(self):
+        """Duplicates are folded with their event timestamps in UTC ISO 8601, whatever the format received"""
+        later_ts = datetime(2024, 5, 1, 10, 1, tzinfo=dt_timezone.utc)
+        events = [
+            self._ingested_event("later", later_ts.timestamp() * 1000),
+            self._ingested_event("earlier", "2024-05-01T10:00:00.5"),
+        ]
+        params = ingest._compact_script(events, timezone.now())["params"]  # pylint: disable=protected-access
+        self.assertEqual(params["last_seen"], "2024-05-01T10:01:00.000+00:00")
+        self.assertEqual(
+            [sample[FieldNames.EVENT_TS] for sample in params["samples"]],
+            ["2024-05-01T10:01:00.000+00:00", "2024-05-01T10:00:00.500+00:00"],
+        )
+
+
+@override_settings(CORRELATION_LOOKUP="postgres", TIME_ZONE="Asia/Kolkata")
+class PostgresLookupTestCase(ElasticTestCase):
+    """Active Down Events from the Event table"""
+
+    def _lookup(self, until_ts) -> t.List[str]:
+        hits = active_down_events(self.es, "Nagios", "Host Down", "HOST1", until_ts=until_ts)
+        return [hit["_id"] for hit in hits]
+
+    def test_until_ts(self):
+        """Event timestamp bound in any of the formats (naive is UTC), & no bound if it cannot be parsed"""
+        event_ts = self.create_event("down", EventType.DOWN).event_ts
+        later_ts, earlier_ts = event_ts + timedelta(minutes=1), event_ts - timedelta(minutes=1)
+
+        self.assertEqual(self._lookup(later_ts.isoformat()), ["down"])
+        self.assertEqual(self._lookup(earlier_ts.isoformat()), [])
+        self.assertEqual(self._lookup(later_ts.replace(tzinfo=None).isoformat()), ["down"])
+        self.assertEqual(self._lookup(int(later_ts.timestamp() * 1000)), ["down"])
+        self.assertEqual(self._lookup(str(int(earlier_ts.timestamp()))), [])
+        self.assertEqual(self._lookup("yesterday"), ["down"])
+
+
+@override_settings(CORRELATION_LOOKUP="redis")
+class CorrelationIndexTestCase(SimpleTestCase):
+    """Correlation Index scores (Redis is mocked)"""
+
+    def test_rebuild(self):
+        """Events are scored by the event timestamp, else the received timestamp, else skipped"""
+        event_ts = datetime(2024, 5, 1, 10, 0, tzinfo=dt_timezone.utc)
+        sources = {
+            "naive": {FieldNames.EVENT_TS: "2024-05-01T10:00:00"},
+            "epoch": {FieldNames.EVENT_TS: 1714557600000},
+            "received": {FieldNames.EVENT_TS: "yesterday", FieldNames.RECEIVED_TS: "2024-05-01T10:00:00Z"},
+            "invalid": {FieldNames.EVENT_TS: "yesterday"},
+        }
+        es = mock.Mock()
+        es.search.return_value = {
+            "_scroll_id": "scroll",
+            "hits": {
+                "hits": [{"_index": "events-test", "_id": doc_id, "_source": src} for doc_id, src in sources.items()]
+            },
+        }
+        es.scroll.return_value = {"_scroll_id": "scroll", "hits": {"hits": []}}
+        redis_client = mock.MagicMock()
+        with override_settings(REDIS_CLIENT=redis_client):
+            self.assertEqual(correlation_index.rebuild(es), 3)
+
+        scores = {}
+        for call in redis_client.pipeline.return_value.zadd.call_args_list:
+            scores.update(call.args[1])
+        self.assertEqual(
+            scores, {f"events-test|{doc_id}": event_ts.timestamp() for doc_id in ["naive", "epoch", "received"]}
+        )
+        redis_client.set.assert_called_once()  # Ready
+
+    def test_event_score(self):
+        """Created timestamp if the event timestamp cannot be parsed"""
+        created = timezone.now()
+        event = Event(
+            doc_id="down",
+            doc_index="events-test",
+            event_ts="yesterday",
+            event_type=EventType.DOWN,
+            status=EventStatus.NEW,
+            created=created,
+        )
+        redis_client = mock.MagicMock()
+        with override_settings(REDIS_CLIENT=redis_client):
+            correlation_index.add_events([event])
+        redis_client.pipeline.return_value.zadd.assert_called_once_with(
+            mock.ANY, {"events-test|down": created.timestamp()}
+        )
+
+
+@override_settings(DATA_UPLOAD_MAX_MEMORY_SIZE=100)
+class DecodeBodyTestCase(SimpleTestCase):
+    """Body size limits (413)"""
+
+    def _request(self, body: bytes, **headers):
+        return RequestFactory().post("/", data=body, content_type="application/json", headers=headers)
+
+    def test_body_too_large(self):
+        """Body larger than DATA_UPLOAD_MAX_MEMORY_SIZE"""
+        with self.assertRaises(PayloadError) as ctx:
+            decode_body(self._request(b"x" * 101))
+        self.assertEqual(ctx.exception.status, 413)
+
+    def test_max_size(self):
+        """`max_size` is not limited by DATA_UPLOAD_MAX_MEMORY_SIZE"""
+        self.assertEqual(decode_body(self._request(b"x" * 200), max_size=200), b"x" * 200)
+        with self.assertRaises(PayloadError) as ctx:
+            decode_body(self._request(b"x" * 201), max_size=200)
+        self.assertEqual(ctx.exception.status, 413)
+
+    def test_decompressed_max_size(self):
+        """Decompressed body is limited to `max_size`"""
+        body = zlib.compress(b"x" * 201)
+        self.assertEqual(decode_body(self._request(body, content_encoding="deflate"), max_size=300), b"x" * 201)
+        with self.assertRaises(PayloadError) as ctx:
+            decode_body(self._request(body, content_encoding="deflate"), max_size=200)
+        self.assertEqual(ctx.exception.status, 413)
@@ -0,0 +1,58 @@
+"""ULID Generator
+
+Universally Unique Lexicographically Sortable Identifier (https://github.com/ulid/spec).
+48 bits of timestamp (ms) + 80 bits of randomness, encoded as 26 chars of Crockford's base32.
+
+IDs generated within the same millisecond (in a process) increment the random part, so they stay unique & sorted.
+Randomness keeps the IDs from different processes / hosts apart.
+"""
+
+import os
+import threading
+import time
+
+ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+ULID_LENGTH = 26
+_MAX_RANDOM = (1 << 80) - 1
+
+
+class _ULIDGenerator:
+    """Monotonic, thread safe ULID Generator"""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def reset(self):
+        """Reset the state. Child process should not continue the sequence of the parent."""
+        self._lock = threading.Lock()
+        self._last_ms = 0
+        self._last_random = 0
+
+    def new(self) -> str:
+        """New ULID"""
+        with self._lock:
+            now_ms = time.time_ns() // 1_000_000
+            if now_ms <= self._last_ms:
+                # Same millisecond (or clock moved back): increment the random part of the last ULID
+                now_ms = self._last_ms
+                random = self._last_random + 1
+                if random > _MAX_RANDOM:
+                    now_ms += 1
+                    random = int.from_bytes(os.urandom(10), "big")
+            else:
+                random = int.from_bytes(os.urandom(10), "big")
+            self._last_ms, self._last_random = now_ms, random
+
+        value = (now_ms << 80) | random
+        return "".join(ENCODING[(value >> shift) & 0x1F] for shift in range(125, -1, -5))
+
+
+_generator = _ULIDGenerator()
+os.register_at_fork(after_in_child=_generator.reset)
+
+
+def new_ulid() -> str:
+    """New ULID"""
+    return _generator.new()
@@ -1,11 +1,22 @@
 """Elastic Views"""
 
+from django.conf import settings
 from django.urls import path
 
 import elastic.views as e_views
 
 urlpatterns = [
-    path("event/", e_views.event, name="elastic.views.event"),
+    path(
+        "event/",
+        e_views.event_async if settings.USE_ASYNC_VIEWS else e_views.event,
+        name="elastic.views.event",
+    ),
+    path("events/bulk/", e_views.event_bulk, name="elastic.views.event_bulk"),
     path("event/<str:event_index>/<str:event_id>/", e_views.event_info, name="elastic.views.event_info"),
-    path("resolve/", e_views.resolve, name="elastic.views.resolve"),
+    path("metrics/admission/", e_views.admission_metrics, name="elastic.views.admission_metrics"),
+    path(
+        "resolve/",
+        e_views.resolve_async if settings.USE_ASYNC_VIEWS else e_views.resolve,
+        name="elastic.views.resolve",
+    ),
 ]
@@ -1,19 +1,74 @@
 """Common ElasticSearch Utilities"""
 
+import json
 import logging
+import math
+import typing as t
+import zlib
 from datetime import datetime, timedelta
+from datetime import timezone as dt_timezone
 from enum import StrEnum
 
 from elasticsearch import Elasticsearch, NotFoundError
 
 from django.conf import settings
 from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 
 from elastic.constants import EVENT_INDEX_PREFIX, INDEX_DATE_SUFFIX_FORMAT, NON_COMPLETE_EVENT_STATUS, FieldNames
 
 logger = logging.getLogger("correlator.elastic")
 
 
+def normalize_asset_key(asset_unique_id: t.Optional[str]) -> str:
+    """Asset unique id as compared by the correlation lookups (case insensitive)"""
+    return (asset_unique_id or "").upper()
+
+
+def correlation_key(tool_name: str, title: str, asset_unique_id: str) -> str:
+    """Normalized (monitor tool name, event title, asset unique id) of an Event"""
+    return json.dumps([tool_name, title, normalize_asset_key(asset_unique_id)], ensure_ascii=False)
+
+
+# Epoch timestamps from this value on are in milliseconds (as seconds, it is past the year 5000)
+EPOCH_MILLIS_FROM = 10**11
+
+
+def parse_event_ts(value: t.Any) -> t.Optional[datetime]:
+    """Event timestamp as an aware datetime. None if it cannot be parsed.
+
+    The ingest pipeline copies the event timestamp from the payload as is: ISO 8601 without an offset is taken as UTC
+    (as Elastic does), numbers as epoch seconds or milliseconds.
+    """
+    if isinstance(value, str):
+        try:
+            value = float(value)
+        except ValueError:
+            pass
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        if not math.isfinite(value):
+            return None
+        try:
+            return datetime.fromtimestamp(
+                value / 1000 if abs(value) >= EPOCH_MILLIS_FROM else value, tz=dt_timezone.utc
+            )
+        except (OverflowError, OSError, ValueError):
+            return None
+    if isinstance(value, str):
+        try:
+            value = parse_datetime(value)
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    return timezone.make_aware(value, dt_timezone.utc) if timezone.is_naive(value) else value
+
+
+def partition_of(key: str, partitions: int) -> int:
+    """Partition (0 to partitions - 1) of the key. Stable across processes & restarts, unlike `hash`."""
+    return zlib.crc32(key.encode()) % partitions
+
+
 class SearchResponseType(StrEnum):
     """Response Type for CorrelatorElastic Search response"""
 
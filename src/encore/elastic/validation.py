@@ -0,0 +1,43 @@
+"""Event Payload Validation
+
+Payloads are validated against the `payload_schema` of the Monitor Tool (of the remote IP), before anything is
+logged or sent to ELK. Check launchpad/payload_schema.py
+"""
+
+import logging
+import typing as t
+
+from launchpad.cache import monitor_tool_ip_cache, payload_validator_cache
+from launchpad.models import MonitorTool, MonitorToolIP
+
+logger = logging.getLogger("correlator.elastic.validation")
+
+
+class InvalidPayload(t.NamedTuple):
+    """Validation errors, and whether the event should be quarantined (else rejected)"""
+
+    errors: t.List[str]
+    quarantine: bool
+
+    @property
+    def failure_reason(self) -> str:
+        """Failure Reason for the quarantined ApiLog"""
+        return f"Invalid payload: {'; '.join(self.errors)}"
+
+
+def validate_event_payload(remote_ip: str, event_data: t.Dict[str, t.Any]) -> t.Optional[InvalidPayload]:
+    """Validate the event payload against the payload schema of the Monitor Tool. None if valid (or no schema)."""
+    try:
+        monitor_tool = monitor_tool_ip_cache.get(remote_ip).monitor_tool
+    except MonitorToolIP.DoesNotExist:
+        return None
+    if not monitor_tool or not (validator := payload_validator_cache.get(monitor_tool)):
+        return None
+    if not (errors := validator(event_data)):
+        return None
+
+    logger.warning("Invalid payload from %s [%s]: %s", remote_ip, monitor_tool.name, errors)
+    return InvalidPayload(
+        errors=errors,
+        quarantine=monitor_tool.invalid_payload_action == MonitorTool.InvalidPayloadAction.QUARANTINE,
+    )
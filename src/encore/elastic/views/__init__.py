@@ -1,4 +1,5 @@
 """Init File"""
 
-from .event import event, event_info  # NOQA
-from .resolve import resolve  # NOQA
+from .event import event, event_async, event_bulk, event_info  # NOQA
+from .metrics import admission_metrics  # NOQA
+from .resolve import resolve, resolve_async  # NOQA
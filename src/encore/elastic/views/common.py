@@ -0,0 +1,173 @@
+"""Common Functions for Elastic Views"""
+
+import io
+import json
+import typing as t
+import zlib
+
+from django.conf import settings
+from django.core.exceptions import RequestDataTooBig
+
+from snmp.utils import KEY_TRANSLATE_MAP
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:  # pragma: no cover
+    zstandard = None
+
+CSV_FIELDS: t.Dict[str, t.Tuple[str, str]] = {"FIELD_NAME": (";", ":")}
+
+_DECOMPRESS_ERRORS = (zlib.error, EOFError) + ((zstandard.ZstdError,) if zstandard is not None else ())
+
+
+class PayloadError(ValueError):
+    """Request payload could not be decoded. `status` is the HTTP status to respond with."""
+
+    def __init__(self, message: str, status: int = 400) -> None:
+        super().__init__(message)
+        self.status = status
+
+
+def json_loads(data: bytes | str) -> t.Any:
+    """Decode JSON, using orjson if enabled (and installed)"""
+    if orjson is not None and settings.USE_ORJSON:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def _decompress(body: bytes, content_encoding: str, max_size: t.Optional[int]) -> bytes:
+    # Read one byte more than allowed, to detect the oversized body without decompressing all of it
+    max_length = max_size + 1 if max_size is not None else 0
+    try:
+        if content_encoding in ("gzip", "x-gzip"):
+            data = zlib.decompressobj(16 + zlib.MAX_WBITS).decompress(body, max_length)
+        elif content_encoding == "deflate":
+            try:
+                data = zlib.decompressobj(zlib.MAX_WBITS).decompress(body, max_length)
+            except zlib.error:
+                # Some clients send raw deflate (without zlib header)
+                data = zlib.decompressobj(-zlib.MAX_WBITS).decompress(body, max_length)
+        elif content_encoding == "zstd" and zstandard is not None:
+            with zstandard.ZstdDecompressor().stream_reader(io.BytesIO(body)) as reader:
+                data = reader.read(max_length or -1)
+        else:
+            raise PayloadError(f"Unsupported Content-Encoding [{content_encoding}]", status=415)
+    except _DECOMPRESS_ERRORS as e:
+        raise PayloadError(f"Invalid {content_encoding} body: {e}") from e
+
+    if max_size is not None and len(data) > max_size:
+        raise PayloadError(f"Decompressed body exceeds {max_size} bytes", status=413)
+    return data
+
+
+def _read_body(request, max_size: t.Optional[int]) -> bytes:
+    if max_size is None:
+        try:
+            return request.body
+        except RequestDataTooBig as e:
+            raise PayloadError(f"Body exceeds {settings.DATA_UPLOAD_MAX_MEMORY_SIZE} bytes", status=413) from e
+
+    try:
+        content_length = int(request.META.get("CONTENT_LENGTH") or 0)
+    except ValueError as e:
+        raise PayloadError("Invalid Content-Length") from e
+    if content_length > max_size:
+        raise PayloadError(f"Body exceeds {max_size} bytes", status=413)
+
+    # Read the stream directly, as `request.body` is limited to DATA_UPLOAD_MAX_MEMORY_SIZE
+    body = request.read(max_size + 1)
+    if len(body) > max_size:
+        raise PayloadError(f"Body exceeds {max_size} bytes", status=413)
+    return body
+
+
+def decode_body(request, max_size: t.Optional[int] = None) -> bytes:
+    """Request body, decompressed as per the Content-Encoding header (gzip, deflate & zstd if installed).
+
+    Both the raw and the decompressed body are limited to `max_size` (DATA_UPLOAD_MAX_MEMORY_SIZE if not set).
+    Raises PayloadError (413) if the body is too large.
+    """
+    body = _read_body(request, max_size)
+    content_encoding = request.headers.get("Content-Encoding", "identity").strip().lower()
+    if not body or content_encoding in ("", "identity"):
+        return body
+    return _decompress(body, content_encoding, max_size or settings.DATA_UPLOAD_MAX_MEMORY_SIZE)
+
+
+def parse_payload(request) -> t.Dict[str, t.Any]:
+    """Decode the request body into a JSON object"""
+    body = decode_body(request)
+    try:
+        data = json_loads(body or b"{}")
+    except ValueError as e:
+        raise PayloadError(f"Invalid JSON: {e}") from e
+    if not isinstance(data, dict):
+        raise PayloadError("Payload must be a JSON object")
+    return data
+
+
+def parse_event_payload(request) -> t.Dict[str, t.Any]:
+    """Decode the request body into Event data, with the CSV_FIELDS expanded"""
+    return expand_csv_fields(parse_payload(request))
+
+
+def get_remote_ip(request) -> str:
+    """Remote IP of the Monitor Tool"""
+    return request.META.get("HTTP_X_FORWARDED_FOR", "127.0.0.1")
+
+
+def expand_csv_fields(event_data: t.Dict[str, t.Any]) -> t.Dict[str, t.Any]:
+    """Expand the CSV_FIELDS into individual sub fields"""
+    for field_name, (sub_field_sep, kv_sep) in CSV_FIELDS.items():
+        if field_name in event_data:
+            sub_field_list = event_data[field_name].split(sub_field_sep)
+            for sub_field in sub_field_list:
+                val_list = sub_field.split(kv_sep)
+                event_data[f"{field_name}__{val_list[0].strip().translate(KEY_TRANSLATE_MAP)}"] = kv_sep.join(
+                    val_list[1:]
+                ).strip()
+    return event_data
+
+
+def parse_bulk_events(body: bytes) -> t.List[t.Tuple[t.Optional[t.Dict[str, t.Any]], t.Optional[str]]]:
+    """Parse a JSON array or NDJSON body.
+
+    Returns a list of `(event_data, error)` tuples, one per item, in the order they were received.
+    Raises PayloadError if the body is a malformed JSON array.
+    """
+    items: t.List[t.Tuple[t.Optional[t.Dict[str, t.Any]], t.Optional[str]]] = []
+    body = body.strip()
+    if not body:
+        return items
+
+    if body.startswith(b"["):
+        try:
+            events = json_loads(body)
+        except ValueError as e:
+            raise PayloadError(f"Invalid JSON array: {e}") from e
+        for event_data in events:
+            if isinstance(event_data, dict):
+                items.append((event_data, None))
+            else:
+                items.append((None, "Event must be a JSON object"))
+        return items
+
+    # NDJSON: one JSON object per line
+    for line in body.splitlines():
+        if not line.strip():
+            continue
+        try:
+            event_data = json_loads(line)
+        except ValueError as e:
+            items.append((None, f"Invalid JSON: {e}"))
+            continue
+        if isinstance(event_data, dict):
+            items.append((event_data, None))
+        else:
+            items.append((None, "Event must be a JSON object"))
+    return items
@@ -2,20 +2,48 @@
 
 import json
 import logging
-import typing as t
 
+from asgiref.sync import sync_to_async
+
+from django.conf import settings
 from django.db.transaction import atomic, on_commit
-from django.http import HttpResponse, HttpResponseBadRequest
+from django.http import HttpResponse, HttpResponseBadRequest, JsonResponse
+from django.utils import timezone
 from django.views.decorators.csrf import csrf_exempt
 
+from elastic.admission import admit, admit_quota
+from elastic.buffer import append_entries, append_event, make_entry
+from elastic.idempotency import (
+    claim_key,
+    claim_keys,
+    duplicate_response,
+    get_idempotency_key,
+    release_key,
+    release_keys,
+)
 from elastic.models import ApiLog
-from elastic.tasks import ingest_event
+from elastic.tasks import bulk_ingest_events, ingest_event
 from elastic.utils import CorrelatorElastic
-from snmp.utils import KEY_TRANSLATE_MAP
+from elastic.validation import InvalidPayload, validate_event_payload
+from launchpad.cache import monitor_tool_ip_cache
+from .common import PayloadError, decode_body, expand_csv_fields, get_remote_ip, parse_bulk_events, parse_event_payload
 
 logger = logging.getLogger("correlator.elastic")
 
-CSV_FIELDS: t.Dict[str, t.Tuple[str, str]] = {"FIELD_NAME": (";", ":")}
+
+def _invalid_payload_response(remote_ip, event_method, event_data, invalid_payload: InvalidPayload) -> HttpResponse:
+    """Quarantine (log as FAILED, without sending to ELK) or Reject the invalid event"""
+    if invalid_payload.quarantine:
+        ApiLog.objects.create(
+            remote_ip=remote_ip,
+            method=event_method,
+            task=ApiLog.TaskType.EVENT,
+            task_data=event_data,
+            status=ApiLog.Status.FAILED,
+            failure_reason=invalid_payload.failure_reason,
+        )
+        return HttpResponse(status=202)
+    return JsonResponse({"errors": invalid_payload.errors}, status=422)
 
 
 # TODO: Remove csrf_exempt
@@ -23,37 +51,264 @@ CSV_FIELDS: t.Dict[str, t.Tuple[str, str]] = {"FIELD_NAME": (";", ":")}
 def event(request):
     """Log Event"""
 
-    remote_ip = request.META.get("HTTP_X_FORWARDED_FOR", "127.0.0.1")
+    remote_ip = get_remote_ip(request)
     event_method = request.method.lower()
 
     logger.info("New Event from %s [%s]", remote_ip, event_method)
 
-    event_data = json.loads(request.body or "{}")
-    for field_name, (sub_field_sep, kv_sep) in CSV_FIELDS.items():
-        if field_name in event_data:
-            sub_field_list = event_data[field_name].split(sub_field_sep)
-            for sub_field in sub_field_list:
-                val_list = sub_field.split(kv_sep)
-                event_data[f"{field_name}__{val_list[0].strip().translate(KEY_TRANSLATE_MAP)}"] = kv_sep.join(
-                    val_list[1:]
-                ).strip()
-
-    with atomic():
-        api_log = ApiLog.objects.create(
+    valid_method = event_method in ApiLog.LogMethods.valid_event_methods()
+    if valid_method and (response := admit(remote_ip)):
+        return response
+
+    try:
+        event_data = parse_event_payload(request)
+    except PayloadError as e:
+        return HttpResponse(str(e), status=e.status)
+
+    if valid_method and (invalid_payload := validate_event_payload(remote_ip, event_data)):
+        return _invalid_payload_response(remote_ip, event_method, event_data, invalid_payload)
+
+    idempotency_key = get_idempotency_key(request, event_data) if valid_method else None
+    if not claim_key(ApiLog.TaskType.EVENT, remote_ip, idempotency_key):
+        logger.info("Repeated Event from %s [%s]: %s", remote_ip, event_method, idempotency_key)
+        return duplicate_response(status=202)
+
+    if valid_method and (response := admit_quota(remote_ip)):
+        release_key(ApiLog.TaskType.EVENT, remote_ip, idempotency_key)
+        return response
+
+    try:
+        if valid_method and settings.INGEST_WRITE_BUFFER and append_event(remote_ip, event_method, event_data):
+            return HttpResponse(status=202)
+
+        with atomic():
+            api_log = ApiLog.objects.create(
+                remote_ip=remote_ip,
+                method=event_method,
+                task=ApiLog.TaskType.EVENT,
+                task_data=event_data,
+            )
+
+            if valid_method:
+                on_commit(lambda: ingest_event.delay(api_log=api_log.pk))
+                return HttpResponse(status=202)
+
+            api_log.status = ApiLog.Status.FAILED
+            api_log.failure_reason = f"Invalid request method [{event_method}]"
+            api_log.save()
+    except Exception:
+        release_key(ApiLog.TaskType.EVENT, remote_ip, idempotency_key)
+        raise
+    return HttpResponseBadRequest(api_log.failure_reason)
+
+
+# TODO: Remove csrf_exempt
+@csrf_exempt
+async def event_async(request):
+    """Log Event (Async)
+
+    Async version of `event` view, to be served by an ASGI server. The request is accepted and validated on the
+    event loop. Only the ApiLog insert and the task dispatch are handed over to a thread.
+    """
+
+    remote_ip = get_remote_ip(request)
+    event_method = request.method.lower()
+
+    logger.info("New Event from %s [%s]", remote_ip, event_method)
+
+    valid_method = event_method in ApiLog.LogMethods.valid_event_methods()
+    if valid_method and (response := await sync_to_async(admit)(remote_ip)):
+        return response
+
+    try:
+        event_data = parse_event_payload(request)
+    except PayloadError as e:
+        return HttpResponse(str(e), status=e.status)
+
+    if not valid_method:
+        api_log = await ApiLog.objects.acreate(
             remote_ip=remote_ip,
             method=event_method,
             task=ApiLog.TaskType.EVENT,
             task_data=event_data,
+            status=ApiLog.Status.FAILED,
+            failure_reason=f"Invalid request method [{event_method}]",
         )
+        return HttpResponseBadRequest(api_log.failure_reason)
 
-        if event_method in ApiLog.LogMethods.valid_event_methods():
-            on_commit(lambda: ingest_event.delay(api_log=api_log.pk))
+    if invalid_payload := await sync_to_async(validate_event_payload)(remote_ip, event_data):
+        return await sync_to_async(_invalid_payload_response)(remote_ip, event_method, event_data, invalid_payload)
+
+    idempotency_key = get_idempotency_key(request, event_data)
+    if not await sync_to_async(claim_key)(ApiLog.TaskType.EVENT, remote_ip, idempotency_key):
+        logger.info("Repeated Event from %s [%s]: %s", remote_ip, event_method, idempotency_key)
+        return duplicate_response(status=202)
+
+    if response := await sync_to_async(admit_quota)(remote_ip):
+        await sync_to_async(release_key)(ApiLog.TaskType.EVENT, remote_ip, idempotency_key)
+        return response
+
+    try:
+        if settings.INGEST_WRITE_BUFFER and await sync_to_async(append_event)(remote_ip, event_method, event_data):
             return HttpResponse(status=202)
 
-        api_log.status = ApiLog.Status.FAILED
-        api_log.failure_reason = f"Invalid request method [{event_method}]"
-        api_log.save()
-    return HttpResponseBadRequest(api_log.failure_reason)
+        api_log = await ApiLog.objects.acreate(
+            remote_ip=remote_ip,
+            method=event_method,
+            task=ApiLog.TaskType.EVENT,
+            task_data=event_data,
+        )
+        await sync_to_async(ingest_event.delay)(api_log=api_log.pk)
+    except Exception:
+        await sync_to_async(release_key)(ApiLog.TaskType.EVENT, remote_ip, idempotency_key)
+        raise
+    return HttpResponse(status=202)
+
+
+# TODO: Remove csrf_exempt
+@csrf_exempt
+def event_bulk(request):
+    """Log Events in Bulk
+
+    Accepts a JSON array or NDJSON (one JSON object per line) body.
+    Responds with a status for every item, so that the monitor tool can retry only the rejected items.
+    """
+
+    remote_ip = get_remote_ip(request)
+    event_method = request.method.lower()
+
+    logger.info("New Bulk Events from %s [%s]", remote_ip, event_method)
+
+    if event_method not in ApiLog.LogMethods.valid_event_methods():
+        return HttpResponseBadRequest(f"Invalid request method [{event_method}]")
+
+    try:
+        items = parse_bulk_events(decode_body(request, max_size=settings.BULK_INGEST_MAX_BYTES))
+    except PayloadError as e:
+        return HttpResponse(str(e), status=e.status)
+
+    if len(items) > settings.BULK_INGEST_MAX_EVENTS:
+        return HttpResponse(
+            f"Too many events [{len(items)} > {settings.BULK_INGEST_MAX_EVENTS}]",
+            status=413,
+        )
+
+    if response := admit(remote_ip, sum(1 for _event_data, error in items if not error)):
+        return response
+
+    item_status = []
+    api_logs = []
+    quarantined = []
+    idempotency_keys = []
+    created_ts = timezone.now()
+
+    items = [
+        (
+            (expand_csv_fields(event_data), error, validate_event_payload(remote_ip, event_data))
+            if not error
+            else (event_data, error, None)
+        )
+        for event_data, error in items
+    ]
+    # NOTE: Idempotency-Key header applies to a single event. Bulk events can only use IDEMPOTENCY_KEY_FIELD.
+    item_keys = [
+        get_idempotency_key(None, event_data) if not (error or invalid) else None
+        for event_data, error, invalid in items
+    ]
+    claimed = claim_keys(ApiLog.TaskType.EVENT, remote_ip, item_keys)
+    for idx, ((event_data, error, invalid), item_key, new_key) in enumerate(zip(items, item_keys, claimed)):
+        if error:
+            item_status.append({"index": idx, "status": 400, "error": error})
+            continue
+        if invalid and not invalid.quarantine:
+            item_status.append({"index": idx, "status": 422, "errors": invalid.errors})
+            continue
+        if invalid:
+            quarantined.append(
+                ApiLog(
+                    remote_ip=remote_ip,
+                    method=event_method,
+                    task=ApiLog.TaskType.EVENT,
+                    task_data=event_data,
+                    created=created_ts,
+                    status=ApiLog.Status.FAILED,
+                    failure_reason=invalid.failure_reason,
+                )
+            )
+            item_status.append({"index": idx, "status": 202, "quarantined": True})
+            continue
+        if not new_key:
+            item_status.append({"index": idx, "status": 200, "duplicate": True})
+            continue
+        api_log = ApiLog(
+            remote_ip=remote_ip,
+            method=event_method,
+            task=ApiLog.TaskType.EVENT,
+            task_data=event_data,
+            created=created_ts,
+        )
+        api_logs.append(api_log)
+        idempotency_keys.append(item_key)
+        item_status.append({"index": idx, "status": 202, "api_log": api_log})
+    accepted = len(api_logs)
+    duplicates = sum(1 for _item in item_status if _item.get("duplicate"))
+    rejected = len(items) - accepted - duplicates - len(quarantined)
+
+    if response := admit_quota(remote_ip, accepted):
+        release_keys(ApiLog.TaskType.EVENT, remote_ip, idempotency_keys)
+        return response
+
+    try:
+        if api_logs and settings.INGEST_WRITE_BUFFER:
+            entry_ids = append_entries(
+                [
+                    make_entry(remote_ip, event_method, api_log.task_data, api_log.created, api_log.event_uid)
+                    for api_log in api_logs
+                ]
+            )
+            if entry_ids:
+                entry_id_iter = iter(entry_ids)
+                for _item in item_status:
+                    if _item.pop("api_log", None):
+                        _item["buffer_entry_id"] = next(entry_id_iter)
+                api_logs.clear()  # Persisted by the buffer consumer
+
+        if api_logs or quarantined:
+            with atomic():
+                # `bulk_create` does not call `ApiLog.save()`
+                monitor_tool_ip_cache.get_or_create(remote_ip)
+                ApiLog.objects.bulk_create(api_logs + quarantined)
+
+                api_log_ids = [api_log.pk for api_log in api_logs]
+                for i in range(0, len(api_log_ids), settings.BULK_INGEST_CHUNK_SIZE):
+                    chunk = api_log_ids[i : i + settings.BULK_INGEST_CHUNK_SIZE]
+                    on_commit(lambda chunk=chunk: bulk_ingest_events.delay(api_logs=chunk))
+
+            for _item in item_status:
+                if "api_log" in _item:
+                    _item["api_log"] = _item["api_log"].pk
+    except Exception:
+        release_keys(ApiLog.TaskType.EVENT, remote_ip, idempotency_keys)
+        raise
+
+    logger.info(
+        "Bulk Events from %s: Accepted [%s], Repeated [%s], Quarantined [%s], Rejected [%s]",
+        remote_ip,
+        accepted,
+        duplicates,
+        len(quarantined),
+        rejected,
+    )
+    return JsonResponse(
+        {
+            "accepted": accepted,
+            "duplicates": duplicates,
+            "quarantined": len(quarantined),
+            "rejected": rejected,
+            "items": item_status,
+        },
+        status=202 if accepted or duplicates or quarantined else 400,
+    )
 
 
 def event_info(_request, event_index, event_id):
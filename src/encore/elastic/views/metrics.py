@@ -0,0 +1,10 @@
+"""Metrics Views"""
+
+from django.http import JsonResponse
+
+from elastic.admission import pressure_signals, rejection_counts
+
+
+def admission_metrics(_request):
+    """Admission Control metrics: events rejected (by reason) and the current pressure signals"""
+    return JsonResponse({"rejected": rejection_counts(), "pressure": pressure_signals.get()})
@@ -1,15 +1,18 @@
 """Resolve View"""
 
-import json
 import logging
 
+from asgiref.sync import sync_to_async
+
 from django.db.transaction import atomic, on_commit
 from django.http import HttpResponse, HttpResponseBadRequest
 from django.views.decorators.csrf import csrf_exempt
 
 from elastic.constants import FieldNames
+from elastic.idempotency import claim_key, duplicate_response, get_idempotency_key, release_key
 from elastic.models import ApiLog
 from elastic.tasks import resolve_event
+from .common import PayloadError, get_remote_ip, parse_payload
 
 logger = logging.getLogger("correlator.elastic")
 
@@ -19,31 +22,93 @@ logger = logging.getLogger("correlator.elastic")
 def resolve(request):
     """Manual Resolve Event"""
 
-    remote_ip = request.META.get("HTTP_X_FORWARDED_FOR", "127.0.0.1")
+    remote_ip = get_remote_ip(request)
+    resolve_method = request.method.lower()
+
+    logger.info("Resolve Event from %s [%s]", remote_ip, resolve_method)
+
+    try:
+        resolve_data = parse_payload(request)
+    except PayloadError as e:
+        return HttpResponse(str(e), status=e.status)
+
+    valid_request = resolve_method == "post" and FieldNames.ITSM_TICKET in resolve_data
+    idempotency_key = get_idempotency_key(request, resolve_data) if valid_request else None
+    if not claim_key(ApiLog.TaskType.RESOLVE, remote_ip, idempotency_key):
+        logger.info("Repeated Resolve Event from %s [%s]: %s", remote_ip, resolve_method, idempotency_key)
+        return duplicate_response(status=200)
+
+    try:
+        with atomic():
+            api_log = ApiLog.objects.create(
+                remote_ip=remote_ip,
+                method=resolve_method,
+                task=ApiLog.TaskType.RESOLVE,
+                task_data=resolve_data,
+            )
+
+            if resolve_method != "post":
+                api_log.status = ApiLog.Status.FAILED
+                api_log.failure_reason = f"Invalid request method [{resolve_method}]"
+                api_log.save()
+                return HttpResponseBadRequest(f"Invalid request method [{resolve_method}]")
+
+            if FieldNames.ITSM_TICKET not in resolve_data:
+                api_log.status = ApiLog.Status.FAILED
+                api_log.failure_reason = f"Missing {FieldNames.ITSM_TICKET}"
+                api_log.save()
+                return HttpResponseBadRequest(f"Missing {FieldNames.ITSM_TICKET}")
+
+            on_commit(lambda: resolve_event.delay(api_log=api_log.pk))
+    except Exception:
+        release_key(ApiLog.TaskType.RESOLVE, remote_ip, idempotency_key)
+        raise
+    return HttpResponse(status=200)  # NOTE: Ideally it should be 202, but GLPI needs 200
+
+
+# TODO: Remove csrf_exempt
+@csrf_exempt
+async def resolve_async(request):
+    """Manual Resolve Event (Async)
+
+    Async version of `resolve` view, to be served by an ASGI server.
+    """
+
+    remote_ip = get_remote_ip(request)
     resolve_method = request.method.lower()
 
     logger.info("Resolve Event from %s [%s]", remote_ip, resolve_method)
 
-    resolve_data = json.loads(request.body or "{}")
-    with atomic():
-        api_log = ApiLog.objects.create(
+    try:
+        resolve_data = parse_payload(request)
+    except PayloadError as e:
+        return HttpResponse(str(e), status=e.status)
+
+    failure_reason = None
+    if resolve_method != "post":
+        failure_reason = f"Invalid request method [{resolve_method}]"
+    elif FieldNames.ITSM_TICKET not in resolve_data:
+        failure_reason = f"Missing {FieldNames.ITSM_TICKET}"
+
+    idempotency_key = get_idempotency_key(request, resolve_data) if not failure_reason else None
+    if not await sync_to_async(claim_key)(ApiLog.TaskType.RESOLVE, remote_ip, idempotency_key):
+        logger.info("Repeated Resolve Event from %s [%s]: %s", remote_ip, resolve_method, idempotency_key)
+        return duplicate_response(status=200)
+
+    try:
+        api_log = await ApiLog.objects.acreate(
             remote_ip=remote_ip,
             method=resolve_method,
             task=ApiLog.TaskType.RESOLVE,
             task_data=resolve_data,
+            status=ApiLog.Status.FAILED if failure_reason else ApiLog.Status.NEW,
+            failure_reason=failure_reason or "",
         )
+        if failure_reason:
+            return HttpResponseBadRequest(failure_reason)
 
-        if resolve_method != "post":
-            api_log.status = ApiLog.Status.FAILED
-            api_log.failure_reason = f"Invalid request method [{resolve_method}]"
-            api_log.save()
-            return HttpResponseBadRequest(f"Invalid request method [{resolve_method}]")
-
-        if FieldNames.ITSM_TICKET not in resolve_data:
-            api_log.status = ApiLog.Status.FAILED
-            api_log.failure_reason = f"Missing {FieldNames.ITSM_TICKET}"
-            api_log.save()
-            return HttpResponseBadRequest(f"Missing {FieldNames.ITSM_TICKET}")
-
-    on_commit(lambda: resolve_event.delay(api_log=api_log.pk))
+        await sync_to_async(resolve_event.delay)(api_log=api_log.pk)
+    except Exception:
+        await sync_to_async(release_key)(ApiLog.TaskType.RESOLVE, remote_ip, idempotency_key)
+        raise
     return HttpResponse(status=200)  # NOTE: Ideally it should be 202, but GLPI needs 200
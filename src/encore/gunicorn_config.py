@@ -3,9 +3,13 @@
 # Check https://docs.gunicorn.org/en/stable/settings.html
 
 import multiprocessing
+import os
 
 bind = "0.0.0.0:8000"  # pylint: disable=invalid-name
-workers = multiprocessing.cpu_count()
+workers = int(os.environ.get("GUNICORN_WORKERS", multiprocessing.cpu_count()))
+# Use "uvicorn.workers.UvicornWorker" along with "correlator.asgi:application" (and USE_ASYNC_VIEWS=True)
+# to serve the async ingest views.
+worker_class = os.environ.get("GUNICORN_WORKER_CLASS", "sync")  # pylint: disable=invalid-name
 # accesslog = the access log file to write to. else write to sysout.
 # errorlog = the error log file to write to. else write to syserr.
 # loglevel = warning
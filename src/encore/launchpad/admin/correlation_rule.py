@@ -24,6 +24,8 @@ class CorrelationRuleAdmin(admin.ModelAdmin):
         "id",
         "monitor_tool__name",
         "event_title",
+        "match_type",
+        "priority",
         "parent_child_lookup_required",
         "wait_time_in_seconds",
         "up_event_flag",
@@ -34,9 +36,11 @@ class CorrelationRuleAdmin(admin.ModelAdmin):
 
     list_filter = (
         "monitor_tool__name",
+        "match_type",
         "parent_child_lookup_required",
         "up_event_flag",
         "do_not_create_ticket_flag",
+        "compact_duplicates",
         "itsm_assignment_group_uid",
         "itsm_severity",
     )
@@ -48,7 +52,7 @@ class CorrelationRuleAdmin(admin.ModelAdmin):
     )
 
     fieldsets = [
-        ("Lookup Fields", {"fields": ["monitor_tool", "event_title"]}),
+        ("Lookup Fields", {"fields": ["monitor_tool", "event_title", "match_type", "priority"]}),
         (
             "Rule Settings",
             {
@@ -57,6 +61,7 @@ class CorrelationRuleAdmin(admin.ModelAdmin):
                     "wait_time_in_seconds",
                     "up_event_flag",
                     "do_not_create_ticket_flag",
+                    "compact_duplicates",
                 ]
             },
         ),
@@ -71,6 +76,8 @@ class CorrelationRuleAdmin(admin.ModelAdmin):
                 ]
             },
         ),
+        ("Flapping Detection", {"fields": ["flap_threshold", "flap_window", "flap_stable_time"]}),
+        ("Retry Policy", {"fields": ["retry_policy"]}),
         ("Audit Fields", {"fields": ["id", "created", "modified"]}),
     ]
 
@@ -37,6 +37,8 @@ class MonitorToolAdmin(admin.ModelAdmin):
 
     fieldsets = [
         (None, {"fields": ["name", "created"]}),
+        ("Admission Control", {"fields": ["ingest_quota_per_minute"]}),
+        ("Payload Validation", {"fields": ["payload_schema", "invalid_payload_action"]}),
         # ("Lookup Fields", {"fields": ["monitor_tool_name", "alert_title"]}),
     ]
 
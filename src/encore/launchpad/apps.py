@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class LaunchpadConfig(AppConfig):
     default_auto_field = "django.db.models.BigAutoField"
     name = "launchpad"
+
+    def ready(self) -> None:
+        from . import signals  # NOQA pylint: disable=import-outside-toplevel,unused-import
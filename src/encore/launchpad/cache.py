@@ -0,0 +1,244 @@
+"""Process-local Caches for Launchpad Models
+
+Entries are invalidated by signals (check launchpad/signals.py) in the process where the change is made.
+Other processes (web / celery workers) pick up the change once the entry expires (TTL). The Correlation Rule table
+is also invalidated in the other processes by a Redis pub/sub broadcast.
+Cached instances are shared, treat them as read-only.
+"""
+
+import logging
+import os
+import threading
+import time
+import typing as t
+from collections import OrderedDict
+
+import redis
+
+from django.conf import settings
+
+from .models import CorrelationRule, EventLevelBasedSubRule, ItsmSettings, MonitorTool, MonitorToolIP
+from .payload_schema import SchemaError, compile_schema
+from .rule_matcher import RuleMatcher, RuleMatchError
+
+logger = logging.getLogger("correlator.launchpad.cache")
+
+
+class MonitorToolIPCache:
+    """TTL / LRU cache of IP -> MonitorToolIP (with Monitor Tool)"""
+
+    def __init__(self, maxsize: int, ttl: int) -> None:
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._entries: OrderedDict[str, t.Tuple[float, MonitorToolIP]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _get_cached(self, ip: str) -> t.Optional[MonitorToolIP]:
+        with self._lock:
+            entry = self._entries.get(ip)
+            if entry is None:
+                return None
+            expires_at, monitor_tool_ip = entry
+            if expires_at < time.monotonic():
+                del self._entries[ip]
+                return None
+            self._entries.move_to_end(ip)
+            return monitor_tool_ip
+
+    def _set_cached(self, monitor_tool_ip: MonitorToolIP):
+        if self.ttl <= 0 or self.maxsize <= 0:
+            return
+        with self._lock:
+            self._entries[monitor_tool_ip.ip] = (time.monotonic() + self.ttl, monitor_tool_ip)
+            self._entries.move_to_end(monitor_tool_ip.ip)
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def get(self, ip: str) -> MonitorToolIP:
+        """MonitorToolIP for the IP. Raises MonitorToolIP.DoesNotExist like `MonitorToolIP.objects.get`."""
+        if monitor_tool_ip := self._get_cached(ip):
+            return monitor_tool_ip
+        monitor_tool_ip = MonitorToolIP.objects.select_related("monitor_tool").get(ip=ip)
+        self._set_cached(monitor_tool_ip)
+        return monitor_tool_ip
+
+    def get_or_create(self, ip: str) -> MonitorToolIP:
+        """MonitorToolIP for the IP, created if it does not exist"""
+        if monitor_tool_ip := self._get_cached(ip):
+            return monitor_tool_ip
+        monitor_tool_ip, created = MonitorToolIP.objects.select_related("monitor_tool").get_or_create(ip=ip)
+        # NOTE: A newly created one is not cached, as the transaction creating it may still be rolled back
+        if not created:
+            self._set_cached(monitor_tool_ip)
+        return monitor_tool_ip
+
+    def get_many(self, ips: t.Iterable[str]) -> t.Dict[str, MonitorToolIP]:
+        """MonitorToolIP for each of the IPs, created if it does not exist"""
+        monitor_tool_ips = {}
+        missing = set()
+        for ip in ips:
+            if monitor_tool_ip := self._get_cached(ip):
+                monitor_tool_ips[ip] = monitor_tool_ip
+            else:
+                missing.add(ip)
+        if missing:
+            for ip, monitor_tool_ip in MonitorToolIP.objects.select_related("monitor_tool").in_bulk(missing).items():
+                self._set_cached(monitor_tool_ip)
+                monitor_tool_ips[ip] = monitor_tool_ip
+            for ip in missing - monitor_tool_ips.keys():
+                monitor_tool_ips[ip] = self.get_or_create(ip)
+        return monitor_tool_ips
+
+    def invalidate(self, ip: t.Optional[str] = None):
+        """Invalidate the entry for the IP, or all the entries"""
+        with self._lock:
+            if ip is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(ip, None)
+
+
+class PayloadValidatorCache:
+    """Cache of Monitor Tool -> compiled payload schema validator"""
+
+    def __init__(self) -> None:
+        self._validators: t.Dict[int, t.Tuple[t.Dict[str, t.Any], t.Callable[[t.Any], t.List[str]]]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, monitor_tool: MonitorTool) -> t.Optional[t.Callable[[t.Any], t.List[str]]]:
+        """Payload validator of the Monitor Tool, None if it has no schema"""
+        if not (schema := monitor_tool.payload_schema):
+            return None
+        with self._lock:
+            entry = self._validators.get(monitor_tool.pk)
+        # NOTE: Schema is compared, as the Monitor Tool may have been updated in another process
+        if entry and entry[0] == schema:
+            return entry[1]
+        try:
+            validator = compile_schema(schema)
+        except SchemaError as e:
+            logger.error("Ignoring invalid payload schema of %s: %s", monitor_tool.name, str(e))
+            return None
+        with self._lock:
+            self._validators[monitor_tool.pk] = (schema, validator)
+        return validator
+
+    def invalidate(self, monitor_tool_id: t.Optional[int] = None):
+        """Invalidate the validator of the Monitor Tool, or all the validators"""
+        with self._lock:
+            if monitor_tool_id is None:
+                self._validators.clear()
+            else:
+                self._validators.pop(monitor_tool_id, None)
+
+
+class CompiledRule(t.NamedTuple):
+    """Correlation Rule with its Event Level based Sub Rules by event level"""
+
+    rule: CorrelationRule
+    level_sub_rules: t.Dict[str, EventLevelBasedSubRule]
+
+    def level_sub_rule(self, level) -> t.Optional[EventLevelBasedSubRule]:
+        """EventLevelBasedSubRule for given level"""
+        return self.level_sub_rules.get(level)
+
+    def itsm_settings(self, level=None) -> ItsmSettings:
+        """ITSM Settings (check `CorrelationRule.itsm_settings`)"""
+        _sett = ItsmSettings(**self.rule.__dict__)
+        if level and (level_rule := self.level_sub_rule(level)):
+            _sett.itsm_severity = level_rule.itsm_severity
+        return _sett
+
+
+class CorrelationRuleTable:
+    """All the Correlation Rules, compiled: monitor tool id -> RuleMatcher of CompiledRule (check rule_matcher.py)
+
+    Loaded on first use & reloaded after an invalidation: by signals, by a broadcast on CORRELATION_RULES_CHANNEL
+    from another process, or after CORRELATION_RULES_TTL (in case a broadcast was missed).
+    """
+
+    def __init__(self, ttl: int) -> None:
+        self.ttl = ttl
+        self._rules: t.Optional[t.Dict[int, RuleMatcher[CompiledRule]]] = None
+        self._expires_at = 0.0
+        self._lock = threading.Lock()
+        self._listener_pid: t.Optional[int] = None
+
+    def _load(self) -> t.Dict[int, RuleMatcher[CompiledRule]]:
+        with self._lock:
+            if self._rules is not None and self._expires_at >= time.monotonic():
+                return self._rules
+            rules: t.Dict[int, RuleMatcher[CompiledRule]] = {}
+            for rule in CorrelationRule.objects.select_related("monitor_tool").prefetch_related(
+                "event_level_based_sub_rules"
+            ):
+                compiled_rule = CompiledRule(
+                    rule=rule,
+                    level_sub_rules={
+                        sub_rule.event_level: sub_rule for sub_rule in rule.event_level_based_sub_rules.all()
+                    },
+                )
+                try:
+                    rules.setdefault(rule.monitor_tool_id, RuleMatcher()).add(
+                        compiled_rule, rule.match_type, rule.event_title, priority=rule.priority, rule_id=rule.pk
+                    )
+                except RuleMatchError as e:
+                    logger.error("Ignoring Correlation Rule [%s] with invalid event title: %s", rule.pk, str(e))
+            for matcher in rules.values():
+                matcher.compile()
+            self._rules, self._expires_at = rules, time.monotonic() + self.ttl
+            logger.debug("Loaded Correlation Rules of %s Monitor Tools", len(rules))
+            return rules
+
+    def get(self, monitor_tool_id: int, event_title: t.Optional[str]) -> t.Optional[CompiledRule]:
+        """Rule of the monitor tool matching the event title, else the default (*) rule of the monitor tool"""
+        self._listen()
+        rules = self._rules
+        if rules is None or self._expires_at < time.monotonic():
+            rules = self._load()
+        if matcher := rules.get(monitor_tool_id):
+            return matcher.match(event_title)
+        return None
+
+    def invalidate(self):
+        """Invalidate the table (reloaded on next use)"""
+        with self._lock:
+            self._rules = None
+
+    def broadcast_invalidate(self):
+        """Invalidate the table in this & all the other processes"""
+        self.invalidate()
+        try:
+            settings.REDIS_CLIENT.publish(settings.CORRELATION_RULES_CHANNEL, "invalidate")
+        except redis.RedisError as e:
+            logger.error("Failed to broadcast Correlation Rules invalidation: %s", str(e))
+
+    def _listen(self):
+        """Start listening for the broadcasts (once per process, as forked workers do not inherit the thread)"""
+        if self._listener_pid == os.getpid():
+            return
+        with self._lock:
+            if self._listener_pid == os.getpid():
+                return
+            self._listener_pid = os.getpid()
+        threading.Thread(target=self._listener, name="correlation-rules-listener", daemon=True).start()
+
+    def _listener(self):
+        while True:
+            try:
+                pubsub = settings.REDIS_CLIENT.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(settings.CORRELATION_RULES_CHANNEL)
+                # Broadcasts may have been missed while (re)connecting
+                self.invalidate()
+                for _message in pubsub.listen():
+                    self.invalidate()
+            except redis.RedisError as e:
+                logger.warning("Correlation Rules listener disconnected: %s", str(e))
+                time.sleep(5)
+
+
+monitor_tool_ip_cache = MonitorToolIPCache(
+    maxsize=settings.MONITOR_TOOL_IP_CACHE_SIZE, ttl=settings.MONITOR_TOOL_IP_CACHE_TTL
+)
+payload_validator_cache = PayloadValidatorCache()
+correlation_rule_table = CorrelationRuleTable(ttl=settings.CORRELATION_RULES_TTL)
@@ -10,6 +10,7 @@ class CorrelationRuleForm(forms.ModelForm):
         widgets = {
             "event_title": forms.TextInput(attrs={"size": 200}),
             "itsm_title": forms.TextInput(attrs={"size": 200}),
+            "retry_policy": forms.Textarea(attrs={"rows": 5, "cols": 80}),
         }
 
 
@@ -9,6 +9,8 @@ class MonitorToolForm(forms.ModelForm):
     class Meta:
         widgets = {
             "name": forms.TextInput(),
+            "payload_schema": forms.Textarea(attrs={"rows": 10, "cols": 80}),
+            "invalid_payload_action": forms.Select(),
         }
 
 
@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 03:57
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("launchpad", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="monitortool",
+            name="ingest_quota_per_minute",
+            field=models.PositiveIntegerField(
+                blank=True,
+                help_text="Max events accepted per minute from the tool (across all its IPs), when admission control"
+                + " is enabled. Leave empty for no limit.",
+                null=True,
+            ),
+        ),
+    ]
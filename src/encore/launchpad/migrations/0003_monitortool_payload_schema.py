@@ -0,0 +1,33 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("launchpad", "0002_monitortool_ingest_quota_per_minute"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="monitortool",
+            name="invalid_payload_action",
+            field=models.TextField(
+                choices=[("reject", "Reject"), ("quarantine", "Quarantine")],
+                default="quarantine",
+                help_text="Action for the events not matching the payload schema. SNMP events are always quarantined.",
+            ),
+        ),
+        migrations.AddField(
+            model_name="monitortool",
+            name="payload_schema",
+            field=models.JSONField(
+                blank=True,
+                help_text="JSON schema for the event payload (as received from the tool)."
+                + " Supports type, required, properties,"
+                + " additionalProperties, items, enum, const, pattern, minLength, maxLength, minimum & maximum.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,24 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:09
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("launchpad", "0003_monitortool_payload_schema"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="correlationrule",
+            name="retry_policy",
+            field=models.JSONField(
+                blank=True,
+                help_text="Overrides of the default retry policy per event status."
+                + ' E.g. {"alerted": {"base": 30, "factor": 2, "cap": 3600, "jitter": 0.1, "max_retries": 500}}.'
+                + " Events retried more than max_retries times are parked.",
+                null=True,
+            ),
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("launchpad", "0004_correlationrule_retry_policy"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="correlationrule",
+            name="match_type",
+            field=models.TextField(
+                choices=[("exact", "Exact"), ("prefix", "Prefix"), ("glob", "Glob"), ("regex", "Regex")],
+                default="exact",
+            ),
+        ),
+        migrations.AddField(
+            model_name="correlationrule",
+            name="priority",
+            field=models.SmallIntegerField(
+                default=0,
+                help_text="Among the prefix / glob / regex rules of the monitor tool matching an event, highest wins."
+                + " Exact rules always win, the default (*) rule is used if nothing matches.",
+            ),
+        ),
+        migrations.AlterField(
+            model_name="correlationrule",
+            name="event_title",
+            field=models.TextField(
+                db_index=True,
+                help_text="Use * to set default rule for the monitor tool."
+                + " Prefix, glob (e.g. 'Disk usage * on /var*') or regex (whole title) as per the match type.",
+            ),
+        ),
+    ]
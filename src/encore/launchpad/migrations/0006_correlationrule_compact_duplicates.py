@@ -0,0 +1,23 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:32
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("launchpad", "0005_correlationrule_match_type"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="correlationrule",
+            name="compact_duplicates",
+            field=models.BooleanField(
+                default=False,
+                help_text="If True, duplicate down events deduped at ingest are folded into the initial event"
+                + " (duplicate count, first / last seen & latest samples) instead of being stored."
+                + " Requires DEDUP_AT_INGEST.",
+            ),
+        ),
+    ]
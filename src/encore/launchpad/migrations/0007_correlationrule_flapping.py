@@ -0,0 +1,36 @@
+# Generated by Django 5.1.1 on 2026-10-18 04:34
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("launchpad", "0006_correlationrule_compact_duplicates"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="correlationrule",
+            name="flap_stable_time",
+            field=models.PositiveIntegerField(
+                default=900, help_text="Time (in seconds) without transitions for a damped asset to be stable again."
+            ),
+        ),
+        migrations.AddField(
+            model_name="correlationrule",
+            name="flap_threshold",
+            field=models.PositiveSmallIntegerField(
+                blank=True,
+                help_text="Down / Up transitions of an asset within the flap window to damp it."
+                + " Empty to not detect flapping."
+                + " While damped, up events are held and repeated down events deduped onto the open down event.",
+                null=True,
+            ),
+        ),
+        migrations.AddField(
+            model_name="correlationrule",
+            name="flap_window",
+            field=models.PositiveIntegerField(default=600, help_text="Time (in seconds) transitions are counted over."),
+        ),
+    ]
@@ -5,8 +5,12 @@ from dataclasses import dataclass
 
 from model_utils.models import TimeStampedModel
 
+from django.core.exceptions import ValidationError
 from django.db import models
 
+from .. import rule_matcher
+from ..retry_policy import RetryPolicyError, validate_retry_policy
+
 
 @dataclass
 class ItsmSettings:
@@ -29,13 +33,31 @@ class ItsmSettings:
 class CorrelationRule(TimeStampedModel):
     """Correlation Rule Model"""
 
+    class MatchType(models.TextChoices):
+        """Event Title Match Type Choices (check launchpad/rule_matcher.py)"""
+
+        EXACT = rule_matcher.EXACT
+        PREFIX = rule_matcher.PREFIX
+        GLOB = rule_matcher.GLOB
+        REGEX = rule_matcher.REGEX
+
     monitor_tool = models.ForeignKey(
         "MonitorTool",
         on_delete=models.PROTECT,
         related_name="correlation_rules",
         related_query_name="correlatin_rule",
     )
-    event_title = models.TextField(db_index=True, help_text="Use * to set default rule for the monitor tool.")
+    event_title = models.TextField(
+        db_index=True,
+        help_text="Use * to set default rule for the monitor tool."
+        + " Prefix, glob (e.g. 'Disk usage * on /var*') or regex (whole title) as per the match type.",
+    )
+    match_type = models.TextField(choices=MatchType.choices, default=MatchType.EXACT)
+    priority = models.SmallIntegerField(
+        default=0,
+        help_text="Among the prefix / glob / regex rules of the monitor tool matching an event, highest wins."
+        + " Exact rules always win, the default (*) rule is used if nothing matches.",
+    )
 
     parent_child_lookup_required = models.BooleanField(
         default=True, db_index=True, help_text="When set, parent event will be looked up for such events."
@@ -53,6 +75,23 @@ class CorrelationRule(TimeStampedModel):
         + " Default Flag to use when no match found in Event Level based Sub Rule."
         + " Check 'Event Level based Sub Rules' section below.",
     )
+    compact_duplicates = models.BooleanField(
+        default=False,
+        help_text="If True, duplicate down events deduped at ingest are folded into the initial event"
+        + " (duplicate count, first / last seen & latest samples) instead of being stored. Requires DEDUP_AT_INGEST.",
+    )
+
+    # Flapping detection (check elastic/flapping.py)
+    flap_threshold = models.PositiveSmallIntegerField(
+        null=True,
+        blank=True,
+        help_text="Down / Up transitions of an asset within the flap window to damp it. Empty to not detect flapping."
+        + " While damped, up events are held and repeated down events deduped onto the open down event.",
+    )
+    flap_window = models.PositiveIntegerField(default=600, help_text="Time (in seconds) transitions are counted over.")
+    flap_stable_time = models.PositiveIntegerField(
+        default=900, help_text="Time (in seconds) without transitions for a damped asset to be stable again."
+    )
 
     # Fields used for ITSM ticket
     itsm_assignment_group_uid = models.PositiveSmallIntegerField(null=True, blank=True)
@@ -65,6 +104,14 @@ class CorrelationRule(TimeStampedModel):
     itsm_title = models.TextField(null=True, blank=True)
     itsm_desc = models.TextField(null=True, blank=True)
 
+    retry_policy = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="Overrides of the default retry policy per event status."
+        + ' E.g. {"alerted": {"base": 30, "factor": 2, "cap": 3600, "jitter": 0.1, "max_retries": 500}}.'
+        + " Events retried more than max_retries times are parked.",
+    )
+
     class Meta:
         """Meta"""
 
@@ -78,6 +125,18 @@ class CorrelationRule(TimeStampedModel):
     def __repr__(self) -> str:
         return f"{self.monitor_tool.name}: {self.event_title}"
 
+    def clean(self) -> None:
+        if self.match_type != self.MatchType.EXACT:
+            try:
+                rule_matcher.pattern_regex(self.match_type, self.event_title)
+            except rule_matcher.RuleMatchError as e:
+                raise ValidationError({"event_title": str(e)}) from e
+        if self.retry_policy:
+            try:
+                validate_retry_policy(self.retry_policy)
+            except RetryPolicyError as e:
+                raise ValidationError({"retry_policy": str(e)}) from e
+
     def level_sub_rule(self, level) -> t.Optional["EventLevelBasedSubRule"]:
         """EventLevelBasedSubRule for given level"""
         try:
@@ -133,14 +192,21 @@ CORRELATION_RULE_FIELDS = [
     "default_rule",
     "monitor_tool__name",
     "event_title",
+    "match_type",
+    "priority",
     "parent_child_lookup_required",
     "wait_time_in_seconds",
     "up_event_flag",
     "do_not_create_ticket_flag",
+    "compact_duplicates",
+    "flap_threshold",
+    "flap_window",
+    "flap_stable_time",
     "itsm_assignment_group_uid",
     "itsm_severity",
     "itsm_title",
     "itsm_desc",
+    "retry_policy",
 ]
 
 EVENT_LEVEL_BASED_SUB_RULE_FIELDS = [
@@ -5,9 +5,11 @@ import typing as t
 from model_utils.models import TimeStampedModel
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
 from django.db import models
 
 from elastic.constants import EventType, FieldNames
+from ..payload_schema import SchemaError, compile_schema
 
 
 class MonitorTool(models.Model):
@@ -19,6 +21,31 @@ class MonitorTool(models.Model):
         help_text="Only letters, numbers, space and hypen. Should not start/end with space.",
     )
     created = models.DateTimeField(auto_now_add=True, editable=False)
+    ingest_quota_per_minute = models.PositiveIntegerField(
+        null=True,
+        blank=True,
+        help_text="Max events accepted per minute from the tool (across all its IPs), when admission control"
+        + " is enabled. Leave empty for no limit.",
+    )
+    payload_schema = models.JSONField(
+        null=True,
+        blank=True,
+        help_text="JSON schema for the event payload (as received from the tool)."
+        + " Supports type, required, properties,"
+        + " additionalProperties, items, enum, const, pattern, minLength, maxLength, minimum & maximum.",
+    )
+
+    class InvalidPayloadAction(models.TextChoices):
+        """Invalid Payload Action Choices"""
+
+        REJECT = "reject"  # Respond with 422. Nothing is logged.
+        QUARANTINE = "quarantine"  # Log as FAILED ApiLog. Event is not sent to ELK.
+
+    invalid_payload_action = models.TextField(
+        choices=InvalidPayloadAction.choices,
+        default=InvalidPayloadAction.QUARANTINE,
+        help_text="Action for the events not matching the payload schema. SNMP events are always quarantined.",
+    )
 
     class Meta:
         """Meta"""
@@ -32,6 +59,13 @@ class MonitorTool(models.Model):
     def __repr__(self) -> str:
         return f"{self.name}"
 
+    def clean(self) -> None:
+        if self.payload_schema:
+            try:
+                compile_schema(self.payload_schema)
+            except SchemaError as e:
+                raise ValidationError({"payload_schema": str(e)}) from e
+
     @property
     def name_identifier(self):
         """Monitor Tool Name Identifier"""
@@ -0,0 +1,148 @@
+"""Monitor Tool Payload Schema
+
+A lightweight subset of JSON schema, compiled once into a validator (check `compile_schema`):
+`type`, `required`, `properties`, `additionalProperties` (bool), `items`, `enum`, `const`, `pattern`,
+`minLength`, `maxLength`, `minimum` & `maximum`.
+"""
+
+import re
+import typing as t
+
+Validator = t.Callable[[t.Any, str], t.List[str]]
+
+_TYPES: t.Dict[str, t.Callable[[t.Any], bool]] = {
+    "object": lambda v: isinstance(v, dict),
+    "array": lambda v: isinstance(v, list),
+    "string": lambda v: isinstance(v, str),
+    "integer": lambda v: isinstance(v, int) and not isinstance(v, bool),
+    "number": lambda v: isinstance(v, (int, float)) and not isinstance(v, bool),
+    "boolean": lambda v: isinstance(v, bool),
+    "null": lambda v: v is None,
+}
+
+MAX_ERRORS = 10
+
+
+class SchemaError(ValueError):
+    """Invalid (or unsupported) schema"""
+
+
+def _compile(schema: t.Dict[str, t.Any]) -> Validator:
+    if not isinstance(schema, dict):
+        raise SchemaError(f"Schema must be an object, not {type(schema).__name__}")
+
+    checks: t.List[Validator] = []
+
+    if "type" in schema:
+        types = schema["type"] if isinstance(schema["type"], list) else [schema["type"]]
+        if unknown := set(types) - _TYPES.keys():
+            raise SchemaError(f"Unsupported type {sorted(unknown)}")
+        type_checks = [_TYPES[_type] for _type in types]
+        type_names = "/".join(types)
+
+        def _check_type(value, path):
+            if any(check(value) for check in type_checks):
+                return []
+            return [f"{path}: expected {type_names}"]
+
+        checks.append(_check_type)
+
+    if "enum" in schema or "const" in schema:
+        allowed = schema["enum"] if "enum" in schema else [schema["const"]]
+        if not isinstance(allowed, list):
+            raise SchemaError("enum must be a list")
+
+        def _check_enum(value, path):
+            return [] if value in allowed else [f"{path}: {value!r} not in {allowed}"]
+
+        checks.append(_check_enum)
+
+    if "pattern" in schema:
+        try:
+            regex = re.compile(schema["pattern"])
+        except (re.error, TypeError) as e:
+            raise SchemaError(f"Invalid pattern {schema['pattern']!r}: {e}") from e
+
+        def _check_pattern(value, path):
+            if isinstance(value, str) and not regex.search(value):
+                return [f"{path}: does not match {regex.pattern!r}"]
+            return []
+
+        checks.append(_check_pattern)
+
+    min_length, max_length = schema.get("minLength"), schema.get("maxLength")
+    if min_length is not None or max_length is not None:
+
+        def _check_length(value, path):
+            if isinstance(value, str):
+                if min_length is not None and len(value) < min_length:
+                    return [f"{path}: shorter than {min_length}"]
+                if max_length is not None and len(value) > max_length:
+                    return [f"{path}: longer than {max_length}"]
+            return []
+
+        checks.append(_check_length)
+
+    minimum, maximum = schema.get("minimum"), schema.get("maximum")
+    if minimum is not None or maximum is not None:
+
+        def _check_range(value, path):
+            if isinstance(value, (int, float)) and not isinstance(value, bool):
+                if minimum is not None and value < minimum:
+                    return [f"{path}: less than {minimum}"]
+                if maximum is not None and value > maximum:
+                    return [f"{path}: greater than {maximum}"]
+            return []
+
+        checks.append(_check_range)
+
+    required = schema.get("required", [])
+    properties = {name: _compile(sub_schema) for name, sub_schema in schema.get("properties", {}).items()}
+    additional_properties = schema.get("additionalProperties", True)
+    if not isinstance(additional_properties, bool):
+        raise SchemaError("Only boolean additionalProperties is supported")
+    if required or properties or not additional_properties:
+
+        def _check_object(value, path):
+            if not isinstance(value, dict):
+                return []
+            errors = [f"{path}.{name}: required" for name in required if name not in value]
+            for name, validator in properties.items():
+                if name in value:
+                    errors.extend(validator(value[name], f"{path}.{name}"))
+            if not additional_properties:
+                errors.extend(f"{path}.{name}: not allowed" for name in value.keys() - properties.keys())
+            return errors
+
+        checks.append(_check_object)
+
+    if "items" in schema:
+        items_validator = _compile(schema["items"])
+
+        def _check_items(value, path):
+            if not isinstance(value, list):
+                return []
+            errors = []
+            for idx, item in enumerate(value):
+                errors.extend(items_validator(item, f"{path}[{idx}]"))
+            return errors
+
+        checks.append(_check_items)
+
+    def _validate(value, path):
+        errors = []
+        for check in checks:
+            errors.extend(check(value, path))
+            if len(errors) >= MAX_ERRORS:
+                break
+        return errors
+
+    return _validate
+
+
+def compile_schema(schema: t.Dict[str, t.Any]) -> t.Callable[[t.Any], t.List[str]]:
+    """Compile the schema into a validator, that returns the list of errors (empty if valid).
+    Raises SchemaError if the schema is invalid.
+    """
+    validator = _compile(schema)
+    return lambda payload: validator(payload, "$")[:MAX_ERRORS]
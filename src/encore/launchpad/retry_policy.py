@@ -0,0 +1,86 @@
+"""Retry Policy of the Event state-machine tasks
+
+An Event waiting in a status is retried after min(cap, base * factor ** retry_count) seconds, +/- jitter (a fraction
+of the delay). An Event retried more than `max_retries` times in a status is parked, instead of being retried forever
+(check `task_handler` in elastic/tasks/common.py).
+
+The default policy per status is EVENT_RETRY_POLICY (settings). A Correlation Rule can override any of the parameters
+per status (`retry_policy`), e.g. {"alerted": {"cap": 3600, "max_retries": 500}}.
+"""
+
+import random
+import typing as t
+from dataclasses import dataclass, fields
+
+from django.conf import settings
+
+MAX_DELAY = 86400  # Seconds. Cap of a policy without a cap
+
+
+class RetryPolicyError(ValueError):
+    """Invalid retry policy"""
+
+
+@dataclass(frozen=True)
+class RetryPolicy:
+    """Retry Policy for a status"""
+
+    base: float = 30
+    factor: float = 1
+    cap: t.Optional[float] = None
+    jitter: float = 0
+    max_retries: t.Optional[int] = None
+
+    def delay(self, retry_count: int) -> float:
+        """Seconds to wait before the next retry"""
+        cap = MAX_DELAY if self.cap is None else self.cap
+        try:
+            delay = min(cap, self.base * self.factor**retry_count)
+        except OverflowError:
+            delay = cap
+        if self.jitter:
+            delay *= 1 + random.uniform(-self.jitter, self.jitter)
+        return max(delay, 0)
+
+    def exceeded(self, retry_count: int) -> bool:
+        """Retries exceeded the max retries"""
+        return self.max_retries is not None and retry_count > self.max_retries
+
+
+_PARAMS = {field.name for field in fields(RetryPolicy)}
+
+
+def _validate_params(status: str, params: t.Any):
+    if not isinstance(params, dict):
+        raise RetryPolicyError(f"{status}: must be an object")
+    if unknown := params.keys() - _PARAMS:
+        raise RetryPolicyError(f"{status}: unknown parameters {sorted(unknown)}")
+    for name, value in params.items():
+        if name in ("cap", "max_retries") and value is None:
+            continue
+        if not isinstance(value, (int, float)) or isinstance(value, bool) or value < 0:
+            raise RetryPolicyError(f"{status}.{name}: must be a non negative number")
+    if params.get("factor", 1) < 1:
+        raise RetryPolicyError(f"{status}.factor: must be at least 1")
+    if params.get("jitter", 0) > 1:
+        raise RetryPolicyError(f"{status}.jitter: must be at most 1")
+    if not isinstance(params.get("max_retries", 0), (int, type(None))):
+        raise RetryPolicyError(f"{status}.max_retries: must be an integer")
+
+
+def validate_retry_policy(policy: t.Any):
+    """Validate the retry policy (overrides per status). Raises RetryPolicyError if invalid."""
+    if not isinstance(policy, dict):
+        raise RetryPolicyError("Retry policy must be an object of status -> parameters")
+    if unknown := policy.keys() - settings.EVENT_RETRY_POLICY.keys():
+        raise RetryPolicyError(f"Unknown status {sorted(unknown)}. Valid: {sorted(settings.EVENT_RETRY_POLICY)}")
+    for status, params in policy.items():
+        _validate_params(status, params)
+
+
+def get_retry_policy(status: str, overrides: t.Optional[t.Dict[str, t.Any]] = None) -> RetryPolicy:
+    """Retry Policy for the status: default policy with the overrides (of the Correlation Rule) applied"""
+    params = dict(settings.EVENT_RETRY_POLICY.get(status, {}))
+    if overrides and isinstance(status_overrides := overrides.get(status), dict):
+        params.update(status_overrides)
+    return RetryPolicy(**{name: value for name, value in params.items() if name in _PARAMS})
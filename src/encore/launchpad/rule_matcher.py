@@ -0,0 +1,103 @@
+"""Correlation Rule Matcher
+
+A Correlation Rule matches the event title by its `match_type`:
+- exact: the event title as is. "*" is the default rule of the monitor tool.
+- prefix: event titles starting with the event title of the rule
+- glob: shell-style wildcards (*, ?, [seq]), e.g. "Disk usage * on /var*"
+- regex: python regular expression, matching the whole event title
+
+For a monitor tool, an exact rule wins, then the pattern rules by priority (highest first, ties by id), then the
+default rule. All the pattern rules of a monitor tool are compiled into a single regex (one alternative per rule, in
+priority order), so an event title is matched in a single pass whatever the number of rules. Results are memoized per
+event title, as the same titles keep coming.
+"""
+
+import fnmatch
+import re
+import typing as t
+
+EXACT = "exact"
+PREFIX = "prefix"
+GLOB = "glob"
+REGEX = "regex"
+
+DEFAULT_TITLE = "*"
+MAX_MEMOIZED_TITLES = 4096
+
+T = t.TypeVar("T")
+
+
+class RuleMatchError(ValueError):
+    """Invalid (or unsupported) pattern"""
+
+
+def pattern_regex(match_type: str, pattern: str) -> str:
+    """Regex of the pattern, matching the whole event title. Raises RuleMatchError if the pattern is invalid."""
+    if match_type == PREFIX:
+        return re.escape(pattern) + "(?s:.*)"
+    if match_type == GLOB:
+        return fnmatch.translate(pattern)
+    if match_type == REGEX:
+        try:
+            compiled = re.compile(pattern)
+        except re.error as e:
+            raise RuleMatchError(f"Invalid regex {pattern!r}: {e.msg}") from e
+        try:
+            # Compiled as an alternative, as it is in the combined regex
+            re.compile(f"(?:{pattern})")
+        except re.error as e:
+            raise RuleMatchError(f"Global flags are not supported, use scoped flags e.g. (?i:...): {e.msg}") from e
+        if compiled.groups:
+            raise RuleMatchError("Capturing groups are not supported, use (?:...)")
+        return pattern
+    raise RuleMatchError(f"Unsupported match type {match_type!r}")
+
+
+class RuleMatcher(t.Generic[T]):
+    """Rules of a monitor tool, by event title (check the module docstring)"""
+
+    def __init__(self) -> None:
+        self._exact: t.Dict[str, T] = {}
+        self._patterns: t.List[t.Tuple[int, int, str, T]] = []  # (-priority, id, regex, rule)
+        self._rules: t.List[T] = []
+        self._regex: t.Optional[re.Pattern] = None
+        self._memo: t.Dict[str, t.Optional[T]] = {}
+
+    def add(self, rule: T, match_type: str, pattern: str, priority: int = 0, rule_id: int = 0):
+        """Add the rule. Raises RuleMatchError if the pattern is invalid."""
+        if match_type == EXACT:
+            self._exact[pattern] = rule
+        else:
+            self._patterns.append((-priority, rule_id, pattern_regex(match_type, pattern), rule))
+
+    def compile(self) -> "RuleMatcher[T]":
+        """Compile the pattern rules (once all the rules are added)"""
+        self._patterns.sort(key=lambda pattern: pattern[:2])
+        self._rules = [rule for _, _, _, rule in self._patterns]
+        if self._patterns:
+            # Empty group closing each alternative tells which one matched
+            self._regex = re.compile(
+                "|".join(f"(?:{regex})(?P<_r{idx}>)" for idx, (_, _, regex, _) in enumerate(self._patterns))
+            )
+        self._memo = {}
+        return self
+
+    def _match_pattern(self, title: str) -> t.Optional[T]:
+        if title in self._memo:
+            return self._memo[title]
+        rule = None
+        if self._regex and (match := self._regex.fullmatch(title)):
+            rule = self._rules[int(match.lastgroup[2:])]
+        if len(self._memo) >= MAX_MEMOIZED_TITLES:
+            self._memo.clear()
+        self._memo[title] = rule
+        return rule
+
+    def match(self, title: t.Optional[str]) -> t.Optional[T]:
+        """Rule for the event title, else the default rule (None if neither)"""
+        if title is not None:
+            if (rule := self._exact.get(title)) is not None:
+                return rule
+            if (rule := self._match_pattern(title)) is not None:
+                return rule
+        return self._exact.get(DEFAULT_TITLE)
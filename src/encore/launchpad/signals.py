@@ -0,0 +1,28 @@
+"""Launchpad Signals"""
+
+from django.db.models.signals import post_delete, post_save
+from django.db.transaction import on_commit
+from django.dispatch import receiver
+
+from .cache import correlation_rule_table, monitor_tool_ip_cache, payload_validator_cache
+from .models import CorrelationRule, EventLevelBasedSubRule, MonitorTool, MonitorToolIP
+
+
+@receiver([post_save, post_delete], sender=MonitorToolIP)
+def invalidate_monitor_tool_ip(sender, instance: MonitorToolIP, **kwargs):
+    """Invalidate the cached MonitorToolIP"""
+    monitor_tool_ip_cache.invalidate(instance.ip)
+
+
+@receiver([post_save, post_delete], sender=MonitorTool)
+def invalidate_monitor_tool(sender, instance: MonitorTool, **kwargs):
+    """Invalidate all the cached MonitorToolIPs (as any of them may hold the Monitor Tool) & the payload validator"""
+    monitor_tool_ip_cache.invalidate()
+    payload_validator_cache.invalidate(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=CorrelationRule)
+@receiver([post_save, post_delete], sender=EventLevelBasedSubRule)
+def invalidate_correlation_rules(sender, instance, **kwargs):
+    """Invalidate the Correlation Rule table in all the processes, once the change is committed"""
+    on_commit(correlation_rule_table.broadcast_invalidate)
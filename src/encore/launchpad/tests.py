@@ -1,6 +1,13 @@
-"""Setup Test Case"""
+"""Launchpad Test Cases"""
 
-from django.test import TestCase
+import typing as t
+from unittest import mock
+
+from django.test import SimpleTestCase, TestCase
+
+from launchpad import rule_matcher
+from launchpad.payload_schema import MAX_ERRORS, SchemaError, compile_schema
+from launchpad.retry_policy import MAX_DELAY, RetryPolicy, RetryPolicyError, get_retry_policy, validate_retry_policy
 
 
 # Create your tests here.
@@ -11,3 +18,237 @@ class SetupTestCase(TestCase):
         """Setup Test Case"""
         t = True
         self.assertTrue(t)
+
+
+class RetryPolicyTestCase(SimpleTestCase):
+    """Retry Policy of the Event state-machine tasks"""
+
+    def test_delay(self):
+        """base * factor ** retry_count"""
+        policy = RetryPolicy(base=10, factor=2)
+        self.assertEqual([policy.delay(retry_count) for retry_count in range(4)], [10, 20, 40, 80])
+        self.assertEqual(RetryPolicy(base=30).delay(100), 30)
+
+    def test_cap(self):
+        """Delay is capped, at MAX_DELAY if the policy has no cap (even if the delay overflows)"""
+        self.assertEqual(RetryPolicy(base=10, factor=2, cap=300).delay(10), 300)
+        self.assertEqual(RetryPolicy(base=10, factor=2).delay(30), MAX_DELAY)
+        self.assertEqual(RetryPolicy(base=10, factor=2.5, cap=300).delay(10000), 300)
+
+    def test_jitter(self):
+        """+/- jitter (a fraction of the delay), after the cap"""
+        policy = RetryPolicy(base=100, factor=2, cap=200, jitter=0.1)
+        with mock.patch("launchpad.retry_policy.random.uniform", side_effect=lambda low, high: low):
+            self.assertAlmostEqual(policy.delay(0), 90)
+            self.assertAlmostEqual(policy.delay(5), 180)
+        with mock.patch("launchpad.retry_policy.random.uniform", side_effect=lambda low, high: high):
+            self.assertAlmostEqual(policy.delay(5), 220)
+        for _ in range(100):
+            self.assertTrue(90 <= policy.delay(0) <= 110)
+        self.assertEqual(RetryPolicy(base=0, jitter=1).delay(0), 0)
+
+    def test_exceeded(self):
+        """Exceeded only after more than `max_retries` retries. Never without `max_retries`."""
+        policy = RetryPolicy(max_retries=3)
+        self.assertFalse(policy.exceeded(3))
+        self.assertTrue(policy.exceeded(4))
+        self.assertTrue(RetryPolicy(max_retries=0).exceeded(1))
+        self.assertFalse(RetryPolicy().exceeded(10**6))
+
+    def test_get_retry_policy(self):
+        """Default policy of the status, with the overrides of the status applied"""
+        with self.settings(EVENT_RETRY_POLICY={"alerted": {"base": 30, "factor": 1.5, "cap": 900}}):
+            self.assertEqual(get_retry_policy("alerted"), RetryPolicy(base=30, factor=1.5, cap=900))
+            self.assertEqual(
+                get_retry_policy("alerted", {"alerted": {"cap": 3600, "max_retries": 500}, "new": {"base": 1}}),
+                RetryPolicy(base=30, factor=1.5, cap=3600, max_retries=500),
+            )
+            self.assertEqual(get_retry_policy("resolving", {"resolving": "invalid"}), RetryPolicy())
+
+    def test_validate_retry_policy(self):
+        """Valid overrides"""
+        validate_retry_policy({})
+        validate_retry_policy({"alerted": {"cap": None, "max_retries": None}})
+        validate_retry_policy({"new": {"base": 0, "factor": 1, "jitter": 1, "max_retries": 0}})
+
+    def test_validate_invalid_retry_policy(self):
+        """Invalid overrides"""
+        for policy, error in [
+            ([], "must be an object"),
+            ({"unknown": {}}, "Unknown status"),
+            ({"new": []}, "new: must be an object"),
+            ({"new": {"delay": 10}}, "unknown parameters"),
+            ({"new": {"base": -1}}, "new.base: must be a non negative number"),
+            ({"new": {"base": "10"}}, "new.base: must be a non negative number"),
+            ({"new": {"base": True}}, "new.base: must be a non negative number"),
+            ({"new": {"cap": False}}, "new.cap: must be a non negative number"),
+            ({"new": {"factor": None}}, "new.factor: must be a non negative number"),
+            ({"new": {"factor": 0.5}}, "new.factor: must be at least 1"),
+            ({"new": {"jitter": 1.5}}, "new.jitter: must be at most 1"),
+            ({"new": {"max_retries": 3.0}}, "new.max_retries: must be an integer"),
+        ]:
+            with self.subTest(policy=policy), self.assertRaisesRegex(RetryPolicyError, error):
+                validate_retry_policy(policy)
+
+
+class RuleMatcherTestCase(SimpleTestCase):
+    """Correlation Rules matched by event title"""
+
+    def _matcher(self, *rules: t.Tuple[str, str, str, int]) -> rule_matcher.RuleMatcher[str]:
+        """Matcher of the (rule, match type, pattern, priority). The rule is also its id, for the ties."""
+        matcher: rule_matcher.RuleMatcher[str] = rule_matcher.RuleMatcher()
+        for rule, match_type, pattern, priority in rules:
+            matcher.add(rule, match_type, pattern, priority=priority, rule_id=int(rule[1:]))
+        return matcher.compile()
+
+    def test_match_types(self):
+        """Whole event title is matched"""
+        matcher = self._matcher(
+            ("r1", rule_matcher.EXACT, "Host Down", 0),
+            ("r2", rule_matcher.PREFIX, "Disk ", 0),
+            ("r3", rule_matcher.GLOB, "CPU * on ?ost[0-9]", 0),
+            ("r4", rule_matcher.REGEX, r"(?i:memory) \d+%", 0),
+        )
+        self.assertEqual(matcher.match("Host Down"), "r1")
+        self.assertIsNone(matcher.match("Host Down!"))
+        self.assertEqual(matcher.match("Disk usage\non /var"), "r2")
+        self.assertEqual(matcher.match("CPU load on host1"), "r3")
+        self.assertIsNone(matcher.match("CPU load on host10"))
+        self.assertEqual(matcher.match("MEMORY 90%"), "r4")
+        self.assertIsNone(matcher.match("Memory 90% used"))
+        self.assertIsNone(matcher.match(None))
+
+    def test_priority(self):
+        """Exact rule, then the pattern rules by priority (ties by id), then the default rule"""
+        matcher = self._matcher(
+            ("r5", rule_matcher.EXACT, rule_matcher.DEFAULT_TITLE, 0),
+            ("r4", rule_matcher.GLOB, "Disk*", 1),
+            ("r3", rule_matcher.PREFIX, "Disk usage", 1),
+            ("r2", rule_matcher.REGEX, "Disk usage .*", 5),
+            ("r1", rule_matcher.EXACT, "Disk usage 90%", 0),
+        )
+        self.assertEqual(matcher.match("Disk usage 90%"), "r1")
+        self.assertEqual(matcher.match("Disk usage 80%"), "r2")
+        self.assertEqual(matcher.match("Disk usage"), "r3")
+        self.assertEqual(matcher.match("Disk full"), "r4")
+        self.assertEqual(matcher.match("Host Down"), "r5")
+        self.assertEqual(matcher.match(None), "r5")
+
+    def test_combined_regex(self):
+        """Pattern rules are matched in a single pass, by the named group closing each alternative"""
+        rules = [(f"r{idx}", rule_matcher.PREFIX, f"Check {idx}:", 0) for idx in range(1, 201)]
+        matcher = self._matcher(*rules)
+        self.assertEqual(matcher.match("Check 150: failed"), "r150")
+        self.assertEqual(matcher.match("Check 1: failed"), "r1")
+        self.assertIsNone(matcher.match("Check 201: failed"))
+
+    def test_memo(self):
+        """Matches (& misses) are memoized, up to MAX_MEMOIZED_TITLES titles"""
+        matcher = self._matcher(("r1", rule_matcher.PREFIX, "Disk", 0))
+        self.assertEqual(matcher.match("Disk full"), "r1")
+        with mock.patch.object(matcher, "_regex") as regex:
+            self.assertEqual(matcher.match("Disk full"), "r1")
+        regex.fullmatch.assert_not_called()
+
+        for idx in range(rule_matcher.MAX_MEMOIZED_TITLES - 1):
+            matcher.match(f"Host {idx}")
+        self.assertEqual(len(matcher._memo), rule_matcher.MAX_MEMOIZED_TITLES)  # pylint: disable=protected-access
+        self.assertEqual(matcher.match("Disk usage"), "r1")
+        self.assertEqual(len(matcher._memo), 1)  # pylint: disable=protected-access
+
+        # Cleared on compile (after the rules are changed)
+        matcher.add("r2", rule_matcher.EXACT, "Disk usage")
+        self.assertEqual(matcher.compile().match("Disk usage"), "r2")
+
+    def test_invalid_pattern(self):
+        """Invalid regex, global flags, capturing groups & unsupported match types"""
+        for match_type, pattern, error in [
+            (rule_matcher.REGEX, "Disk (", "Invalid regex"),
+            (rule_matcher.REGEX, "(?i)disk", "Global flags are not supported"),
+            (rule_matcher.REGEX, "Disk (usage|full)", "Capturing groups are not supported"),
+            ("contains", "Disk", "Unsupported match type"),
+        ]:
+            with self.subTest(pattern=pattern), self.assertRaisesRegex(rule_matcher.RuleMatchError, error):
+                rule_matcher.RuleMatcher().add("r1", match_type, pattern)
+
+
+class PayloadSchemaTestCase(SimpleTestCase):
+    """Monitor Tool Payload Schema"""
+
+    schema = {
+        "type": "object",
+        "required": ["event_title", "event_type"],
+        "properties": {
+            "event_title": {"type": "string", "minLength": 1, "maxLength": 64},
+            "event_type": {"enum": ["up", "down"]},
+            "severity": {"type": ["integer", "null"], "minimum": 1, "maximum": 5},
+            "asset": {"type": "string", "pattern": "^[a-z0-9-]+$"},
+            "tags": {"type": "array", "items": {"type": "string"}},
+            "source": {"const": "nagios"},
+        },
+    }
+
+    def test_valid(self):
+        """No errors"""
+        validator = compile_schema(self.schema)
+        self.assertEqual(validator({"event_title": "Host Down", "event_type": "down"}), [])
+        self.assertEqual(
+            validator(
+                {
+                    "event_title": "Host Down",
+                    "event_type": "down",
+                    "severity": None,
+                    "asset": "host-1",
+                    "tags": ["linux"],
+                    "source": "nagios",
+                    "extra": 1,
+                }
+            ),
+            [],
+        )
+
+    def test_errors(self):
+        """Errors, with the path of the invalid value"""
+        validator = compile_schema(self.schema)
+        self.assertEqual(validator([]), ["$: expected object"])
+        self.assertEqual(
+            validator({"event_type": "flapping"}),
+            ["$.event_title: required", "$.event_type: 'flapping' not in ['up', 'down']"],
+        )
+        for event_data, error in [
+            ({"event_title": ""}, "$.event_title: shorter than 1"),
+            ({"event_title": "x" * 65}, "$.event_title: longer than 64"),
+            ({"severity": True}, "$.severity: expected integer/null"),
+            ({"severity": 0}, "$.severity: less than 1"),
+            ({"severity": 6}, "$.severity: greater than 5"),
+            ({"asset": "Host 1"}, "$.asset: does not match '^[a-z0-9-]+$'"),
+            ({"tags": ["linux", 1]}, "$.tags[1]: expected string"),
+            ({"source": "zabbix"}, "$.source: 'zabbix' not in ['nagios']"),
+        ]:
+            with self.subTest(event_data=event_data):
+                self.assertEqual(validator({"event_title": "Host Down", "event_type": "down", **event_data}), [error])
+
+    def test_additional_properties(self):
+        """Properties not in the schema are rejected, with additionalProperties false"""
+        validator = compile_schema({"properties": {"event_title": {}}, "additionalProperties": False})
+        self.assertEqual(validator({"event_title": "Host Down"}), [])
+        self.assertEqual(validator({"event_title": "Host Down", "extra": 1}), ["$.extra: not allowed"])
+
+    def test_max_errors(self):
+        """At most MAX_ERRORS errors"""
+        validator = compile_schema({"type": "array", "items": {"type": "string"}})
+        self.assertEqual(len(validator(list(range(MAX_ERRORS * 2)))), MAX_ERRORS)
+
+    def test_invalid_schema(self):
+        """Invalid & unsupported schemas"""
+        for schema, error in [
+            ([], "Schema must be an object"),
+            ({"type": "date"}, "Unsupported type"),
+            ({"enum": "up"}, "enum must be a list"),
+            ({"pattern": "("}, "Invalid pattern"),
+            ({"additionalProperties": {"type": "string"}}, "Only boolean additionalProperties"),
+            ({"properties": {"event_title": {"type": "text"}}}, "Unsupported type"),
+            ({"items": "string"}, "Schema must be an object"),
+        ]:
+            with self.subTest(schema=schema), self.assertRaisesRegex(SchemaError, error):
+                compile_schema(schema)
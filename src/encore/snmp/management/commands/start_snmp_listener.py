@@ -11,8 +11,10 @@ from django.conf import settings
 from django.core.management.base import BaseCommand
 from django.db.transaction import atomic, on_commit
 
+from elastic.buffer import append_event
 from elastic.models import ApiLog
 from elastic.tasks import ingest_event
+from elastic.validation import validate_event_payload
 from snmp.utils import KEY_TRANSLATE_MAP, decode_trap_message, get_mib_view_controller
 
 logger = logging.getLogger("correlator.snmp")
@@ -39,6 +41,21 @@ def callback_func(unused_transport_dispatcher, unused_transport_domain, transpor
                     val_list[1:]
                 ).strip()
 
+    if invalid_payload := validate_event_payload(remote_ip, event_data):
+        # Traps cannot be rejected, so always quarantined
+        ApiLog.objects.create(
+            remote_ip=remote_ip,
+            method=event_method,
+            task=ApiLog.TaskType.EVENT,
+            task_data=event_data,
+            status=ApiLog.Status.FAILED,
+            failure_reason=invalid_payload.failure_reason,
+        )
+        return
+
+    if settings.INGEST_WRITE_BUFFER and append_event(remote_ip, event_method, event_data):
+        return
+
     with atomic():
         api_log = ApiLog.objects.create(
             remote_ip=remote_ip,